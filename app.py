@@ -4,12 +4,16 @@ import os
 from datetime import datetime, timedelta
 import threading
 import time
+import itertools
 import hmac
 import hashlib
 import base64
 import urllib.parse
-import requests
+from http_client import get_http_client
+from cassette import CassetteHttpClient
 from twitter_ai_monitor import TwitterAIMonitor
+from tweet_store import create_tweet_store
+from search_index import SearchIndex, SEARCH_DB_NAME
 from auth import auth_manager, login_required, get_current_user_id
 
 app = Flask(__name__)
@@ -18,6 +22,11 @@ app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-this-in-pr
 # 全局变量
 monitor_instance = None
 monitor_thread = None
+tweet_store = None
+tweet_store_lock = threading.Lock()
+search_index = None
+search_index_lock = threading.Lock()
+http_client = None
 monitoring_status = {
     "running": False, 
     "last_update": None,
@@ -71,6 +80,16 @@ def parse_twitter_time(twitter_time_str):
         except:
             return twitter_time_str
 
+def ensure_display_times(tweet):
+    """
+    为缺少显示时间的历史推文补算北京时间（新推文写入时已预先计算，可用 tweet_store.py backfill 批量补齐）
+    :param tweet: 推文数据
+    """
+    if 'beijing_time' not in tweet and 'timestamp' in tweet:
+        tweet['beijing_time'] = utc_to_beijing(tweet['timestamp'])
+    if 'formatted_created_at' not in tweet and 'created_at' in tweet:
+        tweet['formatted_created_at'] = parse_twitter_time(tweet['created_at'])
+
 def send_dingtalk_message(webhook_url, secret, author, update_time, ai_title, ai_content):
     """
     发送钉钉机器人消息
@@ -139,7 +158,7 @@ def send_dingtalk_message(webhook_url, secret, author, update_time, ai_title, ai
         }
         
         # 发送请求
-        response = requests.post(url, json=data, timeout=10)
+        response = get_shared_http_client().post(url, json=data, timeout=10)
         
         if response.status_code == 200:
             result = response.json()
@@ -160,6 +179,12 @@ def send_dingtalk_message(webhook_url, secret, author, update_time, ai_title, ai
 # 配置文件路径
 CONFIG_FILE = "config.json"
 
+# 全文检索每页最多返回的条数
+SEARCH_PAGE_SIZE_MAX = 100
+
+# 首页每页显示的推文条数
+INDEX_PAGE_SIZE = 50
+
 def load_config():
     """加载配置文件"""
     default_config = {
@@ -174,7 +199,38 @@ def load_config():
         "ENABLE_DINGTALK": False,
         "AI_MAX_RETRIES": 3,
         "AI_TIMEOUT": 30,
-        "AI_MAX_TOKENS": 1000
+        "AI_MAX_TOKENS": 1000,
+        "AI_MODE": "combined",
+        "AI_WORKERS": 4,
+        "LLM_CACHE_MAX_MB": 64,
+        "NEAR_DUP_MAX_DISTANCE": 3,
+        "NEAR_DUP_WINDOW_DAYS": 7,
+        "AI_BREAKER_THRESHOLD": 5,
+        "AI_BREAKER_RECOVERY": 30,
+        "FSYNC_EVERY": 20,
+        "FSYNC_INTERVAL": 5,
+        "STORAGE_BACKEND": "file",
+        "CACHE_MAX_MB": 256,
+        "COLD_AFTER_DAYS": 30,
+        "FETCH_WORKERS": 8,
+        "TWITTER_RATE_LIMIT": 5,
+        "HTTP_POOL_SIZE": 16,
+        "HTTP_MAX_RETRIES": 3,
+        "BATCH_QUERIES": True,
+        "BATCH_QUERY_MAX_LENGTH": 500,
+        "ADAPTIVE_POLLING": True,
+        "POLL_BUDGET_PER_HOUR": 0,
+        "POLL_MIN_INTERVAL": 60,
+        "POLL_MAX_INTERVAL": 3600,
+        "STREAM_QUEUE_SIZE": 50,
+        "ENABLE_INGEST": False,
+        "INGEST_API_KEY": "",
+        "INGEST_SECRET": "",
+        "TWITTER_CASSETTE_MODE": "",
+        "TWITTER_CASSETTE_PATH": "data/cassettes/twitterapi.jsonl",
+        "CASSETTE_LATENCY": None,
+        "CASSETTE_ERROR_RATE": 0,
+        "CASSETTE_ERROR_STATUS": 503
     }
     
     if os.path.exists(CONFIG_FILE):
@@ -195,6 +251,98 @@ def save_config(config):
     with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
         json.dump(config, f, ensure_ascii=False, indent=2)
 
+def get_tweet_store():
+    """获取共享的推文存储实例（修改STORAGE_BACKEND后需重启服务生效）"""
+    global tweet_store
+    
+    with tweet_store_lock:
+        if tweet_store is None:
+            config = load_config()
+            tweet_store = create_tweet_store(
+                config.get("STORAGE_BACKEND", "file"),
+                "data",
+                fsync_every=config.get("FSYNC_EVERY", 20),
+                fsync_interval=config.get("FSYNC_INTERVAL", 5),
+                cache_max_bytes=int(config.get("CACHE_MAX_MB", 256)) * 1024 * 1024,
+                cold_after_days=int(config.get("COLD_AFTER_DAYS", 30))
+            )
+        return tweet_store
+
+def get_shared_http_client():
+    """获取共享的长连接HTTP客户端（修改HTTP_POOL_SIZE/HTTP_MAX_RETRIES后需重启服务生效）"""
+    global http_client
+    
+    if http_client is None:
+        config = load_config()
+        http_client = get_http_client(
+            pool_size=int(config.get("HTTP_POOL_SIZE", 16)),
+            max_retries=int(config.get("HTTP_MAX_RETRIES", 3))
+        )
+    return http_client
+
+def get_monitor_http_client(config):
+    """监控使用的HTTP客户端：设置了 TWITTER_CASSETTE_MODE（record/replay）时录制或回放 TwitterAPI.io 请求"""
+    client = get_shared_http_client()
+    mode = config.get("TWITTER_CASSETTE_MODE")
+    if not mode:
+        return client
+    latency = config.get("CASSETTE_LATENCY")
+    return CassetteHttpClient(
+        client,
+        config.get("TWITTER_CASSETTE_PATH", "data/cassettes/twitterapi.jsonl"),
+        mode,
+        latency=float(latency) if latency is not None else None,
+        error_rate=float(config.get("CASSETTE_ERROR_RATE", 0)),
+        error_status=int(config.get("CASSETTE_ERROR_STATUS", 503))
+    )
+
+def get_search_index():
+    """获取共享的全文索引实例（首次使用时补齐尚未索引的推文）"""
+    global search_index
+    
+    with search_index_lock:
+        if search_index is None:
+            index = SearchIndex(os.path.join("data", SEARCH_DB_NAME))
+            index.ensure_built(get_tweet_store())
+            search_index = index
+        return search_index
+
+def search_tweets(query, author_filter, start_date, end_date, page=1, page_size=20):
+    """
+    全文检索推文（按发帖时间倒序分页）
+    :return: (当前页推文列表, 匹配总数)，日期格式错误时抛出ValueError
+    """
+    store = get_tweet_store()
+    tweet_ids, total = get_search_index().search(
+        query,
+        author=author_filter or None,
+        start_date=start_date or None,
+        end_date=end_date or None,
+        limit=page_size,
+        offset=(page - 1) * page_size
+    )
+    tweets = [tweet for tweet in (store.get(tweet_id) for tweet_id in tweet_ids) if tweet]
+    return tweets, total
+
+def query_tweets(author_filter, start_date, end_date, limit=None, offset=0):
+    """
+    按筛选条件从推文存储查询推文（按发帖时间倒序，逐个分区惰性归并，取够即停）
+    :return: (推文列表, 是否还有更多, 日期参数是否有效)
+    """
+    store = get_tweet_store()
+    dates_valid = True
+    try:
+        tweets = store.iter_newest(author=author_filter or None, start_date=start_date or None, end_date=end_date or None)
+    except ValueError:
+        tweets = store.iter_newest(author=author_filter or None)
+        dates_valid = False
+    
+    if limit is None:
+        return list(itertools.islice(tweets, offset, None)), False, dates_valid
+    # 多取一条用于判断是否还有下一页
+    page = list(itertools.islice(tweets, offset, offset + limit + 1))
+    return page[:limit], len(page) > limit, dates_valid
+
 def start_monitoring():
     """启动监控"""
     global monitor_instance, monitoring_status
@@ -214,7 +362,26 @@ def start_monitoring():
             enable_dingtalk=config.get("ENABLE_DINGTALK", False),
             ai_max_retries=config.get("AI_MAX_RETRIES", 3),
             ai_timeout=config.get("AI_TIMEOUT", 30),
-            ai_max_tokens=config.get("AI_MAX_TOKENS", 1000)
+            ai_max_tokens=config.get("AI_MAX_TOKENS", 1000),
+            store=get_tweet_store(),
+            search_index=get_search_index(),
+            fetch_workers=int(config.get("FETCH_WORKERS", 8)),
+            twitter_rate_limit=float(config.get("TWITTER_RATE_LIMIT", 5)),
+            http_client=get_monitor_http_client(config),
+            batch_queries=bool(config.get("BATCH_QUERIES", True)),
+            batch_query_max_length=int(config.get("BATCH_QUERY_MAX_LENGTH", 500)),
+            adaptive_polling=bool(config.get("ADAPTIVE_POLLING", True)),
+            poll_budget_per_hour=float(config.get("POLL_BUDGET_PER_HOUR", 0)),
+            poll_min_interval=int(config.get("POLL_MIN_INTERVAL", 60)),
+            poll_max_interval=int(config.get("POLL_MAX_INTERVAL", 3600)),
+            stream_queue_size=int(config.get("STREAM_QUEUE_SIZE", 50)),
+            ai_mode=config.get("AI_MODE", "combined"),
+            ai_workers=int(config.get("AI_WORKERS", 4)),
+            llm_cache_max_mb=float(config.get("LLM_CACHE_MAX_MB", 64)),
+            near_dup_max_distance=int(config.get("NEAR_DUP_MAX_DISTANCE", 3)),
+            near_dup_window_days=float(config.get("NEAR_DUP_WINDOW_DAYS", 7)),
+            ai_breaker_threshold=int(config.get("AI_BREAKER_THRESHOLD", 5)),
+            ai_breaker_recovery=float(config.get("AI_BREAKER_RECOVERY", 30))
         )
         
         # 在新线程中启动监控
@@ -311,41 +478,34 @@ def index():
     author_filter = request.args.get('author', '')
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
+    search_query = request.args.get('q', '').strip()
+    search_total = None
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+    except ValueError:
+        page = 1
     
-    # 获取所有推文数据
-    if monitor_instance:
-        all_tweets = monitor_instance.get_all_tweets()
+    if search_query:
+        # 全文检索
+        try:
+            filtered_tweets, search_total = search_tweets(search_query, author_filter, start_date, end_date, page, INDEX_PAGE_SIZE)
+        except ValueError:
+            flash('日期格式错误，已忽略日期筛选', 'error')
+            filtered_tweets, search_total = search_tweets(search_query, author_filter, '', '', page, INDEX_PAGE_SIZE)
+        has_more = page * INDEX_PAGE_SIZE < search_total
     else:
-        # 如果没有监控实例，创建临时实例来读取数据
-        temp_monitor = TwitterAIMonitor("", "", "")
-        all_tweets = temp_monitor.get_all_tweets()
+        # 只读取当前页需要的最新推文
+        filtered_tweets, has_more, dates_valid = query_tweets(
+            author_filter, start_date, end_date, limit=INDEX_PAGE_SIZE, offset=(page - 1) * INDEX_PAGE_SIZE)
+        if not dates_valid:
+            flash('日期格式错误，已忽略日期筛选', 'error')
     
-    # 应用筛选
-    filtered_tweets = all_tweets
-    
-    if author_filter:
-        filtered_tweets = [t for t in filtered_tweets if t.get('author', '').lower() == author_filter.lower()]
-    
-    # 日期范围筛选
-    if start_date or end_date:
-        filtered_tweets = [t for t in filtered_tweets if t.get('created_at')]
-        if start_date:
-            filtered_tweets = [t for t in filtered_tweets if parse_twitter_time(t['created_at'])[:10] >= start_date]
-        if end_date:
-            filtered_tweets = [t for t in filtered_tweets if parse_twitter_time(t['created_at'])[:10] <= end_date]
-    
-    # 转换时间为北京时间并添加格式化的创建时间
+    # 显示时间已在写入时计算，仅为历史数据补算
     for tweet in filtered_tweets:
-        if 'timestamp' in tweet:
-            tweet['beijing_time'] = utc_to_beijing(tweet['timestamp'])
-        if 'created_at' in tweet:
-            tweet['formatted_created_at'] = parse_twitter_time(tweet['created_at'])
-    
-    # 按创建时间排序（最新的在前）
-    filtered_tweets.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+        ensure_display_times(tweet)
     
     # 获取所有作者列表用于筛选
-    authors = list(set([t.get('author', '') for t in all_tweets if t.get('author')]))
+    authors = get_tweet_store().authors()
     
     # 更新监控状态中的时间为北京时间
     if monitoring_status.get('last_update'):
@@ -360,34 +520,24 @@ def index():
                          current_author=author_filter,
                          start_date=start_date,
                          end_date=end_date,
+                         search_query=search_query,
+                         search_total=search_total,
+                         total_count=get_tweet_store().count() if not (author_filter or start_date or end_date) else None,
+                         page=page,
+                         has_more=has_more,
                          monitoring_status=monitoring_status)
 
 @app.route('/tweet/<tweet_id>')
 @login_required
 def tweet_detail(tweet_id):
     """推文详情页"""
-    # 获取所有推文数据
-    if monitor_instance:
-        all_tweets = monitor_instance.get_all_tweets()
-    else:
-        temp_monitor = TwitterAIMonitor("", "", "")
-        all_tweets = temp_monitor.get_all_tweets()
-    
-    # 查找指定ID的推文
-    tweet = None
-    for t in all_tweets:
-        if t.get('id') == tweet_id:
-            tweet = t
-            break
+    tweet = get_tweet_store().get(tweet_id)
     
     if not tweet:
         return "推文未找到", 404
     
-    # 添加格式化的时间
-    if 'timestamp' in tweet:
-        tweet['beijing_time'] = utc_to_beijing(tweet['timestamp'])
-    if 'created_at' in tweet:
-        tweet['formatted_created_at'] = parse_twitter_time(tweet['created_at'])
+    # 显示时间已在写入时计算，仅为历史数据补算
+    ensure_display_times(tweet)
     
     return render_template('tweet_detail.html', tweet=tweet, monitoring_status=monitoring_status)
 
@@ -463,7 +613,66 @@ def stop_monitoring_api():
 @login_required
 def monitoring_status_api():
     """获取监控状态API"""
-    return jsonify(monitoring_status)
+    ingest = monitor_instance.ingest_stats() if monitor_instance else None
+    llm_cache = monitor_instance.llm_cache.stats() if monitor_instance else None
+    ai_breaker = monitor_instance.ai_breaker_stats() if monitor_instance else None
+    return jsonify({**monitoring_status, "storage": get_tweet_store().stats(), "http": get_shared_http_client().stats(),
+                    "ingest": ingest, "llm_cache": llm_cache, "ai_breaker": ai_breaker})
+
+def verify_ingest_request(config, req):
+    """
+    校验推送请求：X-API-Key 需与 INGEST_API_KEY（未设置时为 TWITTER_API_KEY）一致；
+    设置了 INGEST_SECRET 时还需携带请求体的 HMAC-SHA256 签名（X-Signature: sha256=十六进制）
+    
+    :return: (是否通过, 错误信息)
+    """
+    expected_key = config.get("INGEST_API_KEY") or config.get("TWITTER_API_KEY")
+    if not expected_key:
+        return False, "未配置推送密钥"
+    if not hmac.compare_digest(req.headers.get("X-API-Key", ""), expected_key):
+        return False, "API Key 无效"
+    
+    secret = config.get("INGEST_SECRET")
+    if secret:
+        signature = req.headers.get("X-Signature", "")
+        if signature.startswith("sha256="):
+            signature = signature[len("sha256="):]
+        digest = hmac.new(secret.encode('utf-8'), req.get_data(), digestmod=hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(signature, digest):
+            return False, "签名无效"
+    return True, ""
+
+@app.route('/api/ingest', methods=['POST'])
+def ingest_api():
+    """
+    推送接入API（兼容 TwitterAPI.io webhook / 过滤规则推送格式），不需要登录，按 API Key 和签名验证。
+    推送的推文经去重后直接进入AI处理、保存和钉钉推送，轮询作为补漏。
+    """
+    config = load_config()
+    if not config.get("ENABLE_INGEST"):
+        return jsonify({"success": False, "message": "推送接入未启用"}), 404
+    
+    ok, message = verify_ingest_request(config, request)
+    if not ok:
+        return jsonify({"success": False, "message": message}), 401
+    
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({"success": False, "message": "请求体必须为JSON"}), 400
+    
+    # TwitterAPI.io 配置webhook时发送的连通性测试
+    if isinstance(payload, dict) and payload.get("event_type") == "test_webhook_url":
+        return jsonify({"success": True, "message": "ok"})
+    
+    tweets = payload.get("tweets") if isinstance(payload, dict) else payload
+    if not isinstance(tweets, list):
+        return jsonify({"success": False, "message": "缺少 tweets 列表"}), 400
+    
+    if monitor_instance is None:
+        return jsonify({"success": False, "message": "监控未启动"}), 503
+    
+    result = monitor_instance.ingest_tweets(tweets)
+    return jsonify({"success": True, **result})
 
 @app.route('/api/tweets')
 @login_required
@@ -473,41 +682,62 @@ def tweets_api():
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
     
-    # 获取所有推文数据
-    if monitor_instance:
-        all_tweets = monitor_instance.get_all_tweets()
-    else:
-        temp_monitor = TwitterAIMonitor("", "", "")
-        all_tweets = temp_monitor.get_all_tweets()
-    
-    # 应用筛选
-    filtered_tweets = all_tweets
-    
-    if author_filter:
-        filtered_tweets = [t for t in filtered_tweets if t.get('author', '').lower() == author_filter.lower()]
+    try:
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return jsonify({"success": False, "message": "limit 和 offset 必须为整数"}), 400
     
-    # 日期范围筛选
-    if start_date or end_date:
-        filtered_tweets = [t for t in filtered_tweets if t.get('created_at')]
-        if start_date:
-            filtered_tweets = [t for t in filtered_tweets if parse_twitter_time(t['created_at'])[:10] >= start_date]
-        if end_date:
-            filtered_tweets = [t for t in filtered_tweets if parse_twitter_time(t['created_at'])[:10] <= end_date]
+    # 按发帖时间倒序惰性读取，指定 limit 时取够即停
+    filtered_tweets, has_more, dates_valid = query_tweets(author_filter, start_date, end_date, limit, offset)
+    if not dates_valid:
+        return jsonify({"success": False, "message": "日期格式错误，应为 YYYY-MM-DD"}), 400
     
-    # 转换时间为北京时间
+    # 显示时间已在写入时计算，仅为历史数据补算
     for tweet in filtered_tweets:
-        if 'timestamp' in tweet:
-            tweet['beijing_time'] = utc_to_beijing(tweet['timestamp'])
-        if 'created_at' in tweet:
-            tweet['formatted_created_at'] = parse_twitter_time(tweet['created_at'])
-    
-    # 按创建时间排序（最新的在前）
-    filtered_tweets.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+        ensure_display_times(tweet)
     
     return jsonify({
         'tweets': filtered_tweets,
         'total': len(filtered_tweets),
-        'filtered': len(filtered_tweets) != len(all_tweets)
+        'has_more': has_more,
+        'filtered': bool(author_filter or start_date or end_date) and len(filtered_tweets) != get_tweet_store().count()
+    })
+
+@app.route('/api/search')
+@login_required
+def search_api():
+    """全文检索API（分页）"""
+    query = request.args.get('q', '').strip()
+    author_filter = request.args.get('author', '')
+    start_date = request.args.get('start_date', '')
+    end_date = request.args.get('end_date', '')
+    
+    if not query:
+        return jsonify({"success": False, "message": "请输入检索词"}), 400
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        page_size = min(SEARCH_PAGE_SIZE_MAX, max(1, int(request.args.get('page_size', 20))))
+    except ValueError:
+        return jsonify({"success": False, "message": "page 和 page_size 必须为整数"}), 400
+    
+    started = time.time()
+    try:
+        tweets, total = search_tweets(query, author_filter, start_date, end_date, page, page_size)
+    except ValueError:
+        return jsonify({"success": False, "message": "日期格式错误，应为 YYYY-MM-DD"}), 400
+    
+    for tweet in tweets:
+        ensure_display_times(tweet)
+    
+    return jsonify({
+        'success': True,
+        'tweets': tweets,
+        'total': total,
+        'page': page,
+        'page_size': page_size,
+        'pages': (total + page_size - 1) // page_size,
+        'took_ms': round((time.time() - started) * 1000, 2)
     })
 
 @app.route('/api/test_dingtalk', methods=['POST'])
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史回填命令
+
+把一个账号的日期范围切成固定长度的时间片，多个时间片并发抓取（所有线程共用监控器的限流器），
+每个时间片抓完后批量写入存储，并在 data/backfill_state.json 中记录已完成的时间片，中断后重新运行同一命令会跳过它们：
+
+    python backfill.py <账号> <开始日期> [结束日期] [--slice-hours 24] [--workers 8] [--defer-ai]
+
+日期为北京时间 YYYY-MM-DD，结束日期默认为今天。默认在本进程中逐条AI处理后保存（不推送钉钉），
+此时请先停止监控，避免两个进程同时写入存储；加 --defer-ai 时只把原始推文放入 data/backfill_spool/，
+由运行中的监控进程在后台AI处理并保存，回填可以在监控运行时进行。
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+from backfill_spool import BackfillSpool, BACKFILL_SPOOL_DIR_NAME
+from tweet_store import BEIJING_TZ, create_tweet_store
+from twitter_ai_monitor import AIUnavailableError, TwitterAIMonitor
+
+BACKFILL_STATE_FILE_NAME = "backfill_state.json"
+
+
+def split_time_slices(since_time: datetime, until_time: datetime, slice_hours: float) -> list:
+    """
+    把时间范围切成时间片，最新的在前（先补齐最近的历史）
+
+    :param since_time: 开始时间（UTC）
+    :param until_time: 结束时间（UTC）
+    :param slice_hours: 每个时间片的小时数
+    :return: [(开始时间, 结束时间)]
+    """
+    # 从开始时间向后切，时间片边界不随结束时间（默认为当前时间）变化，重新运行时能对上已完成的时间片
+    step = timedelta(hours=slice_hours)
+    slices = []
+    start = since_time
+    while start < until_time:
+        end = min(until_time, start + step)
+        slices.append((start, end))
+        start = end
+    return slices[::-1]
+
+
+def date_range_to_utc(start_date: str, end_date: str = None) -> tuple:
+    """
+    北京时间日期范围转为UTC时间区间，结束时间不晚于当前时间
+
+    :param start_date: 开始日期 (YYYY-MM-DD)
+    :param end_date: 结束日期 (YYYY-MM-DD)，包含当天，为空表示到现在
+    :return: (开始时间, 结束时间)，均为不带时区的UTC时间
+    """
+    start = datetime.strptime(start_date, "%Y-%m-%d").replace(tzinfo=BEIJING_TZ)
+    now = datetime.now(timezone.utc)
+    end = now
+    if end_date:
+        end = min(now, datetime.strptime(end_date, "%Y-%m-%d").replace(tzinfo=BEIJING_TZ) + timedelta(days=1))
+    to_utc = lambda value: value.astimezone(timezone.utc).replace(tzinfo=None)
+    return to_utc(start), to_utc(end)
+
+
+class BackfillCheckpoint:
+    """回填进度：每个回填任务已完成的时间片（线程安全，原子写入）"""
+
+    def __init__(self, path: str):
+        """
+        :param path: 进度文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._jobs = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._jobs = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 读取回填进度失败，将从头开始: {str(e)}")
+
+    @staticmethod
+    def job_key(account: str, start_date: str, end_date: str, slice_hours: float, exclude_replies: bool) -> str:
+        """
+        同一账号、日期范围和切片方式的回填视为同一个任务
+
+        未指定结束日期（回填到现在）的任务键不含日期，第二天继续运行时仍是同一个任务
+        """
+        return f"{account.lower()}|{start_date}|{end_date or 'now'}|{slice_hours:g}h|{'noreply' if exclude_replies else 'all'}"
+
+    def done_slices(self, job: str) -> set:
+        """
+        :param job: 任务键
+        :return: 已完成时间片的开始时间（ISO格式）
+        """
+        with self._lock:
+            return set(self._jobs.get(job, {}).get('done', []))
+
+    def mark_done(self, job: str, since_time: datetime, tweets: int):
+        """
+        记录一个时间片已完成并落盘
+
+        :param job: 任务键
+        :param since_time: 时间片开始时间
+        :param tweets: 该时间片抓到的推文数
+        """
+        with self._lock:
+            state = self._jobs.setdefault(job, {'done': [], 'tweets': 0})
+            state['done'].append(since_time.isoformat())
+            state['tweets'] += tweets
+            state['updated_at'] = datetime.now().isoformat()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._jobs, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def _build_or_none(monitor, tweet: dict):
+    """
+    AI处理一条推文，失败时返回None，不影响同一时间片的其他推文
+
+    :param monitor: TwitterAIMonitor 实例
+    :param tweet: 原始推文
+    :return: 推文数据，处理失败时为None
+    """
+    try:
+        return monitor.build_tweet_data(tweet)
+    except AIUnavailableError as e:
+        print(f"❌ AI处理中断，推文ID {tweet.get('id') or tweet.get('id_str')}: {str(e)}")
+    except Exception as e:
+        print(f"❌ 处理推文失败，推文ID {tweet.get('id') or tweet.get('id_str')}: {str(e)}")
+    return None
+
+
+def run_backfill(monitor, account: str, start_date: str, end_date: str = None, slice_hours: float = 24,
+                 workers: int = None, defer_ai: bool = False, exclude_replies: bool = False,
+                 checkpoint: BackfillCheckpoint = None) -> dict:
+    """
+    并发回填一个账号的历史推文
+
+    :param monitor: TwitterAIMonitor 实例（使用其限流器、HTTP客户端和存储）
+    :param account: 账号
+    :param start_date: 开始日期 (YYYY-MM-DD，北京时间)
+    :param end_date: 结束日期 (YYYY-MM-DD，北京时间，包含当天)，为空表示到今天
+    :param slice_hours: 每个时间片的小时数
+    :param workers: 并发抓取的线程数，默认与监控器的 fetch_workers 相同
+    :param defer_ai: 为True时只把原始推文放入回填队列，由监控进程做AI处理
+    :param exclude_replies: 是否排除回复推文
+    :param checkpoint: 回填进度，默认使用 data_dir 下的 backfill_state.json
+    :return: {'slices', 'skipped', 'failed', 'fetched', 'saved', 'queued', 'seconds'}
+    """
+    checkpoint = checkpoint or BackfillCheckpoint(os.path.join(monitor.data_dir, BACKFILL_STATE_FILE_NAME))
+    job = BackfillCheckpoint.job_key(account, start_date, end_date, slice_hours, exclude_replies)
+    end_date = end_date or datetime.now(BEIJING_TZ).strftime("%Y-%m-%d")
+    since_time, until_time = date_range_to_utc(start_date, end_date)
+    # 结束时间被截到当前时间时，最新的时间片还没结束，抓完也不记录进度，下次运行时重新抓取
+    day_end = datetime.strptime(end_date, "%Y-%m-%d").replace(tzinfo=BEIJING_TZ) + timedelta(days=1)
+    open_tail = until_time < day_end.astimezone(timezone.utc).replace(tzinfo=None)
+    done = checkpoint.done_slices(job)
+    slices = split_time_slices(since_time, until_time, slice_hours)
+    pending = [s for s in slices if s[0].isoformat() not in done]
+    spool = BackfillSpool(os.path.join(monitor.data_dir, BACKFILL_SPOOL_DIR_NAME))
+
+    result = {'slices': len(slices), 'skipped': len(slices) - len(pending), 'failed': 0,
+              'fetched': 0, 'saved': 0, 'queued': 0}
+    print(f"📚 回填 @{account} {start_date} ~ {end_date}: 共 {len(slices)} 个时间片，"
+          f"已完成 {result['skipped']} 个，待抓取 {len(pending)} 个")
+    started = time.time()
+
+    # 时间片翻完整个窗口，不按实时监控的水位线提前停止翻页
+    with ThreadPoolExecutor(max_workers=workers or monitor.fetch_workers, thread_name_prefix="backfill") as pool:
+        futures = {
+            pool.submit(monitor._fetch_account, account, start, end, exclude_replies, use_watermark=False): (start, end)
+            for start, end in pending
+        }
+        for index, future in enumerate(as_completed(futures), 1):
+            start, end = futures[future]
+            label = f"{start:%Y-%m-%d %H:%M} ~ {end:%Y-%m-%d %H:%M}"
+            try:
+                tweets, error = future.result()
+            except Exception as e:
+                tweets, error = [], str(e)
+            if error is not None:
+                # 未完成的时间片不记录进度，重新运行时再抓
+                result['failed'] += 1
+                print(f"❌ 时间片 {label} 抓取失败（下次运行重试）: {error}")
+                continue
+            result['fetched'] += len(tweets)
+
+            if defer_ai:
+                if spool.append(f"{account.lower()}_{start:%Y%m%dT%H%M%S}", tweets):
+                    result['queued'] += len(tweets)
+            else:
+                new_tweets = monitor.seen_index.filter_new(tweets)
+                failures = len(new_tweets)
+                try:
+                    # 由AI工作线程池并发处理，整个时间片处理完后批量写入；单条失败只跳过该条
+                    built = list(monitor.ai_pool.map(lambda tweet: _build_or_none(monitor, tweet), new_tweets))
+                    result['saved'] += monitor.save_tweets([data for data in built if data is not None])
+                    failures = built.count(None)
+                except Exception as e:
+                    print(f"❌ 时间片 {label} 保存失败: {str(e)}")
+                finally:
+                    monitor.seen_index.release(t.get('id') or t.get('id_str') for t in new_tweets)
+                if failures:
+                    # 时间片不记录进度，已保存的推文重新运行时会被去重跳过（已完成的AI结果在缓存中，不会重复调用）
+                    result['failed'] += 1
+                    print(f"❌ 时间片 {label} 有 {failures} 条推文处理失败（下次运行重试）")
+                    continue
+            if open_tail and end == until_time:
+                print(f"✅ 时间片 {label}: {len(tweets)} 条（尚未结束，不记录进度）")
+                continue
+            checkpoint.mark_done(job, start, len(tweets))
+            print(f"✅ 时间片 {label}: {len(tweets)} 条 ({index}/{len(pending)}，"
+                  f"限流 {monitor.rate_limiter.stats().get('rate', 0)}/s)")
+
+    monitor.seen_index.flush()
+    result['seconds'] = round(time.time() - started, 1)
+    return result
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="按时间片并发回填账号的历史推文")
+    parser.add_argument("account", help="Twitter账号（不含@）")
+    parser.add_argument("start_date", help="开始日期 YYYY-MM-DD（北京时间）")
+    parser.add_argument("end_date", nargs="?", help="结束日期 YYYY-MM-DD（北京时间，包含当天），默认今天")
+    parser.add_argument("--slice-hours", type=float, default=24, help="每个时间片的小时数，默认24")
+    parser.add_argument("--workers", type=int, default=None, help="并发抓取的线程数，默认为配置的 FETCH_WORKERS")
+    parser.add_argument("--defer-ai", action="store_true", help="只抓取入队，由运行中的监控进程做AI处理")
+    args = parser.parse_args()
+
+    config = {}
+    if os.path.exists("config.json"):
+        with open("config.json", 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    if not config.get("TWITTER_API_KEY") or (not args.defer_ai and not config.get("LLM_API_KEY")):
+        print("❌ 请先在 config.json 中配置 TWITTER_API_KEY 和 LLM_API_KEY")
+        sys.exit(1)
+
+    store = create_tweet_store(
+        config.get("STORAGE_BACKEND", "file"),
+        "data",
+        fsync_every=config.get("FSYNC_EVERY", 20),
+        fsync_interval=config.get("FSYNC_INTERVAL", 5),
+        cold_after_days=int(config.get("COLD_AFTER_DAYS", 30))
+    )
+    monitor = TwitterAIMonitor(
+        config["TWITTER_API_KEY"],
+        config.get("LLM_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1"),
+        config.get("LLM_API_KEY", ""),
+        ai_max_retries=config.get("AI_MAX_RETRIES", 3),
+        ai_timeout=config.get("AI_TIMEOUT", 30),
+        ai_max_tokens=config.get("AI_MAX_TOKENS", 1000),
+        ai_mode=config.get("AI_MODE", "combined"),
+        ai_workers=int(config.get("AI_WORKERS", 4)),
+        llm_cache_max_mb=float(config.get("LLM_CACHE_MAX_MB", 64)),
+        near_dup_max_distance=int(config.get("NEAR_DUP_MAX_DISTANCE", 3)),
+        near_dup_window_days=float(config.get("NEAR_DUP_WINDOW_DAYS", 7)),
+        ai_breaker_threshold=int(config.get("AI_BREAKER_THRESHOLD", 5)),
+        ai_breaker_recovery=float(config.get("AI_BREAKER_RECOVERY", 30)),
+        store=store,
+        fetch_workers=int(config.get("FETCH_WORKERS", 8)),
+        twitter_rate_limit=float(config.get("TWITTER_RATE_LIMIT", 5))
+    )
+
+    try:
+        result = run_backfill(monitor, args.account, args.start_date, args.end_date, args.slice_hours,
+                              args.workers, args.defer_ai, bool(config.get("EXCLUDE_REPLIES", False)))
+    except KeyboardInterrupt:
+        print("\n🛑 回填被中断，重新运行同一命令即可从已完成的时间片之后继续")
+        sys.exit(1)
+    finally:
+        store.flush()
+
+    print(f"\n📚 回填完成: 抓取 {result['fetched']} 条，保存 {result['saved']} 条，"
+          f"交给监控处理 {result['queued']} 条，跳过已完成时间片 {result['skipped']} 个，"
+          f"失败 {result['failed']} 个，耗时 {result['seconds']} 秒")
+    if result['failed']:
+        print("⚠️ 有时间片抓取失败，重新运行同一命令会只补抓这些时间片")
+
+
+if __name__ == "__main__":
+    main()
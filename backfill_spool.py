@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史回填的待处理队列
+
+backfill.py --defer-ai 抓取到的原始推文不在命令行进程里做AI处理，而是每个时间片写成一个文件放入
+data/backfill_spool/（先写临时文件再原子改名，监控进程不会读到写了一半的文件）。
+运行中的监控进程在后台逐个文件做AI处理并保存（不推送钉钉），处理完一个文件才删除它，
+中途退出时下次启动会从该文件继续，已保存的推文由已见推文索引跳过。
+"""
+
+import json
+import os
+import re
+
+BACKFILL_SPOOL_DIR_NAME = "backfill_spool"
+SPOOL_SUFFIX = ".jsonl"
+# 大模型服务熔断期间推迟处理的实时推文，文件名带此前缀，处理时优先并推送钉钉
+DEFERRED_PREFIX = "deferred_"
+
+
+class BackfillSpool:
+    """按时间片分文件的待处理推文队列（文件原子写入，可由回填命令和监控进程同时使用）"""
+
+    def __init__(self, spool_dir: str):
+        """
+        :param spool_dir: 队列目录
+        """
+        self.spool_dir = spool_dir
+
+    def append(self, name: str, tweets: list) -> str:
+        """
+        把一个时间片的推文写成一个队列文件
+
+        :param name: 文件名（不含后缀），同名文件会被覆盖
+        :param tweets: 原始推文列表
+        :return: 队列文件路径，没有推文时返回None
+        """
+        if not tweets:
+            return None
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, re.sub(r'[^\w.-]', '_', name) + SPOOL_SUFFIX)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for tweet in tweets:
+                f.write(json.dumps(tweet, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return path
+
+    def pending(self) -> list:
+        """
+        :return: 待处理的队列文件路径（按文件名排序）
+        """
+        if not os.path.isdir(self.spool_dir):
+            return []
+        return [os.path.join(self.spool_dir, name) for name in sorted(os.listdir(self.spool_dir))
+                if name.endswith(SPOOL_SUFFIX)]
+
+    @staticmethod
+    def load(path: str) -> list:
+        """
+        读取一个队列文件，跳过损坏的行
+
+        :param path: 队列文件路径
+        :return: 原始推文列表
+        """
+        tweets = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    tweets.append(json.loads(line))
+                except ValueError:
+                    print(f"⚠️ 跳过损坏的回填记录: {path}")
+        return tweets
+
+    def remove(self, path: str):
+        """
+        队列文件处理完成后删除
+
+        :param path: 队列文件路径
+        """
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> dict:
+        """返回待处理的文件数和推文数"""
+        files = self.pending()
+        tweets = 0
+        for path in files:
+            try:
+                with open(path, 'rb') as f:
+                    tweets += sum(1 for line in f if line.strip())
+            except OSError:
+                continue
+        return {'files': len(files), 'tweets': tweets}
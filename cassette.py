@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TwitterAPI.io 请求的录制/回放（cassette）
+
+CassetteHttpClient 包装共享HTTP客户端，只拦截发往 api.twitterapi.io 的请求，其余请求（钉钉等）照常发出：
+- record：照常请求，并把每次响应（状态码、响应头、响应体、耗时）按行追加到 cassette 文件，翻页的 cursor 链一并记录
+- replay：不访问网络，按请求从 cassette 文件返回录制的响应，可设置固定延迟和按比例注入的错误
+
+回放按 (接口路径, 去掉 since:/until: 时间条件后的查询, cursor) 匹配，同一请求录制了多次时按录制顺序依次返回，
+用完后重复最后一次；错误注入由随机种子和请求序号决定，多线程并发时结果也可复现。
+
+    python cassette.py record <cassette文件> <账号> [回溯小时数]
+    python cassette.py replay <cassette文件> <账号> [--latency 秒] [--error-rate 比例] [--error-status 状态码]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from requests.structures import CaseInsensitiveDict
+
+CASSETTE_HOST = "api.twitterapi.io"
+CASSETTE_MODES = ("record", "replay")
+
+
+def cassette_key(url: str, params: dict = None) -> str:
+    """
+    请求的回放匹配键：去掉查询中随当前时间变化的 since:/until: 条件
+
+    :param url: 请求URL
+    :param params: 查询参数
+    :return: 匹配键
+    """
+    normalized = {}
+    for name, value in sorted((params or {}).items()):
+        if name == "query":
+            value = " ".join(token for token in str(value).split()
+                             if not token.startswith(("since:", "until:")))
+        normalized[name] = value
+    return json.dumps([urlsplit(url).path, normalized], ensure_ascii=False, sort_keys=True)
+
+
+class CassetteResponse:
+    """回放的响应（提供监控器用到的 requests.Response 属性）"""
+
+    def __init__(self, status_code: int, headers: dict, text: str, url: str = ""):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.text = text
+        self.url = url
+
+    @property
+    def content(self) -> bytes:
+        return self.text.encode('utf-8')
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class CassetteHttpClient:
+    """录制或回放 TwitterAPI.io 请求的HTTP客户端（接口与 HttpClient 相同，线程安全）"""
+
+    def __init__(self, inner, path: str, mode: str = "replay", latency: float = None, error_rate: float = 0.0,
+                 error_status: int = 503, seed: int = 0):
+        """
+        :param inner: 实际发送请求的HTTP客户端（HttpClient），回放时只用于非 TwitterAPI.io 的请求
+        :param path: cassette 文件路径（JSON Lines）
+        :param mode: record 或 replay
+        :param latency: 回放时每个请求的固定延迟（秒），为空时按录制时的耗时等待
+        :param error_rate: 回放时注入错误响应的比例（0~1）
+        :param error_status: 注入的错误状态码（如 429、503）
+        :param seed: 错误注入的随机种子
+        """
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"未知的 cassette 模式: {mode}")
+        self.inner = inner
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.error_rate = max(0.0, min(1.0, error_rate))
+        self.error_status = error_status
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._entries = {}    # 匹配键 -> 录制的响应列表（按录制顺序）
+        self._served = {}     # 匹配键 -> 已返回的录制响应数
+        self._attempts = {}   # 匹配键 -> 请求次数（含注入的错误）
+        self.counters = {'recorded': 0, 'replayed': 0, 'misses': 0, 'injected_errors': 0}
+        if mode == "replay":
+            self._load()
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"cassette 文件不存在: {self.path}")
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    print(f"⚠️ 跳过损坏的 cassette 记录: {self.path}")
+                    continue
+                self._entries.setdefault(entry['key'], []).append(entry)
+        print(f"📼 已加载 cassette: {self.path}（{sum(len(v) for v in self._entries.values())} 个响应）")
+
+    @staticmethod
+    def _intercepted(url: str) -> bool:
+        return urlsplit(url).hostname == CASSETTE_HOST
+
+    def request(self, method: str, url: str, **kwargs):
+        """
+        发送请求：TwitterAPI.io 的请求按模式录制或回放，其余请求交给内部客户端
+
+        :param method: HTTP方法
+        :param url: 请求URL
+        :param kwargs: 传给 HttpClient.request 的参数
+        :return: 响应对象
+        """
+        if not self._intercepted(url):
+            return self.inner.request(method, url, **kwargs)
+        key = cassette_key(url, kwargs.get('params'))
+        if self.mode == "record":
+            return self._record(method, url, key, **kwargs)
+        return self._replay(url, key)
+
+    def _record(self, method: str, url: str, key: str, **kwargs):
+        started = time.monotonic()
+        response = self.inner.request(method, url, **kwargs)
+        entry = {
+            'key': key,
+            'method': method,
+            'url': url,
+            'params': kwargs.get('params'),
+            'status': response.status_code,
+            'headers': dict(response.headers),
+            'body': response.text,
+            'elapsed': round(time.monotonic() - started, 4),
+            'recorded_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            self.counters['recorded'] += 1
+        return response
+
+    def _inject_error(self, key: str, attempt: int) -> bool:
+        if self.error_rate <= 0:
+            return False
+        digest = hashlib.sha256(f"{self.seed}|{key}|{attempt}".encode('utf-8')).digest()
+        return random.Random(digest).random() < self.error_rate
+
+    def _replay(self, url: str, key: str):
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+            entries = self._entries.get(key)
+            if not entries:
+                self.counters['misses'] += 1
+                entry = None
+            elif self._inject_error(key, attempt):
+                self.counters['injected_errors'] += 1
+                entry = {'status': self.error_status, 'headers': {}, 'elapsed': 0,
+                         'body': json.dumps({'error': 'injected by cassette replay'})}
+            else:
+                served = self._served.get(key, 0)
+                entry = entries[min(served, len(entries) - 1)]
+                self._served[key] = served + 1
+                self.counters['replayed'] += 1
+        if entry is None:
+            return CassetteResponse(404, {}, json.dumps({'error': 'request not found in cassette'}), url)
+        delay = self.latency if self.latency is not None else entry.get('elapsed', 0)
+        if delay:
+            time.sleep(delay)
+        return CassetteResponse(entry['status'], entry.get('headers'), entry.get('body', ''), url)
+
+    def get(self, url: str, **kwargs):
+        """发送GET请求"""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        """发送POST请求"""
+        return self.request('POST', url, **kwargs)
+
+    def stats(self) -> dict:
+        """返回内部客户端的按主机统计，以及录制/回放计数"""
+        with self._lock:
+            cassette = {'mode': self.mode, 'path': self.path, **self.counters}
+        return {**self.inner.stats(), 'cassette': cassette}
+
+    def close(self):
+        """关闭内部客户端的连接"""
+        self.inner.close()
+
+
+def main():
+    """命令行入口：录制或回放一个账号的抓取，输出耗时，用于离线的性能回归对比"""
+    parser = argparse.ArgumentParser(description="录制/回放 TwitterAPI.io 抓取")
+    parser.add_argument("mode", choices=CASSETTE_MODES)
+    parser.add_argument("path", help="cassette 文件路径")
+    parser.add_argument("account", help="Twitter账号（不含@）")
+    parser.add_argument("hours", nargs="?", type=float, default=24, help="回溯小时数，默认24")
+    parser.add_argument("--latency", type=float, default=None, help="回放时每个请求的固定延迟（秒），默认按录制耗时")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="回放时注入错误响应的比例")
+    parser.add_argument("--error-status", type=int, default=503, help="注入的错误状态码")
+    parser.add_argument("--seed", type=int, default=0, help="错误注入的随机种子")
+    args = parser.parse_args()
+
+    from datetime import datetime, timedelta
+    from http_client import HttpClient
+    from twitter_ai_monitor import TwitterAIMonitor
+
+    config = {}
+    if os.path.exists("config.json"):
+        with open("config.json", 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    if args.mode == "record" and not config.get("TWITTER_API_KEY"):
+        print("❌ 录制需要在 config.json 中配置 TWITTER_API_KEY")
+        sys.exit(1)
+
+    client = CassetteHttpClient(HttpClient(), args.path, args.mode, args.latency, args.error_rate,
+                                args.error_status, args.seed)
+    # 使用临时数据目录，不读写正式数据的水位线和索引
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(args.path)), "cassette_run")
+    monitor = TwitterAIMonitor(config.get("TWITTER_API_KEY", "replay"), config.get("LLM_URL", "http://localhost"),
+                               config.get("LLM_API_KEY", "replay"), data_dir=data_dir, http_client=client,
+                               twitter_rate_limit=float(config.get("TWITTER_RATE_LIMIT", 5)))
+    until_time = datetime.utcnow()
+    started = time.time()
+    tweets = monitor.get_tweets_from_account(args.account, until_time - timedelta(hours=args.hours), until_time)
+    print(f"📼 {args.mode}: @{args.account} {len(tweets)} 条推文，耗时 {time.time() - started:.2f} 秒")
+    print(json.dumps(client.stats()['cassette'], ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
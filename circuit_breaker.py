@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型服务的熔断器
+
+所有AI工作线程共用一个熔断器：连续出现服务端故障（超时、连接失败、5xx、429）达到阈值后熔断（open），
+熔断期间的请求立即失败、推文推迟处理，不再逐条走完整个重试流程；冷却时间过后进入半开（half_open），
+只放行一个试探请求，成功则恢复（closed），失败则再次熔断并把冷却时间翻倍。
+"""
+
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """线程安全的熔断器"""
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30, max_recovery_timeout: float = 600,
+                 clock=time.monotonic):
+        """
+        :param failure_threshold: 连续失败多少次后熔断
+        :param recovery_timeout: 熔断后等待多少秒进入半开状态
+        :param max_recovery_timeout: 试探连续失败时冷却时间翻倍的上限（秒）
+        :param clock: 单调时钟（秒），测试时可替换
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_recovery_timeout = recovery_timeout
+        self.max_recovery_timeout = max(recovery_timeout, max_recovery_timeout)
+        self.recovery_timeout = recovery_timeout
+        self.state = CLOSED
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.counters = {
+            'opened': 0,
+            'rejected': 0,
+        }
+        self.last_error = None
+
+    def _remaining(self, now: float) -> float:
+        return max(0.0, self._opened_at + self.recovery_timeout - now)
+
+    def allow(self) -> bool:
+        """
+        请求前调用：是否放行本次请求
+
+        :return: 熔断中返回False
+        """
+        with self._lock:
+            now = self._clock()
+            if self.state == OPEN and self._remaining(now) <= 0:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.counters['rejected'] += 1
+            return False
+
+    def is_open(self) -> bool:
+        """当前是否处于熔断冷却中（不消耗半开状态的试探名额）"""
+        with self._lock:
+            return self.state == OPEN and self._remaining(self._clock()) > 0
+
+    def retry_after(self) -> float:
+        """距离允许下一次试探还有多少秒"""
+        with self._lock:
+            return self._remaining(self._clock()) if self.state == OPEN else 0.0
+
+    def record_success(self):
+        """请求成功"""
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            if self.state != CLOSED:
+                print("✅ 大模型服务已恢复，熔断关闭")
+            self.state = CLOSED
+            self.recovery_timeout = self.base_recovery_timeout
+
+    def record_failure(self, error: str = None):
+        """
+        请求遇到服务端故障
+
+        :param error: 错误描述
+        """
+        with self._lock:
+            self.last_error = error
+            self._failures += 1
+            if self.state == HALF_OPEN:
+                # 试探失败，冷却时间翻倍
+                self.recovery_timeout = min(self.max_recovery_timeout, self.recovery_timeout * 2)
+                self._open()
+            elif self.state == CLOSED and self._failures >= self.failure_threshold:
+                self._open()
+
+    def trip(self, duration: float, error: str = None):
+        """
+        服务端明确要求长时间等待（如 Retry-After 很长）时直接熔断
+
+        :param duration: 熔断持续的秒数（不超过冷却时间上限）
+        :param error: 错误描述
+        """
+        with self._lock:
+            duration = min(duration, self.max_recovery_timeout)
+            if self.state == OPEN and self._remaining(self._clock()) >= duration:
+                return
+            self.last_error = error
+            self.recovery_timeout = max(duration, self.base_recovery_timeout)
+            self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = self._clock()
+        self._trial_in_flight = False
+        self.counters['opened'] += 1
+        print(f"🔌 大模型服务不可用，熔断 {self.recovery_timeout:.0f} 秒: {self.last_error}")
+
+    def stats(self) -> dict:
+        """返回熔断器状态"""
+        with self._lock:
+            now = self._clock()
+            return {
+                **self.counters,
+                'state': self.state,
+                'consecutive_failures': self._failures,
+                'retry_in_seconds': round(self._remaining(now), 1) if self.state == OPEN else 0.0,
+                'recovery_timeout': self.recovery_timeout,
+                'last_error': self.last_error,
+            }
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟推送器
+
+按 TwitterAPI.io webhook 的格式向推送接入接口发送一批模拟推文，用于在本地验证推送链路：
+
+    python fake_pusher.py [接口地址] [推文数] [作者]
+
+默认地址为 http://127.0.0.1:5000/api/ingest，API Key 和签名密钥从 config.json 读取。
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+import requests
+
+
+def build_payload(count: int = 3, author: str = "OpenAI") -> dict:
+    """
+    构造一批模拟推文
+
+    :param count: 推文数
+    :param author: 作者账号
+    :return: webhook 请求体
+    """
+    base_id = int(time.time() * 1000) << 22  # 与真实推文ID一样随时间递增
+    now = datetime.now(timezone.utc)
+    tweets = [
+        {
+            "type": "tweet",
+            "id": str(base_id + i),
+            "url": f"https://x.com/{author}/status/{base_id + i}",
+            "text": f"Fake pushed tweet #{i + 1} from {author} at {now.isoformat()}",
+            "createdAt": format_datetime(now),
+            "author": {"userName": author, "name": author},
+        }
+        for i in range(count)
+    ]
+    return {
+        "event_type": "tweet",
+        "rule_id": "fake-rule",
+        "rule_tag": "fake_pusher",
+        "tweets": tweets,
+        "timestamp": int(time.time() * 1000),
+    }
+
+
+def push(url: str, payload: dict, api_key: str, secret: str = "") -> requests.Response:
+    """
+    发送推送请求（设置了签名密钥时附带 X-Signature）
+
+    :param url: 推送接入接口地址
+    :param payload: 请求体
+    :param api_key: API Key
+    :param secret: 签名密钥
+    :return: 响应对象
+    """
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    headers = {"Content-Type": "application/json", "X-API-Key": api_key}
+    if secret:
+        headers["X-Signature"] = "sha256=" + hmac.new(secret.encode('utf-8'), body, digestmod=hashlib.sha256).hexdigest()
+    return requests.post(url, data=body, headers=headers, timeout=10)
+
+
+def main():
+    """命令行入口"""
+    url = sys.argv[1] if len(sys.argv) > 1 else "http://127.0.0.1:5000/api/ingest"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    author = sys.argv[3] if len(sys.argv) > 3 else "OpenAI"
+
+    config = {}
+    if os.path.exists("config.json"):
+        with open("config.json", 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    api_key = config.get("INGEST_API_KEY") or config.get("TWITTER_API_KEY", "")
+    secret = config.get("INGEST_SECRET", "")
+
+    payload = build_payload(count, author)
+    response = push(url, payload, api_key, secret)
+    print(f"📤 已推送 {count} 条模拟推文: HTTP {response.status_code} {response.text.strip()}")
+    # 同一批再推一次，应全部判定为重复
+    response = push(url, payload, api_key, secret)
+    print(f"🔁 重复推送: HTTP {response.status_code} {response.text.strip()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抓取失败时间窗口的重试队列
+
+每个账号每轮扫描的 (账号, 开始时间, 结束时间) 是一个抓取窗口。窗口抓取失败或只抓到一部分分页时，
+整个窗口进入持久化的重试队列（data/fetch_windows.json），水位线照常推进；
+之后每轮检查时重试到期的窗口，失败则按指数退避延后，成功后移出队列。
+队列中尚未补齐的窗口即为覆盖缺口，可在监控状态中查看。
+"""
+
+import json
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+
+FETCH_WINDOWS_FILE_NAME = "fetch_windows.json"
+
+
+class FetchWindowQueue:
+    """持久化的失败窗口重试队列（线程安全）"""
+
+    def __init__(self, path: str, base_delay: float = 60, max_delay: float = 3600):
+        """
+        :param path: 队列文件路径
+        :param base_delay: 第一次重试前等待的秒数，之后每次失败翻倍
+        :param max_delay: 重试等待的上限（秒）
+        """
+        self.path = path
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._windows = []
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._windows = json.load(f)
+                if self._windows:
+                    print(f"🕳️ 待补抓的时间窗口: {len(self._windows)} 个")
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 读取抓取窗口重试队列失败: {str(e)}")
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._windows, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _delay(self, attempts: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def add(self, account: str, since_time: datetime, until_time: datetime, error: str, partial: int = 0):
+        """
+        记录一个抓取失败的窗口（与同账号首尾相接的窗口合并）
+
+        :param account: 账号
+        :param since_time: 窗口开始时间（UTC）
+        :param until_time: 窗口结束时间（UTC）
+        :param error: 错误信息
+        :param partial: 失败前已抓到的推文数
+        """
+        since, until = since_time.isoformat(), until_time.isoformat()
+        now = datetime.utcnow()
+        with self._lock:
+            for window in self._windows:
+                if window['account'].lower() == account.lower() and window['since'] <= since <= window['until']:
+                    window['until'] = max(window['until'], until)
+                    window['last_error'] = error
+                    break
+            else:
+                self._windows.append({
+                    'account': account,
+                    'since': since,
+                    'until': until,
+                    'attempts': 0,
+                    'partial': partial,
+                    'last_error': error,
+                    'created_at': now.isoformat(),
+                    'next_retry_at': (now + timedelta(seconds=self._delay(1))).isoformat(),
+                })
+            self._save()
+
+    def due(self, now: datetime = None) -> list:
+        """
+        返回已到重试时间的窗口
+
+        :param now: 当前时间（UTC），默认取当前时间
+        :return: 窗口字典列表（副本）
+        """
+        now = (now or datetime.utcnow()).isoformat()
+        with self._lock:
+            return [dict(window) for window in self._windows if window['next_retry_at'] <= now]
+
+    def _find(self, window: dict):
+        for item in self._windows:
+            if item['account'] == window['account'] and item['since'] == window['since']:
+                return item
+        return None
+
+    def complete(self, window: dict):
+        """
+        窗口补抓成功，移出队列
+
+        :param window: due 返回的窗口
+        """
+        with self._lock:
+            item = self._find(window)
+            if item is not None:
+                if item['until'] > window['until']:
+                    # 重试期间又合并进了更晚的失败窗口，保留尚未补抓的部分
+                    item['since'] = window['until']
+                else:
+                    self._windows.remove(item)
+                self._save()
+
+    def fail(self, window: dict, error: str):
+        """
+        窗口补抓失败，按指数退避延后下次重试
+
+        :param window: due 返回的窗口
+        :param error: 错误信息
+        """
+        with self._lock:
+            item = self._find(window)
+            if item is not None:
+                item['attempts'] += 1
+                item['last_error'] = error
+                item['next_retry_at'] = (datetime.utcnow() + timedelta(seconds=self._delay(item['attempts'] + 1))).isoformat()
+                self._save()
+
+    def stats(self) -> dict:
+        """返回覆盖缺口统计"""
+        with self._lock:
+            return {
+                'pending': len(self._windows),
+                'accounts': sorted({window['account'] for window in self._windows}),
+                'oldest_since': min((window['since'] for window in self._windows), default=None),
+                'windows': [dict(window) for window in self._windows],
+            }
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享HTTP客户端
+
+TwitterAPI.io 和钉钉的请求都通过同一个 requests.Session 发出：
+- 按主机维护连接池并保持长连接，翻页和连续推送不再每次重新建立TCP+TLS连接
+- 连接错误和5xx响应按带随机抖动的指数退避自动重试（POST只重试连接错误，避免重复推送）
+- 按主机统计请求数、延迟和连接复用情况
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 自动重试的状态码。429 不在这里重试，也不按 Retry-After 在适配器内等待，
+# 全部返回给调用方，由限流器（RateLimiter.on_response）减速并暂停
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+
+def _host_key(host: str, port) -> str:
+    return host if port in (None, 80, 443) else f"{host}:{port}"
+
+
+class HttpClient:
+    """带连接池、自动重试和按主机统计的HTTP客户端（线程安全）"""
+
+    def __init__(self, pool_size: int = 16, max_retries: int = 3, backoff_factor: float = 0.5,
+                 backoff_jitter: float = 0.5):
+        """
+        :param pool_size: 每个主机保持的最大连接数（应不小于并发抓取线程数）
+        :param max_retries: 连接错误和5xx响应的最大重试次数
+        :param backoff_factor: 指数退避的基数（秒），第n次重试前等待 backoff_factor * 2^(n-1) 秒
+        :param backoff_jitter: 每次退避额外增加的随机等待上限（秒）
+        """
+        self.pool_size = max(1, pool_size)
+        self.max_retries = max(0, max_retries)
+        retry_options = dict(
+            total=self.max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False,
+            # 默认为True时，带 Retry-After 的429也会在urllib3内部重试并等待，限流器看不到这些响应
+            respect_retry_after_header=False,
+        )
+        try:
+            retry = Retry(backoff_jitter=backoff_jitter, **retry_options)
+        except TypeError:
+            # urllib3 2.0 之前不支持 backoff_jitter
+            retry = Retry(**retry_options)
+        self.adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size,
+                                   max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        发送请求并记录该主机的延迟
+
+        :param method: HTTP方法
+        :param url: 请求URL
+        :param kwargs: 传给 requests.Session.request 的参数
+        :return: 响应对象，请求最终失败时抛出 requests.RequestException
+        """
+        parts = urlsplit(url)
+        host = _host_key(parts.hostname, parts.port)
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self._record(host, time.monotonic() - started, failed=True)
+            raise
+        self._record(host, time.monotonic() - started)
+        return response
+
+    def _record(self, host: str, elapsed: float, failed: bool = False):
+        with self._lock:
+            stats = self._hosts.setdefault(host, {'requests': 0, 'errors': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+            stats['requests'] += 1
+            if failed:
+                stats['errors'] += 1
+            stats['total_seconds'] += elapsed
+            stats['max_seconds'] = max(stats['max_seconds'], elapsed)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """发送GET请求"""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """发送POST请求"""
+        return self.request('POST', url, **kwargs)
+
+    def _pool_counts(self) -> dict:
+        # urllib3 连接池记录了建立的连接数和发出的请求数，两者之差即复用连接的请求数
+        counts = {}
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = _host_key(pool.host, pool.port)
+            connections, requests_sent = counts.get(host, (0, 0))
+            counts[host] = (connections + pool.num_connections, requests_sent + pool.num_requests)
+        return counts
+
+    def stats(self) -> dict:
+        """
+        返回按主机的统计
+
+        :return: {主机: {requests, errors, avg_ms, max_ms, connections, reused}}
+        """
+        pool_counts = self._pool_counts()
+        result = {}
+        with self._lock:
+            for host, stats in self._hosts.items():
+                connections, requests_sent = pool_counts.get(host, (0, 0))
+                result[host] = {
+                    'requests': stats['requests'],
+                    'errors': stats['errors'],
+                    'avg_ms': round(stats['total_seconds'] / stats['requests'] * 1000, 1) if stats['requests'] else 0.0,
+                    'max_ms': round(stats['max_seconds'] * 1000, 1),
+                    'connections': connections,
+                    'reused': max(0, requests_sent - connections),
+                }
+        return result
+
+    def close(self):
+        """关闭所有连接"""
+        self.session.close()
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_http_client(pool_size: int = None, max_retries: int = None) -> HttpClient:
+    """
+    获取进程内共享的HTTP客户端
+
+    :param pool_size: 每个主机的最大连接数（仅首次创建时生效）
+    :param max_retries: 最大重试次数（仅首次创建时生效）
+    :return: HttpClient实例
+    """
+    global _shared_client
+
+    with _shared_lock:
+        if _shared_client is None:
+            options = {}
+            if pool_size is not None:
+                options['pool_size'] = pool_size
+            if max_retries is not None:
+                options['max_retries'] = max_retries
+            _shared_client = HttpClient(**options)
+        return _shared_client
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型处理结果的内容寻址缓存
+
+转推、引用和不同账号的同文转发常常是同一段文字。AI处理结果按 hash(模型, 提示词版本, 预处理后的文本)
+缓存在 data/llm_cache.db，相同内容不再重复调用大模型：
+- 总大小超过上限时按最近使用时间淘汰（LRU），总大小和条目数在启动时统计一次，之后随写入和淘汰增减
+- 同一内容的并发请求合并为一次大模型调用（singleflight），其余请求等待并共用结果
+- 命中率等统计见监控状态
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+LLM_CACHE_DB_NAME = "llm_cache.db"
+
+
+def llm_cache_key(model: str, prompt_version: str, text: str) -> str:
+    """
+    缓存键：模型、提示词版本和预处理后文本的SHA-256
+
+    :param model: 模型名称
+    :param prompt_version: 提示词版本（提示词或处理模式变化时更换，旧结果自然失效）
+    :param text: 预处理后的推文内容
+    :return: 十六进制哈希
+    """
+    return hashlib.sha256(f"{model}\x00{prompt_version}\x00{text}".encode('utf-8')).hexdigest()
+
+
+class _Flight:
+    """正在进行的一次计算，等待者共用其结果"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class LLMResultCache:
+    """持久化的LRU结果缓存（线程安全）"""
+
+    def __init__(self, db_path: str, max_bytes: int = 64 * 1024 * 1024):
+        """
+        :param db_path: 缓存数据库文件路径
+        :param max_bytes: 缓存结果的总字节数上限，超出时淘汰最久未使用的条目；为0时不缓存（仍合并并发请求）
+        """
+        self.db_path = db_path
+        self.max_bytes = max(0, max_bytes)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._flights_lock = threading.Lock()
+        self._flights = {}
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'stored': 0,
+            'evicted': 0,
+        }
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.init_database()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def init_database(self):
+        """初始化缓存表"""
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)')
+        conn.commit()
+        self._entries, self._total_bytes = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache').fetchone()
+
+    def get(self, key: str):
+        """
+        查找缓存并刷新最近使用时间
+
+        :param key: 缓存键
+        :return: 缓存的结果，不存在时返回None
+        """
+        conn = self._connect()
+        row = conn.execute('SELECT value FROM llm_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        with self._write_lock:
+            conn.execute('UPDATE llm_cache SET last_used = ? WHERE key = ?', (time.time(), key))
+            conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, value):
+        """
+        写入缓存，总大小超出上限时淘汰最久未使用的条目
+
+        :param key: 缓存键
+        :param value: 可JSON序列化的结果
+        """
+        if self.max_bytes <= 0:
+            return
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._write_lock:
+            conn = self._connect()
+            row = conn.execute('SELECT size FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            conn.execute('INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)',
+                         (key, data, size, now, now))
+            self.counters['stored'] += 1
+            if row is None:
+                self._entries += 1
+                self._total_bytes += size
+            else:
+                self._total_bytes += size - row[0]
+            # 按最近使用时间从旧到新分批淘汰（走 last_used 索引），直到总大小回到上限以内
+            while self._total_bytes > self.max_bytes:
+                oldest = conn.execute('SELECT key, size FROM llm_cache WHERE key != ? ORDER BY last_used LIMIT 64',
+                                      (key,)).fetchall()
+                if not oldest:
+                    break
+                for old_key, old_size in oldest:
+                    if self._total_bytes <= self.max_bytes:
+                        break
+                    conn.execute('DELETE FROM llm_cache WHERE key = ?', (old_key,))
+                    self._entries -= 1
+                    self._total_bytes -= old_size
+                    self.counters['evicted'] += 1
+            conn.commit()
+
+    def get_or_compute(self, key: str, compute, cacheable=None):
+        """
+        命中缓存时直接返回；否则计算并写入缓存。同一键的并发请求只计算一次
+
+        :param key: 缓存键
+        :param compute: 无参数的计算函数
+        :param cacheable: 以结果调用，返回False时不写入缓存（如处理失败的结果），默认全部缓存
+        :return: 结果
+        """
+        value = self.get(key)
+        if value is not None:
+            with self._flights_lock:
+                self.counters['hits'] += 1
+            return value
+
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.counters['misses'] += 1
+            else:
+                self.counters['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            # 上一个计算者可能在本线程查缓存之后、登记之前刚写入缓存
+            value = self.get(key)
+            if value is not None:
+                with self._flights_lock:
+                    self.counters['misses'] -= 1
+                    self.counters['hits'] += 1
+                flight.result = value
+                return value
+            flight.result = compute()
+            if cacheable is None or cacheable(flight.result):
+                try:
+                    self.put(key, flight.result)
+                except (sqlite3.Error, TypeError, ValueError) as e:
+                    print(f"⚠️ 写入AI结果缓存失败: {str(e)}")
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def stats(self) -> dict:
+        """返回缓存统计"""
+        with self._write_lock:
+            entries, size = self._entries, self._total_bytes
+        with self._flights_lock:
+            counters = dict(self.counters)
+            in_flight = len(self._flights)
+        lookups = counters['hits'] + counters['misses'] + counters['coalesced']
+        return {
+            **counters,
+            'hit_rate': round((counters['hits'] + counters['coalesced']) / lookups, 4) if lookups else 0.0,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'in_flight': in_flight,
+        }
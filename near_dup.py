@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+近似重复推文检测（SimHash）
+
+宣传活动中常有多条几乎相同的推文（只是链接或表情不同），分布在多个账号下。
+AI处理前先计算归一化文本的64位SimHash指纹，在最近推文的指纹索引中查找汉明距离不超过阈值的推文，
+找到时直接复用其翻译、解读和标题。
+
+指纹按"分段"建索引：把64位分成 (阈值+1) 段，距离不超过阈值的两个指纹至少有一段完全相同（抽屉原理），
+所以只需按各段精确查找候选，再计算完整的汉明距离。索引保存在 data/near_dup.db，只保留最近若干天的指纹。
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+NEAR_DUP_DB_NAME = "near_dup.db"
+FINGERPRINT_BITS = 64
+
+_URL_PATTERN = re.compile(r'https?://\S+')
+_TOKEN_PATTERN = re.compile(r'[a-z0-9一-鿿]+(?:\'[a-z]+)?')
+
+
+def normalize_text(text: str) -> list:
+    """
+    归一化推文文本：去掉链接、表情和标点，转为小写后切分为词
+
+    :param text: 推文原文
+    :return: 词列表
+    """
+    text = _URL_PATTERN.sub(' ', (text or '').lower())
+    text = re.sub(r'^rt @\w+:', ' ', text)
+    return _TOKEN_PATTERN.findall(text)
+
+
+def _hash64(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(tokens: list) -> int:
+    """
+    计算64位SimHash指纹（特征为单词和相邻两词，按出现次数加权）
+
+    :param tokens: 归一化后的词列表
+    :return: 无符号64位整数
+    """
+    features = {}
+    for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        features[feature] = features.get(feature, 0) + 1
+    weights = [0] * FINGERPRINT_BITS
+    for feature, count in features.items():
+        value = _hash64(feature)
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += count if value >> bit & 1 else -count
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个指纹不同的位数"""
+    return bin(a ^ b).count('1')
+
+
+def _signed(value: int) -> int:
+    # SQLite 的 INTEGER 是有符号64位
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class NearDuplicateIndex:
+    """最近推文的SimHash分段索引（线程安全）"""
+
+    def __init__(self, db_path: str, max_distance: int = 3, window_days: float = 7, min_tokens: int = 5):
+        """
+        :param db_path: 索引数据库文件路径
+        :param max_distance: 判定为近似重复的最大汉明距离
+        :param window_days: 只和最近多少天内加入索引的推文比较
+        :param min_tokens: 归一化后少于这么多个词的推文不参与检测（短文本指纹区分度低）
+        """
+        self.db_path = db_path
+        self.max_distance = max(0, min(max_distance, 15))
+        self.bands = self.max_distance + 1
+        self.band_bits = FINGERPRINT_BITS // self.bands
+        self.window_seconds = window_days * 86400
+        self.min_tokens = min_tokens
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._last_prune = 0.0
+        self.counters = {
+            'checked': 0,
+            'matched': 0,
+            'indexed': 0,
+        }
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.init_database()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def init_database(self):
+        """初始化指纹表和分段表"""
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                tweet_id TEXT PRIMARY KEY,
+                fingerprint INTEGER NOT NULL,
+                added_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS fingerprint_bands (
+                band TEXT NOT NULL,
+                value INTEGER NOT NULL,
+                tweet_id TEXT NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_fingerprint_bands ON fingerprint_bands (band, value)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_fingerprints_added ON fingerprints (added_at)')
+        conn.commit()
+
+    def _bands(self, fingerprint: int):
+        # 分段键带上分段方式，调整阈值后旧分段不会被误用
+        mask = (1 << self.band_bits) - 1
+        for i in range(self.bands):
+            yield f"{self.bands}:{i}", _signed(fingerprint >> (i * self.band_bits) & mask)
+
+    def fingerprint(self, text: str):
+        """
+        :param text: 推文原文
+        :return: 指纹，文本太短时返回None
+        """
+        tokens = normalize_text(text)
+        if len(tokens) < self.min_tokens:
+            return None
+        return simhash(tokens)
+
+    def find(self, text: str, exclude_id: str = None):
+        """
+        查找最近的近似重复推文
+
+        :param text: 推文原文
+        :param exclude_id: 不参与匹配的推文ID（通常是推文自身）
+        :return: (推文ID, 汉明距离)，没有找到时返回None
+        """
+        fingerprint = self.fingerprint(text)
+        if fingerprint is None:
+            return None
+        conn = self._connect()
+        since = time.time() - self.window_seconds
+        best = None
+        seen = set()
+        for band, value in self._bands(fingerprint):
+            rows = conn.execute('''
+                SELECT f.tweet_id, f.fingerprint FROM fingerprint_bands b
+                JOIN fingerprints f ON f.tweet_id = b.tweet_id
+                WHERE b.band = ? AND b.value = ? AND f.added_at >= ?
+            ''', (band, value, since)).fetchall()
+            for tweet_id, candidate in rows:
+                if tweet_id in seen or tweet_id == exclude_id:
+                    continue
+                seen.add(tweet_id)
+                distance = hamming_distance(fingerprint, candidate & ((1 << 64) - 1))
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (tweet_id, distance)
+        with self._write_lock:
+            self.counters['checked'] += 1
+            if best is not None:
+                self.counters['matched'] += 1
+        return best
+
+    def add(self, tweet_id: str, text: str) -> bool:
+        """
+        把一条推文的指纹加入索引
+
+        :param tweet_id: 推文ID
+        :param text: 推文原文
+        :return: 是否加入（文本太短或已存在时返回False）
+        """
+        fingerprint = self.fingerprint(text)
+        if fingerprint is None or not tweet_id:
+            return False
+        tweet_id = str(tweet_id)
+        now = time.time()
+        with self._write_lock:
+            conn = self._connect()
+            cursor = conn.execute('INSERT OR IGNORE INTO fingerprints (tweet_id, fingerprint, added_at) VALUES (?, ?, ?)',
+                                  (tweet_id, _signed(fingerprint), now))
+            if cursor.rowcount == 0:
+                return False
+            conn.executemany('INSERT INTO fingerprint_bands (band, value, tweet_id) VALUES (?, ?, ?)',
+                             [(band, value, tweet_id) for band, value in self._bands(fingerprint)])
+            self.counters['indexed'] += 1
+            # 每小时清理一次超出时间窗口的指纹
+            if now - self._last_prune >= 3600:
+                self._last_prune = now
+                expired = now - self.window_seconds
+                conn.execute('DELETE FROM fingerprint_bands WHERE tweet_id IN '
+                             '(SELECT tweet_id FROM fingerprints WHERE added_at < ?)', (expired,))
+                conn.execute('DELETE FROM fingerprints WHERE added_at < ?', (expired,))
+            conn.commit()
+            return True
+
+    def stats(self) -> dict:
+        """返回近似重复检测统计"""
+        entries = self._connect().execute('SELECT COUNT(*) FROM fingerprints').fetchone()[0]
+        with self._write_lock:
+            return {
+                **self.counters,
+                'entries': entries,
+                'max_distance': self.max_distance,
+            }
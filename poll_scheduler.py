@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按账号活跃度自适应的轮询调度器
+
+根据已存储推文估计每个账号的发帖频率，在总请求预算内分配各账号的轮询间隔：
+轮询频率与发帖频率的平方根成正比（在固定总轮询次数下使新推文的平均发现延迟最小），
+活跃账号更频繁地检查，冷门账号拉长间隔。调度器用按下次检查时间排序的小顶堆保存各账号。
+"""
+
+import heapq
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+from tweet_store import BEIJING_TZ, tweet_epoch
+
+
+class PollScheduler:
+    """自适应轮询调度器（线程安全）"""
+
+    def __init__(self, accounts: list, store=None, budget_per_hour: float = None, check_interval: int = 300,
+                 min_interval: int = 60, max_interval: int = 3600, lookback_days: int = 14,
+                 refresh_interval: int = 3600):
+        """
+        :param accounts: 监控的账号列表
+        :param store: 推文存储（TweetStore），用于估计发帖频率，为空时所有账号按相同频率轮询
+        :param budget_per_hour: 每小时最多检查多少个账号次，为空时与按 check_interval 统一轮询的总量相同
+        :param check_interval: 原统一检查间隔（秒），用于推算默认预算
+        :param min_interval: 单个账号的最短轮询间隔（秒）
+        :param max_interval: 单个账号的最长轮询间隔（秒）
+        :param lookback_days: 估计发帖频率时统计最近多少天的推文
+        :param refresh_interval: 每隔多少秒按存储重新估计发帖频率
+        """
+        self.accounts = list(dict.fromkeys(accounts))
+        self.store = store
+        self.budget_per_hour = budget_per_hour or len(self.accounts) * 3600 / max(1, check_interval)
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.lookback_days = lookback_days
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._rates = {}        # 账号 -> 每小时发帖数
+        self._intervals = {}    # 账号 -> 轮询间隔（秒）
+        self._heap = []         # (下次检查时间, 账号)
+        self._due_at = {}
+        self._last_refresh = 0.0
+        self.refresh_rates()
+        # 启动时所有账号立即检查一次
+        now = time.time()
+        for account in self.accounts:
+            self._due_at[account] = now
+            heapq.heappush(self._heap, (now, account))
+
+    def _count_recent(self) -> dict:
+        counts = {account.lower(): 0 for account in self.accounts}
+        if self.store is None:
+            return counts
+        start = datetime.now(BEIJING_TZ) - timedelta(days=self.lookback_days)
+        start_epoch = int(start.timestamp())
+        # 按发帖时间倒序归并读取，早于统计窗口即停止
+        for tweet in self.store.iter_newest(start_date=start.strftime("%Y-%m-%d")):
+            epoch = tweet_epoch(tweet)
+            if epoch and epoch < start_epoch:
+                break
+            author = (tweet.get('author') or '').lower()
+            if author in counts:
+                counts[author] += 1
+        return counts
+
+    def refresh_rates(self):
+        """按存储中最近的推文重新估计发帖频率，并重新分配轮询间隔"""
+        try:
+            counts = self._count_recent()
+        except Exception as e:
+            print(f"⚠️ 统计账号发帖频率失败，按统一频率轮询: {str(e)}")
+            counts = {account.lower(): 0 for account in self.accounts}
+        hours = self.lookback_days * 24
+        with self._lock:
+            # 加1条先验，避免从未发帖的账号频率为0
+            self._rates = {account: (counts.get(account.lower(), 0) + 1) / hours for account in self.accounts}
+            self._intervals = self._allocate(self._rates)
+            self._last_refresh = time.time()
+
+    def _allocate(self, rates: dict) -> dict:
+        if not rates:
+            return {}
+        weights = {account: math.sqrt(rate) for account, rate in rates.items()}
+        total = sum(weights.values())
+        budget = self.budget_per_hour / 3600  # 每秒检查次数
+        intervals = {}
+        for account, weight in weights.items():
+            frequency = budget * weight / total
+            intervals[account] = min(self.max_interval, max(self.min_interval, 1 / frequency))
+        # 最短间隔的下限可能使总量超出预算，按比例整体放宽
+        spend = sum(1 / interval for interval in intervals.values())
+        if spend > budget:
+            scale = spend / budget
+            intervals = {account: min(self.max_interval, interval * scale) for account, interval in intervals.items()}
+        return intervals
+
+    def _schedule(self, account: str, now: float):
+        due = now + self._intervals.get(account, self.max_interval)
+        self._due_at[account] = due
+        heapq.heappush(self._heap, (due, account))
+
+    def pop_due(self, now: float = None) -> list:
+        """
+        取出所有已到检查时间的账号
+
+        :param now: 当前时间戳，默认取当前时间
+        :return: 账号列表
+        """
+        now = now or time.time()
+        if now - self._last_refresh >= self.refresh_interval:
+            self.refresh_rates()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                when, account = heapq.heappop(self._heap)
+                if self._due_at.get(account) == when:
+                    due.append(account)
+                    self._due_at.pop(account)
+        return due
+
+    def reschedule(self, accounts: list, new_tweets: dict = None, now: float = None):
+        """
+        账号检查完成后安排下一次检查；本轮发现新推文的账号立即调高其频率估计
+
+        :param accounts: 本轮检查的账号
+        :param new_tweets: {账号: 新推文数}
+        :param now: 当前时间戳，默认取当前时间
+        """
+        now = now or time.time()
+        hours = self.lookback_days * 24
+        with self._lock:
+            if new_tweets and any(new_tweets.values()):
+                for account, count in new_tweets.items():
+                    if account in self._rates:
+                        self._rates[account] += count / hours
+                self._intervals = self._allocate(self._rates)
+            for account in accounts:
+                self._schedule(account, now)
+
+    def next_due(self):
+        """
+        :return: 最早的下次检查时间戳，没有账号时返回None
+        """
+        with self._lock:
+            return min(self._due_at.values(), default=None)
+
+    def stats(self) -> dict:
+        """返回各账号的发帖频率估计、轮询间隔和下次检查时间"""
+        with self._lock:
+            return {
+                'budget_per_hour': round(self.budget_per_hour, 1),
+                'planned_per_hour': round(sum(3600 / interval for interval in self._intervals.values()), 1),
+                'accounts': {
+                    account: {
+                        'tweets_per_day': round(self._rates.get(account, 0) * 24, 2),
+                        'interval_seconds': round(self._intervals.get(account, 0)),
+                        'next_check': datetime.fromtimestamp(self._due_at[account]).isoformat() if account in self._due_at else None,
+                    }
+                    for account in self.accounts
+                },
+            }
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应令牌桶限流器与并发限制器
+
+多个抓取线程共用一个限流器：每次请求前取一个令牌，请求完成后把响应状态和响应头反馈给限流器。
+- 正常响应时速率逐步回升到配置的上限（加性增，每秒约回升上限的1/20）
+- 遇到429时速率减半（乘性减），并按 Retry-After 暂停发放令牌
+- 响应头带有 X-RateLimit-Remaining / X-RateLimit-Reset 时，额度用完后暂停到重置时间
+
+大模型调用按同时进行的请求数限制（ConcurrencyLimiter）：成功时并发上限加性回升，遇到429或超时时减半。
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+def parse_retry_seconds(value, now: float = None):
+    """
+    解析 Retry-After / X-RateLimit-Reset 响应头
+
+    :param value: 响应头的值：秒数、HTTP日期，或（X-RateLimit-Reset）Unix时间戳
+    :param now: 当前Unix时间，默认取 time.time()
+    :return: 需要等待的秒数，无法解析时返回None
+    """
+    if value is None:
+        return None
+    if now is None:
+        now = time.time()
+    try:
+        number = float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+        except (TypeError, ValueError):
+            return None
+    if number > 1e9:
+        return max(0.0, number - now)
+    return max(0.0, number)
+
+
+class RateLimiter:
+    """线程安全的自适应令牌桶"""
+
+    def __init__(self, rate: float = 5.0, min_rate: float = 0.2, default_retry_after: float = 5.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        :param rate: 每秒最多请求数（速率上限，初始即按此速率发放）
+        :param min_rate: 连续429时速率的下限
+        :param default_retry_after: 429响应没有 Retry-After 时暂停的秒数
+        :param clock: 单调时钟（秒），测试时可替换
+        :param sleep: 等待函数，测试时可替换
+        """
+        self.max_rate = max(min_rate, rate)
+        self.min_rate = min_rate
+        self.rate = self.max_rate
+        self.default_retry_after = default_retry_after
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = max(1.0, self.rate)
+        self._last = clock()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.counters = {
+            'requests': 0,
+            'throttled': 0,
+            'waited_seconds': 0.0,
+        }
+
+    def _refill(self, now: float):
+        self._tokens = min(max(1.0, self.rate), self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self) -> float:
+        """
+        取一个令牌，没有令牌时阻塞等待
+
+        :return: 本次等待的秒数
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    self.counters['requests'] += 1
+                    self.counters['waited_seconds'] += waited
+                    return waited
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+    def on_response(self, status_code: int, headers=None):
+        """
+        根据响应调整速率
+
+        :param status_code: HTTP状态码
+        :param headers: 响应头（大小写不敏感的映射，如 requests 的 response.headers）
+        """
+        headers = headers or {}
+        wall_now = time.time()
+        with self._lock:
+            now = self._clock()
+            pause = None
+            if status_code == 429:
+                self.counters['throttled'] += 1
+                # 同一次限流暂停期间陆续返回的429（暂停前已发出的请求）只降速一次
+                if now >= self._blocked_until:
+                    self.rate = max(self.min_rate, self.rate / 2)
+                self._tokens = 0.0
+                pause = parse_retry_seconds(headers.get('Retry-After'), wall_now)
+                if pause is None:
+                    pause = parse_retry_seconds(headers.get('X-RateLimit-Reset'), wall_now)
+                if pause is None:
+                    pause = self.default_retry_after
+            elif 200 <= status_code < 300:
+                # 每秒大约回升上限的1/20（按当前速率折算到每次成功的请求）
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20 / max(1.0, self.rate))
+                remaining = headers.get('X-RateLimit-Remaining')
+                if remaining is not None:
+                    try:
+                        if float(remaining) <= 0:
+                            pause = parse_retry_seconds(headers.get('X-RateLimit-Reset'), wall_now)
+                    except ValueError:
+                        pass
+            if pause:
+                self._blocked_until = max(self._blocked_until, now + pause)
+
+    def stats(self) -> dict:
+        """返回限流统计"""
+        with self._lock:
+            return {
+                **self.counters,
+                'waited_seconds': round(self.counters['waited_seconds'], 2),
+                'rate': round(self.rate, 3),
+                'max_rate': self.max_rate,
+                'paused_for': round(max(0.0, self._blocked_until - self._clock()), 2),
+            }
+
+
+class ConcurrencyLimiter:
+    """按AIMD调整并发上限的限制器（线程安全）"""
+
+    def __init__(self, max_limit: int = 4, initial_limit: int = None, min_limit: int = 1):
+        """
+        :param max_limit: 并发上限的最大值
+        :param initial_limit: 初始并发上限，默认为最大值的一半
+        :param min_limit: 连续限流时并发上限的下限
+        """
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        if initial_limit is None:
+            initial_limit = (self.max_limit + 1) // 2
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial_limit)))
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self.counters = {
+            'requests': 0,
+            'throttled': 0,
+            'waited_seconds': 0.0,
+        }
+
+    def acquire(self) -> float:
+        """
+        占用一个并发名额，达到上限时阻塞等待
+
+        :return: 本次等待的秒数
+        """
+        started = time.monotonic()
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            waited = time.monotonic() - started
+            self.counters['requests'] += 1
+            self.counters['waited_seconds'] += waited
+            return waited
+
+    def release(self, throttled: bool = False, succeeded: bool = True):
+        """
+        释放名额并调整并发上限
+
+        :param throttled: 请求遇到429或超时，上限减半
+        :param succeeded: 请求成功，上限每满一个窗口加1
+        """
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            if throttled:
+                self.counters['throttled'] += 1
+                self.limit = max(float(self.min_limit), self.limit / 2)
+            elif succeeded:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        """返回并发限制统计"""
+        with self._cond:
+            return {
+                **self.counters,
+                'waited_seconds': round(self.counters['waited_seconds'], 2),
+                'limit': round(self.limit, 2),
+                'max_limit': self.max_limit,
+                'in_flight': self.in_flight,
+            }
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+推文全文检索模块
+
+使用 SQLite FTS5 对原文、AI标题、AI翻译和AI解读建立全文索引。
+trigram 分词器按三字切分，中英文都能直接检索，但匹配不了不足三个字的检索词（如"比特"、"AI"），
+对这类检索词 LIKE 只能逐行扫描全部推文。因此另建一个短词索引 search_short：每条推文的单字和相邻两字
+（不跨空白，转为小写）编码为十六进制后作为 unicode61 的词元，一字、两字的检索词按词元精确匹配。
+推文保存时增量写入索引，也可以从推文存储整体重建：
+
+    python search_index.py rebuild [数据目录]
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from tweet_store import date_range_to_epochs, normalize_tweet
+
+SEARCH_DB_NAME = "search.db"
+SEARCH_FIELDS = ('original_text', 'ai_title', 'ai_translation', 'ai_analysis')
+# 不超过这个长度的检索词走短词索引
+SHORT_TERM_MAX = 2
+
+
+def short_term_token(term: str) -> str:
+    """
+    短检索词在短词索引中的词元（小写后UTF-8编码的十六进制，unicode61 分词器不会再切分）
+
+    :param term: 一字或两字的检索词
+    :return: 词元
+    """
+    return term.lower().encode('utf-8').hex()
+
+
+def short_grams(texts) -> str:
+    """
+    文本中全部单字和相邻两字（不跨空白）的词元，空格分隔、去重
+
+    :param texts: 文本列表
+    :return: 写入短词索引的内容
+    """
+    grams = set()
+    for text in texts:
+        text = (text or '').lower()
+        for i, char in enumerate(text):
+            if char.isspace():
+                continue
+            grams.add(char)
+            if i + 1 < len(text) and not text[i + 1].isspace():
+                grams.add(text[i:i + 2])
+    return ' '.join(gram.encode('utf-8').hex() for gram in grams)
+
+
+class SearchIndex:
+    """推文全文索引"""
+
+    def __init__(self, db_path: str = os.path.join("data", SEARCH_DB_NAME)):
+        """
+        :param db_path: 索引数据库文件路径
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self.trigram = True
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.init_database()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def init_database(self):
+        """初始化索引表"""
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS search_docs (
+                id TEXT PRIMARY KEY,
+                author TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+                created_at_epoch INTEGER
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_search_docs_created ON search_docs (created_at_epoch)')
+        try:
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5({', '.join(SEARCH_FIELDS)}, tokenize='trigram')")
+        except sqlite3.OperationalError:
+            # SQLite 3.34 之前没有 trigram 分词器，退化为 LIKE 匹配
+            print("⚠️ 当前SQLite不支持trigram分词器，全文检索将使用LIKE匹配")
+            self.trigram = False
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5({', '.join(SEARCH_FIELDS)})")
+        short_exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_short'").fetchone()
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS search_short USING fts5(grams, tokenize='unicode61')")
+        if not short_exists:
+            # 升级前建立的索引：从全文索引中已有的内容补建短词索引
+            rows = conn.execute(f"SELECT rowid, {', '.join(SEARCH_FIELDS)} FROM search_fts").fetchall()
+            conn.executemany('INSERT INTO search_short (rowid, grams) VALUES (?, ?)',
+                             ((row[0], short_grams(row[1:])) for row in rows))
+            if rows:
+                print(f"🔎 已为 {len(rows)} 条推文补建短词索引")
+        conn.commit()
+
+    def _insert(self, conn, tweet_data: dict) -> bool:
+        tweet_id = tweet_data.get('id')
+        if not tweet_id:
+            return False
+        normalize_tweet(tweet_data)
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO search_docs (id, author, created_at_epoch) VALUES (?, ?, ?)',
+            (str(tweet_id), tweet_data.get('author') or '', tweet_data.get('created_at_epoch')))
+        if cursor.rowcount == 0:
+            return False
+        values = tuple(tweet_data.get(field) or '' for field in SEARCH_FIELDS)
+        conn.execute(
+            f"INSERT INTO search_fts (rowid, {', '.join(SEARCH_FIELDS)}) VALUES (?, ?, ?, ?, ?)",
+            (cursor.lastrowid,) + values)
+        conn.execute('INSERT INTO search_short (rowid, grams) VALUES (?, ?)', (cursor.lastrowid, short_grams(values)))
+        return True
+
+    def add(self, tweet_data: dict) -> bool:
+        """
+        把一条推文加入索引（已存在时忽略）
+
+        :param tweet_data: 推文数据
+        :return: 是否新加入
+        """
+        with self._write_lock:
+            conn = self._connect()
+            added = self._insert(conn, tweet_data)
+            conn.commit()
+            return added
+
+    def add_many(self, tweets) -> int:
+        """
+        批量加入索引（单个事务）
+
+        :param tweets: 推文数据列表
+        :return: 新加入的条数
+        """
+        with self._write_lock:
+            conn = self._connect()
+            added = sum(1 for tweet in tweets if self._insert(conn, tweet))
+            conn.commit()
+            return added
+
+    def count(self) -> int:
+        """返回已索引的推文数量"""
+        return self._connect().execute('SELECT COUNT(*) FROM search_docs').fetchone()[0]
+
+    def ensure_built(self, store) -> int:
+        """
+        索引条数少于推文存储时补齐缺失的推文（首次启用或索引文件丢失时）
+
+        :param store: 推文存储（TweetStore）
+        :return: 新加入的条数
+        """
+        if self.count() >= store.count():
+            return 0
+        started = time.time()
+        added = self.add_many(store.all())
+        print(f"🔎 全文索引已补齐 {added} 条推文，耗时 {time.time() - started:.2f} 秒")
+        return added
+
+    @staticmethod
+    def _quote(term: str) -> str:
+        return '"' + term.replace('"', '""') + '"'
+
+    def search(self, query: str, author: str = None, start_date: str = None, end_date: str = None,
+               limit: int = 20, offset: int = 0) -> tuple:
+        """
+        全文检索，多个检索词（空格分隔）需同时匹配，结果按发帖时间倒序
+
+        :param query: 检索词
+        :param author: 作者（不区分大小写），为空表示不限
+        :param start_date: 开始日期 (YYYY-MM-DD，北京时间)
+        :param end_date: 结束日期 (YYYY-MM-DD，北京时间，包含当天)
+        :param limit: 每页条数
+        :param offset: 跳过的条数
+        :return: (推文ID列表, 匹配总数)
+        """
+        terms = [t for t in query.split() if t]
+        if not terms:
+            return [], 0
+
+        conditions = []
+        params = []
+        match_terms = [t for t in terms if self.trigram and len(t) > SHORT_TERM_MAX]
+        short_terms = [t for t in terms if len(t) <= SHORT_TERM_MAX]
+        like_terms = [t for t in terms if t not in match_terms and t not in short_terms]
+        if match_terms:
+            conditions.append('search_fts MATCH ?')
+            params.append(' '.join(self._quote(t) for t in match_terms))
+        if short_terms:
+            conditions.append('f.rowid IN (SELECT rowid FROM search_short WHERE search_short MATCH ?)')
+            params.append(' '.join(self._quote(short_term_token(t)) for t in short_terms))
+        for term in like_terms:
+            # 只有不支持 trigram 的旧版 SQLite 会走到这里
+            pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            conditions.append('(' + ' OR '.join(f"f.{field} LIKE ? ESCAPE '\\'" for field in SEARCH_FIELDS) + ')')
+            params.extend([pattern] * len(SEARCH_FIELDS))
+
+        start_epoch, end_epoch = date_range_to_epochs(start_date, end_date)
+        if author:
+            conditions.append('d.author = ?')
+            params.append(author)
+        if start_epoch is not None:
+            conditions.append('d.created_at_epoch >= ?')
+            params.append(start_epoch)
+        if end_epoch is not None:
+            conditions.append('d.created_at_epoch < ?')
+            params.append(end_epoch)
+
+        where = ' AND '.join(conditions)
+        base = f'FROM search_fts f JOIN search_docs d ON d.rowid = f.rowid WHERE {where}'
+        conn = self._connect()
+        total = conn.execute(f'SELECT COUNT(*) {base}', params).fetchone()[0]
+        rows = conn.execute(f'SELECT d.id {base} ORDER BY d.created_at_epoch DESC LIMIT ? OFFSET ?',
+                            params + [limit, offset]).fetchall()
+        return [row[0] for row in rows], total
+
+    def rebuild(self, store) -> int:
+        """
+        清空并从推文存储重建索引
+
+        :param store: 推文存储（TweetStore）
+        :return: 索引条数
+        """
+        with self._write_lock:
+            conn = self._connect()
+            conn.execute('DELETE FROM search_docs')
+            conn.execute('DELETE FROM search_fts')
+            conn.execute('DELETE FROM search_short')
+            conn.commit()
+        return self.add_many(store.all())
+
+    def close(self):
+        """关闭当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def main():
+    """命令行入口"""
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    data_dir = sys.argv[2] if len(sys.argv) > 2 else "data"
+
+    if command == "rebuild":
+        import json
+        from tweet_store import create_tweet_store
+
+        backend = "file"
+        if os.path.exists("config.json"):
+            with open("config.json", 'r', encoding='utf-8') as f:
+                backend = json.load(f).get("STORAGE_BACKEND", "file")
+        started = time.time()
+        count = SearchIndex(os.path.join(data_dir, SEARCH_DB_NAME)).rebuild(create_tweet_store(backend, data_dir))
+        print(f"✅ 全文索引已重建: {count} 条，耗时 {time.time() - started:.2f} 秒")
+    else:
+        print("用法:")
+        print("  python search_index.py rebuild [数据目录]   # 从推文存储重建全文索引")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已见推文ID索引
+
+在AI处理之前过滤掉已经存储过的推文：先查持久化的布隆过滤器（不在其中的一定是新推文），
+命中时再向推文存储做精确确认，避免误判丢推文。
+布隆过滤器每批保存后写回磁盘，同时记录当时推文存储的版本标识（TweetStore.generation）；
+加载时版本标识不一致（上次未写回就退出，或其他进程如导入命令写入了推文）时从存储重建。
+"""
+
+import hashlib
+import math
+import os
+import struct
+import threading
+
+BLOOM_FILE_NAME = "seen_ids.bloom"
+BLOOM_MAGIC = b"BLM2"
+BLOOM_HEADER = struct.Struct("<4sQdIQQH")  # magic, capacity, error_rate, k, m(bits), count, 存储版本标识长度
+
+# 每条推文在 process_tweet_with_ai 中的大模型调用次数（逐项调用时为翻译、解读、标题三次）
+LLM_CALLS_PER_TWEET = 3
+
+
+class BloomFilter:
+    """简单的布隆过滤器（双重哈希）"""
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.001):
+        """
+        :param capacity: 预计容纳的元素数量
+        :param error_rate: 期望的误判率
+        """
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.m = max(8, int(-self.capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.k = max(1, int(round(self.m / self.capacity * math.log(2))))
+        self.bits = bytearray((self.m + 7) // 8)
+        self.count = 0
+        self.generation = ""    # 布隆过滤器包含其全部推文ID的存储版本
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.k):
+            yield (h1 + i * h2) % self.m
+
+    def add(self, key: str):
+        """加入一个元素"""
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def save(self, path: str):
+        """原子写入到文件"""
+        tmp_path = path + ".tmp"
+        generation = self.generation.encode('utf-8')
+        with open(tmp_path, 'wb') as f:
+            f.write(BLOOM_HEADER.pack(BLOOM_MAGIC, self.capacity, self.error_rate, self.k, self.m, self.count,
+                                      len(generation)))
+            f.write(generation)
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """
+        从文件读取布隆过滤器
+
+        :return: BloomFilter实例，文件不存在、损坏或是旧版格式时返回None
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(BLOOM_HEADER.size)
+                magic, capacity, error_rate, k, m, count, generation_size = BLOOM_HEADER.unpack(header)
+                if magic != BLOOM_MAGIC:
+                    return None
+                generation = f.read(generation_size).decode('utf-8')
+                bits = bytearray(f.read())
+        except (OSError, struct.error, UnicodeDecodeError):
+            return None
+        if len(bits) != (m + 7) // 8:
+            return None
+        bloom = cls.__new__(cls)
+        bloom.capacity, bloom.error_rate, bloom.k, bloom.m, bloom.count = capacity, error_rate, k, m, count
+        bloom.generation = generation
+        bloom.bits = bits
+        return bloom
+
+
+class SeenIdIndex:
+    """全局已见推文ID索引，作为AI处理前的去重关口"""
+
+    def __init__(self, store, data_dir: str = "data", capacity: int = 1000000,
+                 error_rate: float = 0.001, llm_calls_per_tweet: int = LLM_CALLS_PER_TWEET):
+        """
+        :param store: 推文存储（TweetStore），用于精确确认
+        :param data_dir: 数据存储目录
+        :param capacity: 布隆过滤器初始容量，超出后自动按两倍容量重建
+        :param error_rate: 布隆过滤器误判率
+        :param llm_calls_per_tweet: 每条推文的大模型调用次数，用于统计节省的调用
+        """
+        self.store = store
+        self.path = os.path.join(data_dir, BLOOM_FILE_NAME)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.llm_calls_per_tweet = llm_calls_per_tweet
+        self._lock = threading.RLock()
+        self._pending = set()   # 已放行、正在处理但尚未保存的推文ID
+        self._unsaved = 0
+        self._bloom = None
+        self.counters = {
+            'checked': 0,
+            'passed': 0,
+            'skipped_known': 0,
+            'skipped_in_flight': 0,
+            'bloom_false_positives': 0,
+        }
+
+    def _ensure_loaded(self):
+        if self._bloom is not None:
+            return
+        bloom = BloomFilter.load(self.path)
+        if bloom is not None and bloom.count <= bloom.capacity and bloom.generation != self.store.generation():
+            print(f"🧮 已见推文索引（{bloom.count} 个ID）落后于推文存储，从存储重建")
+            bloom = None
+        if bloom is None or bloom.count > bloom.capacity:
+            bloom = self._build(self.capacity)
+        self._bloom = bloom
+
+    def _build(self, capacity: int) -> BloomFilter:
+        # 先取版本标识再读ID：读取期间有其他进程写入时，下次加载会再重建
+        generation = self.store.generation()
+        ids = list(self.store.iter_ids())
+        bloom = BloomFilter(max(capacity, len(ids) * 2), self.error_rate)
+        for tweet_id in ids:
+            bloom.add(str(tweet_id))
+        bloom.generation = generation
+        bloom.save(self.path)
+        print(f"🧮 已重建已见推文索引: {len(ids)} 个ID")
+        return bloom
+
+    def is_known(self, tweet_id: str) -> bool:
+        """
+        判断推文是否已存储
+
+        :param tweet_id: 推文ID
+        :return: 已存储返回True
+        """
+        with self._lock:
+            self._ensure_loaded()
+            if str(tweet_id) not in self._bloom:
+                return False
+        if self.store.contains(str(tweet_id)):
+            return True
+        with self._lock:
+            self.counters['bloom_false_positives'] += 1
+        return False
+
+    def filter_new(self, tweets: list) -> list:
+        """
+        过滤掉已存储或正在处理的推文，放行的推文标记为处理中
+
+        :param tweets: 抓取到的原始推文列表
+        :return: 需要进行AI处理的新推文
+        """
+        new_tweets = []
+        for tweet in tweets:
+            tweet_id = tweet.get('id') or tweet.get('id_str')
+            with self._lock:
+                self.counters['checked'] += 1
+            if not tweet_id:
+                new_tweets.append(tweet)
+                continue
+            tweet_id = str(tweet_id)
+            if self.is_known(tweet_id):
+                with self._lock:
+                    self.counters['skipped_known'] += 1
+                continue
+            with self._lock:
+                if tweet_id in self._pending:
+                    self.counters['skipped_in_flight'] += 1
+                    continue
+                self._pending.add(tweet_id)
+                self.counters['passed'] += 1
+            new_tweets.append(tweet)
+        return new_tweets
+
+    def mark_stored(self, tweet_id: str):
+        """
+        推文保存后调用，把ID加入布隆过滤器并写回磁盘
+
+        :param tweet_id: 推文ID
+        """
+        self.mark_stored_many([tweet_id])
+
+    def mark_stored_many(self, tweet_ids):
+        """
+        一批推文保存后调用，把ID加入布隆过滤器，整批加入后写回磁盘一次
+
+        :param tweet_ids: 推文ID列表
+        """
+        with self._lock:
+            self._ensure_loaded()
+            for tweet_id in tweet_ids:
+                if not tweet_id:
+                    continue
+                tweet_id = str(tweet_id)
+                self._pending.discard(tweet_id)
+                # 已在过滤器中（误判）时也要写回，记录新的存储版本
+                self._unsaved += 1
+                if tweet_id in self._bloom:
+                    continue
+                if self._bloom.count >= self._bloom.capacity:
+                    self._bloom = self._build(self._bloom.capacity * 2)
+                self._bloom.add(tweet_id)
+            self.flush()
+
+    def release(self, tweet_ids):
+        """
+        放弃处理中的推文（处理失败未保存时调用），下次抓取时会重新处理
+
+        :param tweet_ids: 推文ID列表
+        """
+        with self._lock:
+            for tweet_id in tweet_ids:
+                self._pending.discard(str(tweet_id))
+
+    def flush(self):
+        """把布隆过滤器写回磁盘"""
+        with self._lock:
+            if self._bloom is not None and self._unsaved:
+                self._bloom.generation = self.store.generation()
+                self._bloom.save(self.path)
+                self._unsaved = 0
+
+    def stats(self) -> dict:
+        """返回去重统计"""
+        with self._lock:
+            skipped = self.counters['skipped_known'] + self.counters['skipped_in_flight']
+            return {
+                **self.counters,
+                'llm_calls_saved': skipped * self.llm_calls_per_tweet,
+                'indexed_ids': self._bloom.count if self._bloom is not None else None,
+                'in_flight': len(self._pending),
+            }
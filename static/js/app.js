@@ -452,7 +452,7 @@ function initTweetCards() {
 
 // 监控状态更新
 function initMonitoringStatus() {
-    let lastTweetCount = 0;
+    let lastNewestTweetId = null;
     let isRefreshing = false;
 
     // 定期更新监控状态
@@ -513,10 +513,12 @@ function initMonitoringStatus() {
     function checkForNewTweets() {
         if (isRefreshing) return;
         
-        fetch('/api/tweets')
+        // 只取最新一条，比较最新推文ID，不加载整个推文列表
+        fetch('/api/tweets?limit=1')
             .then(response => response.json())
-            .then(tweets => {
-                if (tweets.length > lastTweetCount) {
+            .then(data => {
+                const newest = data.tweets && data.tweets.length ? String(data.tweets[0].id) : null;
+                if (lastNewestTweetId !== null && newest !== null && newest !== lastNewestTweetId) {
                     // 有新推文，刷新页面
                     isRefreshing = true;
                     const liveStatus = document.getElementById('live-status');
@@ -529,7 +531,9 @@ function initMonitoringStatus() {
                         window.location.reload();
                     }, 2000);
                 }
-                lastTweetCount = tweets.length;
+                if (newest !== null) {
+                    lastNewestTweetId = newest;
+                }
             })
             .catch(error => console.error('检查新推文失败:', error));
     }
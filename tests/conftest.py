@@ -0,0 +1,27 @@
+import os
+import sys
+
+# 项目模块位于仓库根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def make_monitor(tmp_path):
+    """在临时数据目录中创建监控器（不访问外部API）"""
+    from twitter_ai_monitor import TwitterAIMonitor
+
+    monitors = []
+
+    def make(**kwargs):
+        kwargs.setdefault('data_dir', str(tmp_path / "data"))
+        kwargs.setdefault('near_dup_max_distance', -1)
+        monitor = TwitterAIMonitor("test-key", "http://127.0.0.1:9", "test-key", **kwargs)
+        monitors.append(monitor)
+        return monitor
+
+    yield make
+    for monitor in monitors:
+        monitor.ai_pool.shutdown(wait=True)
+        monitor.store.flush()
@@ -0,0 +1,56 @@
+import json
+
+from twitter_ai_monitor import AI_RESULT_FIELDS, parse_ai_result
+
+FULL = {'translation': '比特币创新高', 'analysis': '市场情绪回暖', 'title': '比特币再创新高'}
+
+
+def test_parses_json_with_surrounding_text():
+    response = "```json\n" + json.dumps(FULL, ensure_ascii=False) + "\n```"
+    assert parse_ai_result(response, AI_RESULT_FIELDS) == (FULL, [])
+
+
+def test_truncated_json_keeps_completed_fields():
+    response = '{"translation": "比特币创新高", "analysis": "市场情绪回暖", "title": "比特币再'
+    result, missing = parse_ai_result(response, AI_RESULT_FIELDS)
+    assert result == {'translation': '比特币创新高', 'analysis': '市场情绪回暖'}
+    assert missing == ['title']
+
+
+def test_invalid_fields_are_reported_missing():
+    response = json.dumps({'translation': '  ', 'analysis': '解读', 'title': '长' * 51}, ensure_ascii=False)
+    assert parse_ai_result(response, AI_RESULT_FIELDS) == ({'analysis': '解读'}, ['translation', 'title'])
+
+
+def scripted(monitor, responses):
+    prompts = []
+
+    def respond(prompt, max_retries=None):
+        prompts.append(prompt)
+        return responses.pop(0)
+
+    monitor.get_ai_response = respond
+    return prompts
+
+
+def test_combined_mode_uses_one_call(make_monitor):
+    monitor = make_monitor()
+    prompts = scripted(monitor, [json.dumps(FULL, ensure_ascii=False)])
+    assert monitor.process_tweet_with_ai("Bitcoin hits a new high") == FULL
+    assert len(prompts) == 1
+
+
+def test_missing_fields_are_requested_again_alone(make_monitor):
+    monitor = make_monitor()
+    partial = json.dumps({'translation': FULL['translation'], 'analysis': FULL['analysis']}, ensure_ascii=False)
+    prompts = scripted(monitor, [partial, json.dumps({'title': FULL['title']}, ensure_ascii=False)])
+    assert monitor.process_tweet_with_ai("Bitcoin hits a new high") == FULL
+    assert len(prompts) == 2
+    assert '"title"' in prompts[1] and '"translation"' not in prompts[1]
+
+
+def test_unstructured_output_falls_back_to_separate_calls(make_monitor):
+    monitor = make_monitor()
+    prompts = scripted(monitor, ["抱歉，我无法按JSON输出", FULL['translation'], FULL['analysis'], FULL['title']])
+    assert monitor.process_tweet_with_ai("Bitcoin hits a new high") == FULL
+    assert len(prompts) == 4
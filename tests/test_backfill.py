@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from backfill import BackfillCheckpoint, run_backfill
+from tweet_store import BEIJING_TZ
+
+
+def test_job_key_without_end_date_is_stable_across_days():
+    today = BackfillCheckpoint.job_key("Alice", "2024-01-01", None, 24, True)
+    assert today == BackfillCheckpoint.job_key("alice", "2024-01-01", None, 24, True)
+    assert today != BackfillCheckpoint.job_key("alice", "2024-01-01", "2024-01-31", 24, True)
+
+
+def test_open_ended_backfill_resumes_without_refetching_finished_slices(make_monitor, tmp_path):
+    monitor = make_monitor()
+    checkpoint = BackfillCheckpoint(str(tmp_path / "backfill_state.json"))
+    fetched = []
+
+    def fetch(account, since, until, exclude_replies, use_watermark=True):
+        fetched.append((since, until))
+        return [], None
+
+    monitor._fetch_account = fetch
+    start_date = (datetime.now(BEIJING_TZ) - timedelta(days=2)).strftime("%Y-%m-%d")
+    first = run_backfill(monitor, "alice", start_date, slice_hours=24, checkpoint=checkpoint)
+    assert first['failed'] == 0 and first['skipped'] == 0
+
+    # 未结束的最新时间片不记录进度，重新运行（包括第二天）只抓这一片
+    fetched.clear()
+    second = run_backfill(monitor, "alice", start_date, slice_hours=24, checkpoint=checkpoint)
+    assert second['skipped'] == first['slices'] - 1
+    assert len(fetched) == 1
+
+
+def test_failed_tweet_marks_only_its_slice_and_keeps_the_rest(make_monitor, tmp_path):
+    monitor = make_monitor()
+    checkpoint = BackfillCheckpoint(str(tmp_path / "backfill_state.json"))
+    slice_tweets = {
+        datetime(2024, 1, 1, 16): [{'id': '1', 'author': 'alice', 'text': 'ok'},
+                                   {'id': '2', 'author': 'alice', 'text': 'boom'}],
+        datetime(2024, 1, 2, 16): [{'id': '3', 'author': 'alice', 'text': 'ok'}],
+    }
+
+    def fetch(account, since, until, exclude_replies, use_watermark=True):
+        return [dict(t) for t in slice_tweets.get(since, [])], None
+
+    def build(tweet):
+        if tweet['text'] == 'boom':
+            raise KeyError('ai_title')
+        return {'id': tweet['id'], 'author': tweet['author'], 'text': tweet['text'],
+                'created_at': 'Mon Jan 01 12:00:00 +0000 2024'}
+
+    monitor._fetch_account = fetch
+    monitor.build_tweet_data = build
+    result = run_backfill(monitor, "alice", "2024-01-01", "2024-01-03", slice_hours=24, checkpoint=checkpoint)
+
+    assert result['failed'] == 1
+    assert result['saved'] == 2
+    job = BackfillCheckpoint.job_key("alice", "2024-01-01", "2024-01-03", 24, False)
+    assert checkpoint.done_slices(job) == {datetime(2023, 12, 31, 16).isoformat(), datetime(2024, 1, 2, 16).isoformat()}
+    assert {t['id'] for t in monitor.get_all_tweets()} == {'1', '3'}
@@ -0,0 +1,91 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from cassette import CassetteHttpClient, CassetteResponse
+
+# 按时间倒序的三页结果
+PAGES = {
+    None: {'tweets': [{'id': '300'}, {'id': '299'}], 'has_next_page': True, 'next_cursor': 'c1'},
+    'c1': {'tweets': [{'id': '298'}, {'id': '250'}], 'has_next_page': True, 'next_cursor': 'c2'},
+    'c2': {'tweets': [{'id': '200'}], 'has_next_page': False, 'next_cursor': ''},
+}
+
+
+class PagedTwitterStub:
+    """按 cursor 返回固定分页的内部客户端，用于录制"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        page = PAGES[kwargs['params'].get('cursor')]
+        return CassetteResponse(200, {'Content-Type': 'application/json'}, json.dumps(page), url)
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+class OfflineClient(PagedTwitterStub):
+    """回放时不允许访问网络"""
+
+    def request(self, method, url, **kwargs):
+        raise AssertionError(f"回放时不应发出请求: {url}")
+
+
+@pytest.fixture
+def cassette_path(tmp_path, make_monitor):
+    """录制一次完整的三页翻页，返回 cassette 文件路径"""
+    path = str(tmp_path / "search.jsonl")
+    recorder = CassetteHttpClient(PagedTwitterStub(), path, "record")
+    monitor = make_monitor(data_dir=str(tmp_path / "record"), http_client=recorder, batch_queries=False)
+    until = datetime(2024, 1, 1, 12)
+    tweets, error = monitor._fetch_account("alice", until - timedelta(hours=1), until)
+    assert error is None and len(tweets) == 5
+    assert recorder.counters['recorded'] == 3
+    return path
+
+
+def replay_monitor(make_monitor, tmp_path, path):
+    client = CassetteHttpClient(OfflineClient(), path, "replay", latency=0)
+    monitor = make_monitor(data_dir=str(tmp_path / "replay"), http_client=client, batch_queries=False)
+    return monitor, client
+
+
+def test_replay_pages_all_then_advances_watermark(make_monitor, tmp_path, cassette_path):
+    monitor, client = replay_monitor(make_monitor, tmp_path, cassette_path)
+    until = datetime(2024, 1, 1, 13)
+
+    fetched = [(account, tweets) for account, tweets, error in
+               monitor.fetch_accounts(["alice"], until - timedelta(hours=1), until) if error is None]
+    assert [[t['id'] for t in tweets] for _, tweets in fetched] == [['300', '299', '298', '250', '200']]
+    assert client.counters['replayed'] == 3 and client.counters['misses'] == 0
+
+    monitor.commit_watermarks(fetched, until)
+    assert monitor.watermarks.get("alice")['since_id'] == '300'
+    assert monitor.watermarks.get("alice")['checked_until'] == until.isoformat()
+
+    # 下一轮从水位线开始：第一页全是已抓取过的推文，不再翻页
+    later = until + timedelta(minutes=5)
+    results = list(monitor.fetch_accounts(["alice"], until - timedelta(hours=1), later))
+    assert [(account, tweets, error) for account, tweets, error in results] == [("alice", [], None)]
+    assert client.counters['replayed'] == 4
+
+
+def test_replay_stops_at_watermark_inside_a_page(make_monitor, tmp_path, cassette_path):
+    monitor, client = replay_monitor(make_monitor, tmp_path, cassette_path)
+    until = datetime(2024, 1, 1, 13)
+    monitor.watermarks.advance("alice", [{'id': '260'}], until - timedelta(hours=1))
+
+    results = list(monitor.fetch_accounts(["alice"], until - timedelta(hours=1), until))
+    assert [[t['id'] for t in tweets] for _, tweets, _ in results] == [['300', '299', '298']]
+    # 第二页中遇到不大于水位线的推文后停止，第三页不请求
+    assert client.counters['replayed'] == 2
+
+    monitor.commit_watermarks([(account, tweets) for account, tweets, _ in results], until)
+    assert monitor.watermarks.since_id("alice") == 300
@@ -0,0 +1,143 @@
+from types import SimpleNamespace
+
+import httpx2 as httpx
+import openai
+import pytest
+
+import twitter_ai_monitor as tam
+from backfill_spool import BackfillSpool
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from twitter_ai_monitor import AIUnavailableError, classify_ai_error
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def status_error(cls, status, headers=None, message="error"):
+    request = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return cls(message, response=response, body=None)
+
+
+def test_breaker_opens_after_threshold_then_half_opens_and_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=10, clock=clock)
+    for _ in range(2):
+        breaker.record_failure("timeout")
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure("timeout")
+    assert breaker.state == OPEN and breaker.is_open()
+    assert not breaker.allow()
+    assert breaker.retry_after() == 10
+
+    clock.now += 10
+    # 冷却结束：只放行一个试探请求
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow() and breaker.allow()
+    assert breaker.stats()['opened'] == 1
+
+
+def test_failed_trial_reopens_with_doubled_timeout():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10, max_recovery_timeout=30, clock=clock)
+    breaker.record_failure("server")
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record_failure("server")
+    assert breaker.state == OPEN and breaker.recovery_timeout == 20
+    clock.now += 20
+    assert breaker.allow()
+    breaker.record_failure("server")
+    assert breaker.recovery_timeout == 30
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.recovery_timeout == 10
+
+
+def test_trip_opens_for_the_requested_duration():
+    clock = FakeClock()
+    breaker = CircuitBreaker(recovery_timeout=10, max_recovery_timeout=600, clock=clock)
+    breaker.trip(300, "Retry-After 300s")
+    assert breaker.state == OPEN and breaker.retry_after() == 300
+    # 更短的熔断不会缩短已有的冷却
+    breaker.trip(50)
+    assert breaker.retry_after() == 300
+    breaker.trip(3600)
+    assert breaker.retry_after() == 600
+
+
+@pytest.mark.parametrize("error, kind", [
+    (openai.APITimeoutError(request=httpx.Request("POST", "http://llm.test")), 'timeout'),
+    (openai.APIConnectionError(request=httpx.Request("POST", "http://llm.test")), 'connection'),
+    (status_error(openai.RateLimitError, 429), 'rate_limit'),
+    (status_error(openai.RateLimitError, 429, message="insufficient_quota"), 'quota'),
+    (status_error(openai.AuthenticationError, 401), 'auth'),
+    (status_error(openai.BadRequestError, 400, message="data_inspection_failed"), 'content'),
+    (status_error(openai.InternalServerError, 503), 'server'),
+    (status_error(openai.APIStatusError, 409), 'conflict'),
+    (status_error(openai.APIStatusError, 422), 'bad_request'),
+    (ValueError("boom"), 'unknown'),
+])
+def test_classify_ai_error(error, kind):
+    assert classify_ai_error(error)[0] == kind
+
+
+def test_classify_ai_error_reads_retry_after_headers():
+    assert classify_ai_error(status_error(openai.RateLimitError, 429, {'retry-after': '30'}))[1] == 30
+    assert classify_ai_error(status_error(openai.RateLimitError, 429, {'retry-after-ms': '1500'}))[1] == 1.5
+
+
+def failing_llm(error):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        raise error
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return client, calls
+
+
+def test_long_retry_after_opens_breaker_without_retrying(make_monitor):
+    monitor = make_monitor()
+    monitor.llm_client, calls = failing_llm(
+        status_error(openai.RateLimitError, 429, {'retry-after': str(int(tam.AI_RETRY_AFTER_MAX * 10))}))
+    with pytest.raises(AIUnavailableError):
+        monitor.get_ai_response("prompt", max_retries=3)
+    assert len(calls) == 1
+    assert monitor.ai_breaker.state == OPEN
+    assert monitor.ai_breaker.retry_after() > tam.AI_RETRY_AFTER_MAX
+    # 熔断期间不再调用大模型
+    with pytest.raises(AIUnavailableError):
+        monitor.get_ai_response("prompt", max_retries=3)
+    assert len(calls) == 1
+
+
+def test_tweets_deferred_in_one_round_go_to_one_spool_file(make_monitor):
+    monitor = make_monitor()
+    monitor.ai_breaker.trip(600, "test outage")
+    tweets = [{'id': str(100 + i), 'author': 'alice', 'text': f'tweet {i}'} for i in range(5)]
+    new_tweets = monitor.seen_index.filter_new(tweets)
+
+    deferred = []
+    processed = monitor.submit_tweets(
+        new_tweets, lambda tweet, idx: monitor.process_and_save_tweet(tweet, deferred=deferred) is not None)
+    monitor.defer_tweets(deferred)
+
+    assert processed == []
+    files = monitor.backfill_spool.pending()
+    assert len(files) == 1
+    assert sorted(t['id'] for t in BackfillSpool.load(files[0])) == sorted(t['id'] for t in tweets)
+    assert monitor.ai_breaker_stats()['deferred_tweets'] == 5
+    # 推迟的推文不再算作处理中，服务恢复后处理队列时不会被当作重复
+    assert len(monitor.seen_index.filter_new(tweets)) == 5
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+
+from twitter_ai_monitor import RETRY_WINDOW_KEY
+
+
+def test_failed_tweet_from_recovered_window_requeues_original_range(make_monitor):
+    monitor = make_monitor()
+    until = datetime(2024, 1, 2, 12, 0)
+    since = until - timedelta(hours=6)
+    monitor.window_queue.add("alice", since, until, "timeout")
+    for window in monitor.window_queue._windows:
+        window['next_retry_at'] = since.isoformat()
+
+    tweets = [{'id': '101', 'author': 'alice', 'text': 'hello'}]
+    monitor._fetch_account = lambda *args, **kwargs: (tweets, None)
+
+    recovered = monitor.retry_failed_windows()
+    assert recovered == [("alice", tweets)]
+    assert monitor.window_queue.stats()['pending'] == 0
+    assert tweets[0][RETRY_WINDOW_KEY] == (since.isoformat(), until.isoformat())
+
+    # 处理失败：放回原窗口，而不是从当前水位线开始的新窗口
+    now = datetime(2024, 3, 1)
+    monitor.record_failed_tweets(tweets, now - timedelta(hours=1), now)
+    windows = monitor.window_queue.stats()['windows']
+    assert [(w['account'], w['since'], w['until']) for w in windows] == [("alice", since.isoformat(), until.isoformat())]
+
+
+def test_failed_tweet_from_regular_poll_records_window_from_watermark(make_monitor):
+    monitor = make_monitor()
+    now = datetime(2024, 3, 1)
+    default_since = now - timedelta(hours=1)
+    monitor.record_failed_tweets([{'id': '7', 'author': 'bob', 'text': 'x'}], default_since, now)
+    windows = monitor.window_queue.stats()['windows']
+    assert [(w['account'], w['since'], w['until']) for w in windows] == [("bob", default_since.isoformat(), now.isoformat())]
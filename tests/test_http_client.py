@@ -0,0 +1,54 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_client import HttpClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # 每个测试设置的 (状态码, 响应头)
+    response = (200, {})
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        status, headers = self.response
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubHandler.hits = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_429_with_retry_after_is_returned_without_retry(stub_server):
+    StubHandler.response = (429, {'Retry-After': '30'})
+    client = HttpClient(max_retries=3, backoff_factor=0)
+    response = client.get(stub_server + "/search", timeout=5)
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '30'
+    assert StubHandler.hits == 1
+
+
+def test_5xx_is_retried(stub_server):
+    StubHandler.response = (503, {})
+    client = HttpClient(max_retries=2, backoff_factor=0, backoff_jitter=0)
+    response = client.get(stub_server + "/search", timeout=5)
+    assert response.status_code == 503
+    assert StubHandler.hits == 3
+    assert client.stats()[f"127.0.0.1:{stub_server.rsplit(':', 1)[1]}"]['requests'] == 1
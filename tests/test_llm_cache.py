@@ -0,0 +1,155 @@
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import llm_cache
+from llm_cache import LLMResultCache, llm_cache_key
+
+
+class FakeTime:
+    """每次调用递增的时间，LRU 顺序不受系统时钟精度影响"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, 'time', FakeTime())
+    return LLMResultCache(str(tmp_path / "llm_cache.db"))
+
+
+def size_of(value) -> int:
+    return len(json.dumps(value, ensure_ascii=False).encode('utf-8'))
+
+
+def db_totals(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache').fetchone()
+
+
+def test_key_is_content_addressed():
+    key = llm_cache_key("model-a", "v1", "hello")
+    assert key == llm_cache_key("model-a", "v1", "hello")
+    assert len({key, llm_cache_key("model-b", "v1", "hello"), llm_cache_key("model-a", "v2", "hello"),
+                llm_cache_key("model-a", "v1", "hello!")}) == 4
+
+
+def test_same_content_hits_cache(cache):
+    calls = []
+    key = llm_cache_key("m", "v1", "same text")
+    compute = lambda: calls.append(1) or {'title': '标题'}
+    assert cache.get_or_compute(key, compute) == {'title': '标题'}
+    assert cache.get_or_compute(llm_cache_key("m", "v1", "same text"), compute) == {'title': '标题'}
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats['misses'], stats['hits'], stats['entries']) == (1, 1, 1)
+
+
+def test_uncacheable_results_are_not_stored(cache):
+    cache.get_or_compute("k", lambda: {'title': '处理失败'}, cacheable=lambda result: False)
+    assert cache.get("k") is None
+
+
+def test_concurrent_requests_share_one_computation(cache):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'title': 'shared'}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        leader = pool.submit(cache.get_or_compute, "k", compute)
+        assert started.wait(5)
+        followers = [pool.submit(cache.get_or_compute, "k", compute) for _ in range(7)]
+        while cache.stats()['coalesced'] < 7:
+            time.sleep(0.01)
+        release.set()
+        results = [leader.result(5)] + [f.result(5) for f in followers]
+
+    assert len(calls) == 1
+    assert results == [{'title': 'shared'}] * 8
+    stats = cache.stats()
+    assert (stats['misses'], stats['coalesced'], stats['in_flight']) == (1, 7, 0)
+
+
+def test_followers_receive_the_leaders_error(cache):
+    started = threading.Event()
+    release = threading.Event()
+
+    def compute():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("llm down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(cache.get_or_compute, "k", compute)
+        assert started.wait(5)
+        follower = pool.submit(cache.get_or_compute, "k", lambda: {'title': 'unused'})
+        while cache.stats()['coalesced'] < 1:
+            time.sleep(0.01)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="llm down"):
+                future.result(5)
+    assert cache.get("k") is None
+
+
+def test_leader_rechecks_cache_before_computing(cache, monkeypatch):
+    real_get = cache.get
+    lookups = []
+
+    def racing_get(key):
+        lookups.append(key)
+        if len(lookups) == 1:
+            # 上一个计算者在本线程查缓存之后、登记之前写入了结果
+            cache.put(key, {'title': 'from previous leader'})
+            return None
+        return real_get(key)
+
+    monkeypatch.setattr(cache, 'get', racing_get)
+    result = cache.get_or_compute("k", lambda: pytest.fail("命中缓存时不应再调用大模型"))
+    assert result == {'title': 'from previous leader'}
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 0)
+
+
+def test_size_is_tracked_incrementally_and_lru_evicts(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, 'time', FakeTime())
+    path = str(tmp_path / "llm_cache.db")
+    value = {'title': 'x' * 40}
+    cache = LLMResultCache(path, max_bytes=size_of(value) * 3)
+    for key in ("a", "b", "c"):
+        cache.put(key, value)
+    assert (cache.stats()['entries'], cache.stats()['bytes']) == (3, size_of(value) * 3)
+
+    # 覆盖写入同一键只调整大小差值
+    smaller = {'title': 'x' * 10}
+    cache.put("c", smaller)
+    assert (cache.stats()['entries'], cache.stats()['bytes']) == (3, size_of(value) * 2 + size_of(smaller))
+    cache.put("c", value)
+
+    # 读取刷新最近使用时间：a 比 b 新，超出上限时淘汰 b
+    assert cache.get("a") == value
+    cache.put("d", value)
+    assert cache.get("b") is None
+    assert all(cache.get(key) == value for key in ("a", "c", "d"))
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes'], stats['evicted']) == (3, size_of(value) * 3, 1)
+    assert db_totals(path) == (stats['entries'], stats['bytes'])
+
+    # 重新打开时从数据库统计一次
+    reopened = LLMResultCache(path, max_bytes=size_of(value) * 3)
+    assert (reopened.stats()['entries'], reopened.stats()['bytes']) == (3, size_of(value) * 3)
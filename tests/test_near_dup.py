@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from near_dup import FINGERPRINT_BITS, NearDuplicateIndex, hamming_distance, normalize_text, simhash
+
+
+def flip(fingerprint, bits):
+    for bit in bits:
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+def fixed_index(tmp_path, max_distance, fingerprints):
+    """指纹由测试直接指定的索引，文本即指纹表中的键"""
+    index = NearDuplicateIndex(str(tmp_path / "near_dup.db"), max_distance=max_distance)
+    index.fingerprint = fingerprints.get
+    return index
+
+
+@pytest.mark.parametrize("max_distance", [0, 1, 3, 5, 15])
+def test_match_at_exactly_max_distance_spread_across_bands(tmp_path, max_distance):
+    base = (1 << 63) | 0x0123456789ABCDEF
+    # 每个分段各翻转一位（最后一段不翻转），再把剩余的翻转放在分段之外的高位
+    index = NearDuplicateIndex(str(tmp_path / "probe.db"), max_distance=max_distance)
+    bits = [i * index.band_bits for i in range(index.bands - 1)]
+    near = flip(base, bits)
+    far = flip(near, [index.bands * index.band_bits - 1])
+    assert hamming_distance(base, near) == max_distance
+    assert hamming_distance(base, far) == max_distance + 1
+
+    index = fixed_index(tmp_path, max_distance, {'base': base, 'near': near, 'far': far})
+    assert index.add('1', 'base')
+    assert index.find('near') == ('1', max_distance)
+    assert index.find('far') is None
+
+
+@pytest.mark.parametrize("max_distance", [2, 3, 7])
+def test_random_flips_within_max_distance_are_always_found(tmp_path, max_distance):
+    rng = random.Random(max_distance)
+    fingerprints = {}
+    for i in range(200):
+        base = rng.getrandbits(FINGERPRINT_BITS)
+        fingerprints[f'base{i}'] = base
+        fingerprints[f'probe{i}'] = flip(base, rng.sample(range(FINGERPRINT_BITS), max_distance))
+    index = fixed_index(tmp_path, max_distance, fingerprints)
+    for i in range(200):
+        index.add(str(i), f'base{i}')
+    for i in range(200):
+        assert index.find(f'probe{i}') == (str(i), max_distance)
+
+
+def test_closest_candidate_wins_and_self_is_excluded(tmp_path):
+    base = 0xFFFF0000FFFF0000
+    fingerprints = {'a': base, 'b': flip(base, [1, 20]), 'probe': flip(base, [0])}
+    index = fixed_index(tmp_path, 3, fingerprints)
+    index.add('b', 'b')
+    index.add('a', 'a')
+    assert index.find('probe') == ('a', 1)
+    assert index.find('a', exclude_id='a') == ('b', 2)
+    assert not index.add('a', 'a')
+    assert index.stats()['entries'] == 2
+
+
+def test_campaign_copies_differing_in_links_are_near_duplicates(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "near_dup.db"), max_distance=3)
+    text = "Join the biggest airdrop of the year, claim your free tokens before the snapshot ends"
+    assert normalize_text(text + " https://t.co/abc") == normalize_text("RT @bob: " + text + " https://t.co/xyz")
+    index.add('1', text + " https://t.co/abc")
+    assert index.find(text + " https://t.co/xyz") == ('1', 0)
+    assert index.find("Quarterly earnings beat expectations as cloud revenue grows thirty percent") is None
+    # 太短的文本不参与检测
+    assert index.find("gm") is None and not index.add('2', "gm")
+    assert simhash(normalize_text(text)) == index.fingerprint(text)
@@ -0,0 +1,17 @@
+import threading
+import time
+
+
+def test_adaptive_loop_without_due_accounts_waits_base_interval(make_monitor):
+    monitor = make_monitor(adaptive_polling=True)
+    status = {'running': True}
+    worker = threading.Thread(target=monitor.monitor_and_process_with_status, args=([],),
+                              kwargs={'check_interval': 1, 'status_dict': status}, daemon=True)
+    worker.start()
+    time.sleep(1.5)
+    # 没有账号时 next_due() 为 None，按基础检查间隔继续等待而不是异常退出
+    assert status['running'] is True
+    assert "倒计时" in status['current_status']
+    status['running'] = False
+    worker.join(5)
+    assert not worker.is_alive()
@@ -0,0 +1,152 @@
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timezone
+
+import pytest
+
+from rate_limiter import ConcurrencyLimiter, RateLimiter, parse_retry_seconds
+
+
+class FakeClock:
+    """可手动推进的时钟，sleep 直接推进时间"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_limiter(clock, **kwargs):
+    return RateLimiter(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_bucket_starts_full_and_refills_at_rate(clock):
+    limiter = make_limiter(clock, rate=4)
+    for _ in range(4):
+        assert limiter.acquire() == 0
+    # 令牌用完后按 1/rate 秒补充一个
+    assert limiter.acquire() == pytest.approx(0.25)
+    clock.now += 0.5
+    assert limiter.acquire() == 0
+    assert limiter.acquire() == 0
+    assert limiter.acquire() == pytest.approx(0.25)
+
+
+def test_refill_is_capped_at_bucket_size(clock):
+    limiter = make_limiter(clock, rate=2)
+    clock.now += 60
+    assert [limiter.acquire() for _ in range(2)] == [0, 0]
+    assert limiter.acquire() == pytest.approx(0.5)
+
+
+def test_429_halves_rate_and_pauses_for_retry_after(clock):
+    limiter = make_limiter(clock, rate=8, min_rate=1)
+    limiter.on_response(429, {'Retry-After': '3'})
+    assert limiter.rate == 4
+    assert limiter.stats()['paused_for'] == 3
+    assert limiter.acquire() == pytest.approx(3)
+
+
+def test_429s_during_one_pause_halve_only_once(clock):
+    limiter = make_limiter(clock, rate=8, min_rate=1)
+    limiter.on_response(429, {'Retry-After': '2'})
+    limiter.on_response(429, {'Retry-After': '2'})
+    assert limiter.rate == 4
+    clock.now += 2
+    limiter.on_response(429, {})
+    assert limiter.rate == 2
+    assert limiter.stats()['paused_for'] == limiter.default_retry_after
+
+
+def test_rate_never_drops_below_min_rate(clock):
+    limiter = make_limiter(clock, rate=2, min_rate=0.5)
+    for _ in range(5):
+        limiter.on_response(429, {'Retry-After': '0'})
+    assert limiter.rate == 0.5
+
+
+def test_successes_recover_rate_additively_up_to_max(clock):
+    limiter = make_limiter(clock, rate=10, min_rate=1)
+    limiter.on_response(429, {'Retry-After': '0'})
+    assert limiter.rate == 5
+    limiter.on_response(200, {})
+    # 每次成功回升 max_rate / 20 / 当前速率
+    assert limiter.rate == pytest.approx(5 + 10 / 20 / 5)
+    for _ in range(200):
+        limiter.on_response(200, {})
+    assert limiter.rate == 10
+
+
+def test_exhausted_quota_pauses_until_reset(clock):
+    limiter = make_limiter(clock, rate=5)
+    reset = time.time() + 30
+    limiter.on_response(200, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset)})
+    assert limiter.stats()['paused_for'] == pytest.approx(30, abs=1)
+
+
+def test_parse_retry_seconds_accepts_seconds_http_date_and_timestamp():
+    now = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc).timestamp()
+    assert parse_retry_seconds("7", now) == 7
+    assert parse_retry_seconds("1.5", now) == 1.5
+    http_date = format_datetime(datetime(2024, 1, 1, 12, 0, 45, tzinfo=timezone.utc), usegmt=True)
+    assert parse_retry_seconds(http_date, now) == 45
+    assert parse_retry_seconds(str(now + 20), now) == 20
+    # 已经过去的时间不等待
+    assert parse_retry_seconds("Mon, 01 Jan 2024 11:00:00 GMT", now) == 0
+    assert parse_retry_seconds("soon", now) is None
+    assert parse_retry_seconds(None, now) is None
+
+
+def test_concurrency_limit_aimd():
+    limiter = ConcurrencyLimiter(max_limit=8, initial_limit=4)
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 2
+    limiter.acquire()
+    limiter.release(throttled=True)
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 1
+    # 每次成功加 1/limit，大约每满一个窗口加1
+    limiter.acquire()
+    limiter.release()
+    assert limiter.limit == 2
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release()
+    assert limiter.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+    for _ in range(100):
+        limiter.acquire()
+        limiter.release()
+    assert limiter.limit == 8
+
+
+def test_concurrency_limit_blocks_at_limit():
+    limiter = ConcurrencyLimiter(max_limit=2, initial_limit=2)
+    limiter.acquire()
+    limiter.acquire()
+    acquired = threading.Event()
+
+    def third():
+        limiter.acquire()
+        acquired.set()
+
+    worker = threading.Thread(target=third)
+    worker.start()
+    assert not acquired.wait(0.2)
+    limiter.release()
+    assert acquired.wait(2)
+    worker.join()
+    assert limiter.stats()['in_flight'] == 2
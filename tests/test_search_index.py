@@ -0,0 +1,70 @@
+import sqlite3
+
+import pytest
+
+from search_index import SearchIndex, short_grams, short_term_token
+
+TWEETS = [
+    {'id': '1', 'author': 'alice', 'original_text': 'Bitcoin hits a new high',
+     'ai_title': '比特币创新高', 'created_at': 'Mon Jan 01 12:00:00 +0000 2024'},
+    {'id': '2', 'author': 'bob', 'original_text': 'New AI model released',
+     'ai_title': '新的AI模型发布', 'created_at': 'Tue Jan 02 12:00:00 +0000 2024'},
+    {'id': '3', 'author': 'alice', 'original_text': 'Ethereum upgrade',
+     'ai_title': '以太坊升级', 'created_at': 'Wed Jan 03 12:00:00 +0000 2024'},
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.db"))
+    index.add_many([dict(t) for t in TWEETS])
+    yield index
+    index.close()
+
+
+def test_long_terms_use_trigram_match(index):
+    if not index.trigram:
+        pytest.skip("当前SQLite不支持trigram分词器")
+    assert index.search("bitcoin") == (['1'], 1)
+    assert index.search("比特币") == (['1'], 1)
+    assert index.search("new") == (['2', '1'], 2)
+
+
+def test_short_terms_use_gram_index(index):
+    assert index.search("比特") == (['1'], 1)
+    assert index.search("ai") == (['2'], 1)
+    assert index.search("升") == (['3'], 1)
+    assert index.search("模型 AI") == (['2'], 1)
+    assert index.search("新 alice") == ([], 0)
+    assert index.search("新", author="alice") == (['1'], 1)
+    # 短词与 trigram 检索词组合
+    assert index.search("新 bitcoin") == (['1'], 1)
+
+
+def test_short_terms_do_not_fall_back_to_like(index):
+    statements = []
+    conn = index._connect()
+    conn.set_trace_callback(statements.append)
+    index.search("比特")
+    conn.set_trace_callback(None)
+    assert any("search_short MATCH" in sql for sql in statements)
+    assert not any("LIKE" in sql for sql in statements)
+
+
+def test_grams_skip_whitespace_and_ignore_case():
+    tokens = set(short_grams(["Ab c"]).split())
+    assert tokens == {short_term_token(g) for g in ("a", "b", "ab", "c")}
+
+
+def test_existing_index_gets_short_terms_backfilled(tmp_path):
+    path = str(tmp_path / "search.db")
+    index = SearchIndex(path)
+    index.add_many([dict(t) for t in TWEETS])
+    index.close()
+    # 模拟升级前建立的索引：没有短词索引表
+    with sqlite3.connect(path) as conn:
+        conn.execute('DROP TABLE search_short')
+
+    reopened = SearchIndex(path)
+    assert reopened.search("比特") == (['1'], 1)
+    reopened.close()
@@ -0,0 +1,100 @@
+import json
+import os
+
+import pytest
+
+from seen_index import BLOOM_FILE_NAME, SeenIdIndex
+from tweet_store import create_tweet_store
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """记录布隆过滤器从存储重建的次数"""
+    calls = []
+    real_build = SeenIdIndex._build
+
+    def counting_build(self, capacity):
+        calls.append(capacity)
+        return real_build(self, capacity)
+
+    monkeypatch.setattr(SeenIdIndex, '_build', counting_build)
+    return calls
+
+
+def tweet(tweet_id):
+    return {'id': tweet_id, 'author': 'alice', 'text': f'tweet {tweet_id}',
+            'created_at': 'Mon Jan 01 12:00:00 +0000 2024'}
+
+
+def open_index(backend, data_dir):
+    store = create_tweet_store(backend, data_dir)
+    return store, SeenIdIndex(store, data_dir, capacity=1000)
+
+
+def save(store, index, tweets):
+    store.add_many(tweets)
+    index.mark_stored_many(t['id'] for t in tweets)
+    store.flush()
+
+
+@pytest.mark.parametrize("backend", ["file", "sqlite"])
+def test_reopened_index_does_not_rebuild(tmp_path, builds, backend):
+    data_dir = str(tmp_path)
+    store, index = open_index(backend, data_dir)
+    save(store, index, [tweet(str(i)) for i in range(1, 6)])
+    assert len(builds) == 1
+    store.close()
+
+    store, index = open_index(backend, data_dir)
+    assert [t['id'] for t in index.filter_new([tweet('3'), tweet('99')])] == ['99']
+    assert len(builds) == 1
+    store.close()
+
+
+@pytest.mark.parametrize("backend", ["file", "sqlite"])
+def test_writes_by_another_process_trigger_one_rebuild(tmp_path, builds, backend):
+    data_dir = str(tmp_path)
+    store, index = open_index(backend, data_dir)
+    save(store, index, [tweet('1')])
+    store.close()
+
+    # 其他进程（如导入命令）绕过已见推文索引直接写入
+    other = create_tweet_store(backend, data_dir)
+    other.add(tweet('2'))
+    other.close()
+
+    store, index = open_index(backend, data_dir)
+    assert index.filter_new([tweet('2')]) == []
+    assert len(builds) == 2
+    store.close()
+
+    store, index = open_index(backend, data_dir)
+    assert index.filter_new([tweet('1')]) == []
+    assert len(builds) == 2
+    store.close()
+
+
+def test_legacy_duplicates_do_not_force_rebuild_on_every_start(tmp_path, builds):
+    data_dir = str(tmp_path)
+    store, index = open_index("file", data_dir)
+    save(store, index, [tweet('1'), tweet('2')])
+    store.close()
+    # 升级前的整文件JSON中有与段文件重复的推文，存储的条数与去重后的ID数不一致
+    with open(os.path.join(data_dir, "tweets_2023-12-31.json"), 'w', encoding='utf-8') as f:
+        json.dump([tweet('1')], f)
+
+    for _ in range(2):
+        store, index = open_index("file", data_dir)
+        assert index.filter_new([tweet('1'), tweet('2')]) == []
+        store.close()
+    assert len(builds) == 2
+
+
+def test_old_bloom_format_is_rebuilt(tmp_path, builds):
+    data_dir = str(tmp_path)
+    with open(os.path.join(data_dir, BLOOM_FILE_NAME), 'wb') as f:
+        f.write(b"BLM1" + b"\0" * 64)
+    store, index = open_index("file", data_dir)
+    assert index.filter_new([tweet('1')]) == [tweet('1')]
+    assert len(builds) == 1
+    store.close()
@@ -0,0 +1,209 @@
+import glob
+import gzip
+import itertools
+import json
+import os
+
+from tweet_store import FileTweetStore, SegmentStore, TweetCache, date_range_to_epochs, tweet_epoch
+
+
+def tweet(tweet_id, created_at='Mon Jan 01 12:00:00 +0000 2024', author='alice'):
+    return {'id': tweet_id, 'author': author, 'original_text': f'tweet {tweet_id}', 'created_at': created_at}
+
+
+def test_appends_one_line_per_tweet(tmp_path):
+    store = FileTweetStore(str(tmp_path))
+    assert store.add(tweet('1'))
+    assert store.add(tweet('2'))
+    assert not store.add(tweet('1'))
+    store.close()
+
+    segment = tmp_path / "tweets_2024-01-01.jsonl"
+    assert [t['id'] for t in SegmentStore.read_segment(str(segment))] == ['1', '2']
+    assert segment.read_bytes().count(b"\n") == 2
+
+
+def test_truncated_tail_is_cut_and_saved_before_next_append(tmp_path):
+    data_dir = str(tmp_path)
+    store = FileTweetStore(data_dir)
+    store.add(tweet('1'))
+    store.close()
+    segment = os.path.join(data_dir, "tweets_2024-01-01.jsonl")
+    with open(segment, 'ab') as f:
+        f.write(b'{"id":"2","author":"ali')   # 进程崩溃时写了一半的记录
+
+    # 读取时跳过未写完的行
+    assert [t['id'] for t in SegmentStore.read_segment(segment)] == ['1']
+
+    store = FileTweetStore(data_dir)
+    assert store.add(tweet('3'))
+    store.flush()
+    with open(segment, 'rb') as f:
+        lines = f.read().split(b"\n")
+    assert lines[-1] == b"" and all(line.startswith(b"{") and line.endswith(b"}") for line in lines[:-1])
+    assert [t['id'] for t in SegmentStore.read_segment(segment)] == ['1', '3']
+    corrupt = glob.glob(segment + ".corrupt-*")
+    assert len(corrupt) == 1
+    with open(corrupt[0], 'rb') as f:
+        assert f.read() == b'{"id":"2","author":"ali'
+    # 新记录的偏移在截断之后仍然正确
+    assert store.get('3')['id'] == '3'
+    store.close()
+
+
+def test_recover_tail_leaves_complete_files_alone(tmp_path):
+    segment = tmp_path / "tweets_2024-01-01.jsonl"
+    segment.write_bytes(b'{"id":"1"}\n{"id":"2"}\n')
+    assert SegmentStore.recover_tail(str(segment)) == 0
+    assert segment.read_bytes() == b'{"id":"1"}\n{"id":"2"}\n'
+    assert not glob.glob(str(segment) + ".corrupt-*")
+
+
+def test_cold_tier_gzip_round_trip(tmp_path):
+    data_dir = str(tmp_path)
+    store = FileTweetStore(data_dir)
+    originals = [tweet('1'), tweet('2', 'Mon Jan 01 15:30:00 +0000 2024', author='bob'), tweet('3')]
+    for t in originals:
+        store.add(dict(t))
+    store.flush()
+    before = store.load_day("2024-01-01")
+
+    assert store.tier(0) == ["2024-01-01"]
+    assert not os.path.exists(os.path.join(data_dir, "tweets_2024-01-01.jsonl"))
+    cold_path = os.path.join(data_dir, "cold", "tweets_2024-01-01.jsonl.gz")
+    with gzip.open(cold_path, 'rb') as f:
+        assert len(f.read().splitlines()) == 3
+    assert SegmentStore.read_cold(cold_path) == before
+    info = store.segments.cold.info("2024-01-01")
+    assert info['count'] == 3 and sorted(info['authors']) == ['alice', 'bob']
+    assert info['bytes'] == os.path.getsize(cold_path) and info['raw_bytes'] > 0
+    assert sorted(t['id'] for t in store.load_day("2024-01-01")) == ['1', '2', '3']
+    store.close()
+
+
+def test_id_index_lookup_after_compaction(tmp_path):
+    data_dir = str(tmp_path)
+    store = FileTweetStore(data_dir)
+    store.add(tweet('1'))
+    store.add(tweet('2', 'Tue Jan 02 12:00:00 +0000 2024'))
+    store.flush()
+    assert store.id_index.lookup('1')[1] >= 0   # 热数据按偏移读取
+
+    # 另一个进程已加载了压缩前的索引
+    other = FileTweetStore(data_dir)
+    assert other.get('1')['id'] == '1'
+
+    store.tier(0)
+    filename, offset, _ = store.id_index.lookup('1')
+    assert filename == os.path.join("cold", "tweets_2024-01-01.jsonl.gz") and offset == -1
+    cold_tweet = store.get('1')
+    assert {key: cold_tweet[key] for key in tweet('1')} == tweet('1')
+    assert store.get('2')['id'] == '2'
+
+    # 索引中的位置已过期时重建后再读
+    assert other.get('2')['id'] == '2'
+    # 压缩后继续写入同一天：新记录回到热数据段文件
+    store.add(tweet('4'))
+    store.flush()
+    assert store.id_index.lookup('4')[0] == "tweets_2024-01-01.jsonl"
+    assert store.get('4')['id'] == '4'
+    assert sorted(t['id'] for t in store.load_day("2024-01-01")) == ['1', '4']
+    store.close()
+
+    reopened = FileTweetStore(data_dir)
+    assert [reopened.get(i)['id'] for i in ('1', '2', '4')] == ['1', '2', '4']
+    assert reopened.get('missing') is None
+    reopened.close()
+    other.close()
+
+
+def write_partitions(data_dir):
+    """三天的推文：1日和3日是 alice，2日是 bob；读取一次生成分区清单"""
+    store = FileTweetStore(data_dir)
+    store.add(tweet('1', 'Mon Jan 01 12:00:00 +0000 2024'))
+    store.add(tweet('2', 'Tue Jan 02 12:00:00 +0000 2024', author='bob'))
+    store.add(tweet('3', 'Wed Jan 03 12:00:00 +0000 2024'))
+    store.flush()
+    assert store.count() == 3
+    return store
+
+
+def test_manifest_prunes_partitions_by_author_and_date(tmp_path):
+    data_dir = str(tmp_path)
+    write_partitions(data_dir).close()
+    assert os.path.exists(os.path.join(data_dir, "partitions.json"))
+
+    # 新的读缓存（相当于重启后的进程）只打开清单表明可能匹配的分区
+    cache = TweetCache(data_dir)
+    entries = [t['id'] for _, _, t in cache.iter_entries(author='bob')]
+    assert entries == ['2']
+    assert cache.pruned == 2 and cache.misses == 1
+
+    cache = TweetCache(data_dir)
+    start_epoch, end_epoch = date_range_to_epochs("2024-01-03", "2024-01-03")
+    entries = [t['id'] for _, _, t in cache.iter_entries(start_epoch, end_epoch)]
+    assert entries[0] == '3'
+    assert cache.misses == 1
+
+    # 只需统计时直接使用清单，不打开分区
+    cache = TweetCache(data_dir)
+    assert cache.count() == 3 and cache.authors() == {'alice', 'bob'}
+    assert cache.misses == 0
+
+
+def test_stale_manifest_entry_is_not_used_for_pruning(tmp_path):
+    data_dir = str(tmp_path)
+    write_partitions(data_dir).close()
+    # 其他进程在清单生成后向1日写入了 bob 的推文，分区签名已变化
+    with open(os.path.join(data_dir, "tweets_2024-01-01.jsonl"), 'ab') as f:
+        f.write(b'{"id":"9","author":"bob","created_at":"Mon Jan 01 13:00:00 +0000 2024"}\n')
+
+    cache = TweetCache(data_dir)
+    # 打开的分区整体返回，由调用方按作者筛选
+    assert sorted(t['id'] for _, _, t in cache.iter_entries(author='bob') if t['author'] == 'bob') == ['2', '9']
+    assert cache.pruned == 1
+
+
+def write_out_of_order_days(data_dir):
+    """段文件按发帖日期分区；升级前的整文件JSON按处理日期命名，其中的推文发帖时间可能更早"""
+    store = FileTweetStore(data_dir)
+    for day in range(1, 6):
+        store.add(tweet(f'd{day}', f'Mon Jan 0{day} 0{day}:00:00 +0000 2024'))
+    store.add(tweet('d3-late', 'Wed Jan 03 15:00:00 +0000 2024'))
+    store.close()
+    legacy = [tweet('old-1', 'Tue Jan 02 18:00:00 +0000 2024'), tweet('old-2', 'Fri Jan 05 10:00:00 +0000 2024')]
+    with open(os.path.join(data_dir, "tweets_2024-01-04.json"), 'w', encoding='utf-8') as f:
+        json.dump(legacy, f)
+
+
+def test_lazy_merge_returns_newest_first_across_partitions(tmp_path):
+    data_dir = str(tmp_path)
+    write_out_of_order_days(data_dir)
+    FileTweetStore(data_dir).count()   # 生成分区清单
+
+    cache = TweetCache(data_dir)
+    epochs = [epoch for epoch, _, _ in cache.iter_entries()]
+    assert len(epochs) == 8
+    assert epochs == sorted(epochs, reverse=True)
+    ids = [t['id'] for _, _, t in TweetCache(data_dir).iter_entries()]
+    assert ids[:3] == ['old-2', 'd5', 'd4'] and ids.index('d3-late') < ids.index('d3') < ids.index('old-1')
+
+
+def test_newest_n_opens_only_the_newest_partitions(tmp_path):
+    data_dir = str(tmp_path)
+    write_out_of_order_days(data_dir)
+    FileTweetStore(data_dir).count()
+
+    cache = TweetCache(data_dir)
+    newest = [t['id'] for _, _, t in itertools.islice(cache.iter_entries(), 2)]
+    assert newest == ['old-2', 'd5']
+    # 清单中 1~3 日的最大发帖时间都早于已返回的推文，不会被打开
+    assert cache.misses == 2
+
+
+def test_get_all_tweets_matches_store_order(make_monitor, tmp_path):
+    monitor = make_monitor()
+    write_out_of_order_days(monitor.data_dir)
+    tweets = monitor.get_all_tweets()
+    assert [tweet_epoch(t) for t in tweets] == sorted((tweet_epoch(t) for t in tweets), reverse=True)
+    assert [t['id'] for t in tweets] == [t['id'] for t in monitor.store.query()]
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from watermarks import WatermarkStore
+
+
+def test_watermarks_persist_across_restarts(tmp_path):
+    path = str(tmp_path / "watermarks.json")
+    marks = WatermarkStore(path)
+    until = datetime(2024, 1, 1, 12)
+    marks.advance("Alice", [{'id': '150', 'createdAt': 'a'}, {'id': '170', 'createdAt': 'b'}, {'id': 'x'}], until)
+    marks.save()
+
+    reopened = WatermarkStore(path)
+    assert reopened.since_id("alice") == 170
+    assert reopened.get("ALICE")['newest_created_at'] == 'b'
+    assert reopened.since_time("alice", datetime(2000, 1, 1)) == until
+    assert reopened.since_time("bob", datetime(2000, 1, 1)) == datetime(2000, 1, 1)
+
+
+def test_watermarks_never_move_backwards(tmp_path):
+    marks = WatermarkStore(str(tmp_path / "watermarks.json"))
+    until = datetime(2024, 1, 1, 12)
+    marks.advance("alice", [{'id': '170'}], until)
+    # 补抓旧窗口：更旧的推文和更早的结束时间不会让水位线后退
+    marks.advance("alice", [{'id': '120'}], datetime(2024, 1, 1, 6))
+    assert marks.since_id("alice") == 170
+    assert marks.since_time("alice", datetime(2000, 1, 1)) == until
+
+
+def test_corrupt_watermarks_file_starts_from_scratch(tmp_path):
+    path = tmp_path / "watermarks.json"
+    path.write_text("{not json", encoding='utf-8')
+    marks = WatermarkStore(str(path))
+    assert marks.since_id("alice") is None
+    marks.advance("alice", [{'id': '1'}], datetime(2024, 1, 1))
+    marks.save()
+    assert WatermarkStore(str(path)).since_id("alice") == 1
@@ -0,0 +1,1891 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+推文存储模块
+
+TweetStore 是可插拔的推文存储接口，提供两种后端：
+- file: 按天存储的追加写段文件（FileTweetStore，默认）
+- sqlite: WAL 模式的 SQLite 数据库，按 id/作者/发帖时间/处理日期建索引（SQLiteTweetStore）
+
+按天存储的追加写（JSON Lines）段文件：
+- 新推文按发帖日期（北京时间）分区，以一行 JSON 的形式追加到 tweets_YYYY-MM-DD.jsonl，不再整文件重写
+  （升级前写入的文件按处理日期命名，查询时依靠分区清单中的发帖时间范围裁剪）
+- 分区清单 partitions.json 记录每个分区的推文数、发帖时间范围和作者集合，查询只打开可能匹配的分区
+- fsync 按条数/时间批量执行，减少磁盘同步次数
+- 打开段文件追加前会检查并修复被截断的尾部（进程崩溃时写了一半的行）
+- 兼容读取旧版 tweets_YYYY-MM-DD.json（整文件 JSON 数组）格式
+- 超过一定天数的数据文件压缩为 cold/tweets_YYYY-MM-DD.jsonl.gz（冷数据层），
+  读取时透明解压，只有查询的日期范围落到冷数据上时才会解压
+"""
+
+import gzip
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+SEGMENT_PREFIX = "tweets_"
+SEGMENT_SUFFIX = ".jsonl"
+LEGACY_SUFFIX = ".json"
+SQLITE_DB_NAME = "tweets.db"
+ID_INDEX_NAME = "tweet_ids.idx"
+COLD_DIR_NAME = "cold"
+COLD_SUFFIX = ".jsonl.gz"
+COLD_MANIFEST_NAME = "manifest.json"
+PARTITION_MANIFEST_NAME = "partitions.json"
+
+# 写入进程同时保持打开的段文件数量上限（补抓历史推文时会写入很多不同日期的分区）
+MAX_OPEN_SEGMENTS = 16
+
+# 段文件中每行是一条紧凑JSON，推文ID可以直接从原始字节中提取
+ID_PATTERN = re.compile(rb'"id":"((?:[^"\\]|\\.)*)"')
+
+# 页面上的日期筛选均按北京时间
+BEIJING_TZ = timezone(timedelta(hours=8))
+
+
+def encode_record(tweet_data: dict) -> bytes:
+    """将推文编码为一行 JSON（含结尾换行符）"""
+    line = json.dumps(tweet_data, ensure_ascii=False, separators=(',', ':'))
+    return (line + "\n").encode('utf-8')
+
+
+def parse_created_at_epoch(created_at: str):
+    """
+    解析推文发帖时间为UTC时间戳（秒）
+
+    :param created_at: Twitter时间格式字符串，如 "Wed Aug 20 14:05:10 +0000 2025"，也兼容ISO格式
+    :return: 时间戳，无法解析时返回None
+    """
+    if not created_at:
+        return None
+    try:
+        return int(parsedate_to_datetime(created_at).timestamp())
+    except (TypeError, ValueError):
+        pass
+    try:
+        parsed = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return int(parsed.timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def tweet_epoch(tweet_data: dict) -> int:
+    """返回推文发帖时间戳，用于排序，无法解析时为0"""
+    epoch = tweet_data.get('created_at_epoch')
+    if epoch is None:
+        epoch = parse_created_at_epoch(tweet_data.get('created_at'))
+    return epoch or 0
+
+
+def format_beijing(epoch: int) -> str:
+    """将UTC时间戳格式化为北京时间字符串"""
+    return datetime.fromtimestamp(epoch, BEIJING_TZ).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def normalize_tweet(tweet_data: dict) -> dict:
+    """
+    写入前补齐时间相关的派生字段，读取时不再需要解析日期：
+    created_at_epoch（发帖时间戳）、formatted_created_at（发帖北京时间）、beijing_time（处理北京时间）
+
+    :param tweet_data: 推文数据（原地补齐）
+    :return: 同一个推文数据
+    """
+    if 'created_at_epoch' not in tweet_data:
+        tweet_data['created_at_epoch'] = parse_created_at_epoch(tweet_data.get('created_at'))
+    epoch = tweet_data['created_at_epoch']
+    if 'formatted_created_at' not in tweet_data:
+        tweet_data['formatted_created_at'] = format_beijing(epoch) if epoch is not None else (tweet_data.get('created_at') or '')
+    if 'beijing_time' not in tweet_data and tweet_data.get('timestamp'):
+        # timestamp 为处理时的UTC时间（ISO格式）
+        processed_epoch = parse_created_at_epoch(tweet_data['timestamp'])
+        tweet_data['beijing_time'] = format_beijing(processed_epoch) if processed_epoch is not None else tweet_data['timestamp']
+    return tweet_data
+
+
+def date_range_to_epochs(start_date: str = None, end_date: str = None) -> tuple:
+    """
+    将北京时间日期范围转换为时间戳区间 [start, end)
+
+    :param start_date: 开始日期 (YYYY-MM-DD)，为空表示不限
+    :param end_date: 结束日期 (YYYY-MM-DD)，包含当天，为空表示不限
+    :return: (开始时间戳或None, 结束时间戳或None)
+    """
+    start_epoch = end_epoch = None
+    if start_date:
+        start = datetime.strptime(start_date, "%Y-%m-%d").replace(tzinfo=BEIJING_TZ)
+        start_epoch = int(start.timestamp())
+    if end_date:
+        end = datetime.strptime(end_date, "%Y-%m-%d").replace(tzinfo=BEIJING_TZ) + timedelta(days=1)
+        end_epoch = int(end.timestamp())
+    return start_epoch, end_epoch
+
+
+def partition_date(tweet_data: dict):
+    """
+    返回推文所属分区的日期（发帖时间的北京日期）
+
+    :param tweet_data: 推文数据（需已补齐 created_at_epoch）
+    :return: 日期字符串 (YYYY-MM-DD)，发帖时间未知时返回None
+    """
+    epoch = tweet_data.get('created_at_epoch')
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, BEIJING_TZ).strftime("%Y-%m-%d")
+
+
+def data_file_sizes(data_dir: str) -> dict:
+    """
+    列出数据目录中的全部数据文件（段文件、旧版文件和冷数据文件）及其大小
+
+    :param data_dir: 数据存储目录
+    :return: {相对数据目录的文件名: 字节数}
+    """
+    files = {}
+    if os.path.exists(data_dir):
+        for filename in os.listdir(data_dir):
+            if filename.startswith(SEGMENT_PREFIX) and filename.endswith((SEGMENT_SUFFIX, LEGACY_SUFFIX)):
+                files[filename] = os.path.getsize(os.path.join(data_dir, filename))
+    cold_dir = os.path.join(data_dir, COLD_DIR_NAME)
+    if os.path.isdir(cold_dir):
+        for filename in os.listdir(cold_dir):
+            if filename.startswith(SEGMENT_PREFIX) and filename.endswith(COLD_SUFFIX):
+                files[os.path.join(COLD_DIR_NAME, filename)] = os.path.getsize(os.path.join(cold_dir, filename))
+    return files
+
+
+def partition_info(tweets: list) -> dict:
+    """
+    统计一个分区的清单信息
+
+    :param tweets: 分区内的推文
+    :return: {count, min_epoch, max_epoch, authors}
+    """
+    epochs = [t['created_at_epoch'] if t.get('created_at_epoch') is not None else parse_created_at_epoch(t.get('created_at'))
+              for t in tweets]
+    epochs = [e for e in epochs if e is not None]
+    return {
+        'count': len(tweets),
+        'min_epoch': min(epochs) if epochs else None,
+        'max_epoch': max(epochs) if epochs else None,
+        'authors': sorted({t.get('author') for t in tweets if t.get('author')}),
+    }
+
+
+def partition_may_match(info: dict, start_epoch: int = None, end_epoch: int = None, author: str = None) -> bool:
+    """
+    根据分区清单判断分区中是否可能有满足条件的推文
+
+    :param info: 分区清单项
+    :param start_epoch: 开始时间戳，为空表示不限
+    :param end_epoch: 结束时间戳（不含），为空表示不限
+    :param author: 作者（不区分大小写），为空表示不限
+    :return: 可能有匹配时返回True
+    """
+    if author and author.lower() not in {a.lower() for a in info.get('authors', [])}:
+        return False
+    if start_epoch is None and end_epoch is None:
+        return True
+    if info.get('min_epoch') is None:
+        # 没有发帖时间的推文不会出现在按日期筛选的结果中
+        return False
+    if end_epoch is not None and info['min_epoch'] >= end_epoch:
+        return False
+    if start_epoch is not None and info['max_epoch'] < start_epoch:
+        return False
+    return True
+
+
+class PartitionManifest:
+    """
+    热数据分区清单 partitions.json：日期 -> 清单项
+
+    每项记录生成时数据文件的 (mtime, size) 签名，签名与当前文件不一致时视为过期，
+    需要重新读取该分区。清单由读缓存在解析分区时维护。
+    """
+
+    def __init__(self, data_dir: str = "data"):
+        """
+        :param data_dir: 数据存储目录
+        """
+        self.path = os.path.join(data_dir, PARTITION_MANIFEST_NAME)
+        self._entries = None
+        self._dirty = False
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                print(f"⚠️ 分区清单损坏，将重新生成: {self.path}")
+
+    def get(self, date_str: str, sigs: list):
+        """
+        返回与当前数据文件签名一致的清单项
+
+        :param date_str: 日期字符串 (YYYY-MM-DD)
+        :param sigs: 当前数据文件签名列表
+        :return: 清单项，不存在或已过期时返回None
+        """
+        self._load()
+        info = self._entries.get(date_str)
+        if info is None or info.get('sigs') != sigs:
+            return None
+        return info
+
+    def update(self, date_str: str, sigs: list, tweets: list):
+        """
+        根据分区内容更新清单项
+
+        :param date_str: 日期字符串 (YYYY-MM-DD)
+        :param sigs: 数据文件签名列表
+        :param tweets: 分区内的推文
+        """
+        self._load()
+        self._entries[date_str] = {'sigs': sigs, **partition_info(tweets)}
+        self._dirty = True
+
+    def discard(self, date_str: str):
+        """删除某个分区的清单项"""
+        self._load()
+        if self._entries.pop(date_str, None) is not None:
+            self._dirty = True
+
+    def save(self):
+        """有变化时原子写回清单文件"""
+        if not self._dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            print(f"⚠️ 保存分区清单失败: {str(e)}")
+
+
+class ColdTier:
+    """
+    冷数据层：data/cold/ 下按天gzip压缩的段文件
+
+    清单 cold/manifest.json 记录每个冷数据日的推文数、发帖时间范围和作者集合，
+    统计和日期范围判断只读清单，不需要解压数据文件。
+    """
+
+    def __init__(self, data_dir: str = "data"):
+        """
+        :param data_dir: 数据存储目录
+        """
+        self.cold_dir = os.path.join(data_dir, COLD_DIR_NAME)
+        self.manifest_path = os.path.join(self.cold_dir, COLD_MANIFEST_NAME)
+        self._manifest = {}
+        self._manifest_sig = None
+
+    def path(self, date_str: str) -> str:
+        """返回指定日期的冷数据文件路径"""
+        return os.path.join(self.cold_dir, f"{SEGMENT_PREFIX}{date_str}{COLD_SUFFIX}")
+
+    def days(self) -> list:
+        """列出所有冷数据日期（升序）"""
+        if not os.path.isdir(self.cold_dir):
+            return []
+        return sorted(filename[len(SEGMENT_PREFIX):-len(COLD_SUFFIX)] for filename in os.listdir(self.cold_dir)
+                      if filename.startswith(SEGMENT_PREFIX) and filename.endswith(COLD_SUFFIX))
+
+    def manifest(self) -> dict:
+        """读取冷数据清单（文件未变化时复用上次的解析结果）"""
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            self._manifest, self._manifest_sig = {}, None
+            return self._manifest
+        sig = (st.st_mtime_ns, st.st_size)
+        if sig != self._manifest_sig:
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    self._manifest = json.load(f)
+            except (OSError, ValueError):
+                print(f"⚠️ 冷数据清单损坏，将按需解压冷数据: {self.manifest_path}")
+                self._manifest = {}
+            self._manifest_sig = sig
+        return self._manifest
+
+    def info(self, date_str: str):
+        """
+        返回某个冷数据日的清单项
+
+        :param date_str: 日期字符串 (YYYY-MM-DD)
+        :return: 清单项，不存在时返回None
+        """
+        return self.manifest().get(date_str)
+
+    def compress_day(self, date_str: str, hot_paths: list) -> dict:
+        """
+        把某天的热数据文件（与已有的冷数据合并、按ID去重）压缩写入冷数据层，然后删除热数据文件。
+        先原子替换冷数据文件和清单，再删除热数据文件，中途崩溃只会留下可去重的重复记录。
+
+        :param date_str: 日期字符串 (YYYY-MM-DD)
+        :param hot_paths: 该日的热数据文件路径（旧版JSON、段文件）
+        :return: 该日的清单项
+        """
+        os.makedirs(self.cold_dir, exist_ok=True)
+        cold_path = self.path(date_str)
+        tweets = []
+        seen = set()
+        for batch in [SegmentStore.read_cold(cold_path)] + [SegmentStore.read_file(p) for p in hot_paths]:
+            for tweet in batch:
+                tweet_id = tweet.get('id')
+                if tweet_id and tweet_id in seen:
+                    continue
+                seen.add(tweet_id)
+                tweets.append(normalize_tweet(tweet))
+
+        raw_bytes = 0
+        tmp_path = cold_path + ".tmp"
+        with open(tmp_path, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb', filename='', mtime=0) as f:
+                for tweet in tweets:
+                    record = encode_record(tweet)
+                    raw_bytes += len(record)
+                    f.write(record)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, cold_path)
+
+        info = {
+            **partition_info(tweets),
+            'raw_bytes': raw_bytes,
+            'bytes': os.path.getsize(cold_path),
+        }
+        manifest = dict(self.manifest())
+        manifest[date_str] = info
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+        for path in hot_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        return info
+
+
+class SegmentStore:
+    """追加写的按天段文件存储"""
+
+    def __init__(self, data_dir: str = "data", fsync_every: int = 20, fsync_interval: float = 5.0):
+        """
+        初始化段文件存储
+
+        :param data_dir: 数据存储目录
+        :param fsync_every: 累计多少条未同步记录后执行一次fsync
+        :param fsync_interval: 距上次fsync超过多少秒后执行一次fsync
+        """
+        self.data_dir = data_dir
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval
+        self._lock = threading.RLock()
+        self._handles = {}       # date_str -> 追加写文件句柄
+        self._day_ids = {}       # date_str -> 当天已有推文ID集合
+        self._pending = 0
+        self._last_fsync = time.time()
+        self.cold = ColdTier(data_dir)
+        os.makedirs(data_dir, exist_ok=True)
+
+    # ---------- 路径 ----------
+
+    def segment_path(self, date_str: str) -> str:
+        """返回指定日期的段文件路径"""
+        return os.path.join(self.data_dir, f"{SEGMENT_PREFIX}{date_str}{SEGMENT_SUFFIX}")
+
+    def legacy_path(self, date_str: str) -> str:
+        """返回指定日期的旧版JSON文件路径"""
+        return os.path.join(self.data_dir, f"{SEGMENT_PREFIX}{date_str}{LEGACY_SUFFIX}")
+
+    def list_days(self, include_cold: bool = True) -> list:
+        """
+        列出所有存在数据文件的日期（新旧格式合并，升序）
+
+        :param include_cold: 是否包含只有冷数据的日期
+        """
+        days = set(self.cold.days()) if include_cold else set()
+        if os.path.exists(self.data_dir):
+            for filename in os.listdir(self.data_dir):
+                if not filename.startswith(SEGMENT_PREFIX):
+                    continue
+                for suffix in (SEGMENT_SUFFIX, LEGACY_SUFFIX):
+                    if filename.endswith(suffix):
+                        days.add(filename[len(SEGMENT_PREFIX):-len(suffix)])
+                        break
+        return sorted(days)
+
+    # ---------- 读取 ----------
+
+    @staticmethod
+    def read_segment(file_path: str) -> list:
+        """
+        读取一个 JSON Lines 段文件，跳过损坏的行
+
+        :param file_path: 段文件路径
+        :return: 推文数据列表
+        """
+        tweets, _ = SegmentStore.read_segment_from(file_path, 0)
+        return tweets
+
+    @staticmethod
+    def read_segment_from(file_path: str, offset: int) -> tuple:
+        """
+        从指定字节偏移开始读取段文件中的完整记录，末尾未写完的行留到下次读取
+
+        :param file_path: 段文件路径
+        :param offset: 起始字节偏移（必须位于行首）
+        :return: (推文数据列表, 已读取到的字节偏移)
+        """
+        tweets = []
+        if not os.path.exists(file_path):
+            return tweets, offset
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                offset += len(raw)
+                if not raw.strip():
+                    continue
+                try:
+                    tweets.append(json.loads(raw))
+                except ValueError:
+                    print(f"⚠️ 跳过损坏的记录: {file_path} 偏移 {offset - len(raw)}")
+        return tweets, offset
+
+    @staticmethod
+    def read_cold(file_path: str) -> list:
+        """
+        读取一个gzip压缩的冷数据文件
+
+        :param file_path: 冷数据文件路径
+        :return: 推文数据列表，文件不存在或损坏时返回已读出的部分
+        """
+        tweets = []
+        if not os.path.exists(file_path):
+            return tweets
+        try:
+            with gzip.open(file_path, 'rb') as f:
+                for raw in f:
+                    if not raw.strip():
+                        continue
+                    try:
+                        tweets.append(json.loads(raw))
+                    except ValueError:
+                        print(f"⚠️ 跳过损坏的记录: {file_path}")
+        except (OSError, EOFError):
+            print(f"⚠️ 冷数据文件损坏，已读出 {len(tweets)} 条: {file_path}")
+        return tweets
+
+    @staticmethod
+    def read_file(file_path: str) -> list:
+        """按文件格式（段文件/旧版JSON/冷数据）读取全部推文"""
+        if file_path.endswith(COLD_SUFFIX):
+            return SegmentStore.read_cold(file_path)
+        if file_path.endswith(LEGACY_SUFFIX):
+            return SegmentStore.read_legacy(file_path)
+        return SegmentStore.read_segment(file_path)
+
+    @staticmethod
+    def read_legacy(file_path: str) -> list:
+        """
+        读取旧版整文件 JSON 数组
+
+        :param file_path: 旧版JSON文件路径
+        :return: 推文数据列表，文件损坏时返回空列表（文件本身保持不动）
+        """
+        if not os.path.exists(file_path):
+            return []
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, list) else []
+        except json.JSONDecodeError:
+            print(f"⚠️ 旧版数据文件损坏，已跳过: {file_path}")
+            return []
+
+    def load_day(self, date_str: str) -> list:
+        """
+        读取某天的全部推文（冷数据 + 旧版JSON + 新版段文件，按ID去重）
+
+        :param date_str: 日期字符串 (YYYY-MM-DD)
+        :return: 推文数据列表
+        """
+        with self._lock:
+            self._sync_handle(date_str)
+        tweets = []
+        seen = set()
+        for path in (self.cold.path(date_str), self.legacy_path(date_str), self.segment_path(date_str)):
+            for tweet in self.read_file(path):
+                tweet_id = tweet.get('id')
+                if tweet_id and tweet_id in seen:
+                    continue
+                seen.add(tweet_id)
+                tweets.append(tweet)
+        return tweets
+
+    # ---------- 写入 ----------
+
+    def append(self, tweet_data: dict, date_str: str):
+        """
+        追加一条推文到指定日期的段文件，同一天内按ID去重
+
+        :param tweet_data: 推文数据
+        :param date_str: 日期字符串 (YYYY-MM-DD)
+        :return: 记录位置 (段文件名, 字节偏移, 字节长度)，重复推文返回None
+        """
+        tweet_id = tweet_data.get('id')
+        with self._lock:
+            ids = self._get_day_ids(date_str)
+            if tweet_id and tweet_id in ids:
+                return None
+
+            record = encode_record(tweet_data)
+            handle = self._get_handle(date_str)
+            handle.seek(0, os.SEEK_END)
+            offset = handle.tell()
+            handle.write(record)
+            handle.flush()
+            if tweet_id:
+                ids.add(tweet_id)
+
+            self._pending += 1
+            if self._pending >= self.fsync_every or time.time() - self._last_fsync >= self.fsync_interval:
+                self._fsync_all()
+            return os.path.basename(self.segment_path(date_str)), offset, len(record)
+
+    def flush(self):
+        """立即将所有未同步的写入fsync到磁盘"""
+        with self._lock:
+            self._fsync_all()
+
+    def tier_cold(self, before_date: str) -> list:
+        """
+        把早于指定日期的热数据文件压缩到冷数据层
+
+        :param before_date: 日期字符串 (YYYY-MM-DD)，早于该日期（不含）的日期会被压缩
+        :return: 被压缩的日期列表
+        """
+        tiered = []
+        with self._lock:
+            for date_str in self.list_days(include_cold=False):
+                if date_str >= before_date:
+                    break
+                handle = self._handles.pop(date_str, None)
+                if handle is not None:
+                    handle.flush()
+                    os.fsync(handle.fileno())
+                    handle.close()
+                segment_path = self.segment_path(date_str)
+                self.recover_tail(segment_path)
+                info = self.cold.compress_day(date_str, [self.legacy_path(date_str), segment_path])
+                tiered.append(date_str)
+                print(f"🧊 已压缩到冷数据层: {date_str} ({info['count']} 条，{info['raw_bytes']} -> {info['bytes']} 字节)")
+        return tiered
+
+    def close(self):
+        """同步并关闭所有打开的段文件"""
+        with self._lock:
+            self._fsync_all()
+            for handle in self._handles.values():
+                handle.close()
+            self._handles.clear()
+
+    def _get_day_ids(self, date_str: str) -> set:
+        ids = self._day_ids.get(date_str)
+        if ids is None:
+            ids = {t.get('id') for t in self.load_day(date_str) if t.get('id')}
+            self._day_ids[date_str] = ids
+        return ids
+
+    def _get_handle(self, date_str: str):
+        handle = self._handles.pop(date_str, None)
+        if handle is None:
+            if len(self._handles) >= MAX_OPEN_SEGMENTS:
+                # 关闭最久未写入的段文件
+                oldest = next(iter(self._handles))
+                old_handle = self._handles.pop(oldest)
+                old_handle.flush()
+                os.fsync(old_handle.fileno())
+                old_handle.close()
+            file_path = self.segment_path(date_str)
+            self.recover_tail(file_path)
+            handle = open(file_path, 'ab')
+        # 保持字典按最近写入排序
+        self._handles[date_str] = handle
+        return handle
+
+    def _sync_handle(self, date_str: str):
+        # 读取前把缓冲区内容交给操作系统，保证读到本进程刚写入的记录
+        handle = self._handles.get(date_str)
+        if handle is not None:
+            handle.flush()
+
+    def _fsync_all(self):
+        for handle in self._handles.values():
+            try:
+                handle.flush()
+                os.fsync(handle.fileno())
+            except (OSError, ValueError) as e:
+                print(f"⚠️ fsync失败: {str(e)}")
+        self._pending = 0
+        self._last_fsync = time.time()
+
+    @staticmethod
+    def recover_tail(file_path: str) -> int:
+        """
+        修复段文件尾部：截掉最后一个完整JSON行之后的残缺内容，
+        残缺内容另存为 .corrupt 文件以便人工检查
+
+        :param file_path: 段文件路径
+        :return: 截掉的字节数
+        """
+        if not os.path.exists(file_path):
+            return 0
+
+        size = os.path.getsize(file_path)
+        if size == 0:
+            return 0
+
+        # 每条记录都以换行符结尾，最后一个换行符之后的内容就是写了一半的残缺记录；
+        # 从文件尾部按块向前查找，避免为此读入整个文件
+        good_end = 0
+        with open(file_path, 'rb') as f:
+            pos = size
+            while pos > 0:
+                start = max(0, pos - 65536)
+                f.seek(start)
+                chunk = f.read(pos - start)
+                idx = chunk.rfind(b"\n")
+                if idx >= 0:
+                    good_end = start + idx + 1
+                    break
+                pos = start
+            if good_end == size:
+                return 0
+            f.seek(good_end)
+            tail = f.read()
+
+        corrupt_path = f"{file_path}.corrupt-{int(time.time())}"
+        with open(corrupt_path, 'wb') as f:
+            f.write(tail)
+        with open(file_path, 'r+b') as f:
+            f.truncate(good_end)
+            f.flush()
+            os.fsync(f.fileno())
+
+        print(f"🩹 已修复段文件尾部: {file_path}，截掉 {size - good_end} 字节，残缺内容保存在 {corrupt_path}")
+        return size - good_end
+
+
+class TweetIdIndex:
+    """
+    持久化的推文ID索引：id -> (数据文件名, 字节偏移, 字节长度)
+
+    索引文件 tweet_ids.idx 每行一条 "id\t文件名\t偏移\t长度"，写入推文时追加。
+    加载时与数据目录核对：段文件有未索引的新增内容时只扫描新增部分，
+    文件被替换或截断时重建该文件的索引。旧版 .json 文件和冷数据 .jsonl.gz 文件无法按偏移读取，
+    偏移记为 -1、长度记为文件大小，读取时整文件解析。
+    """
+
+    def __init__(self, data_dir: str = "data"):
+        """
+        :param data_dir: 数据存储目录
+        """
+        self.data_dir = data_dir
+        self.index_path = os.path.join(data_dir, ID_INDEX_NAME)
+        self._lock = threading.RLock()
+        self._entries = None     # id -> (文件名, 偏移, 长度)
+        self._file_ends = {}     # 文件名 -> 已索引到的字节偏移（旧版文件记录文件大小）
+        self._handle = None
+
+    def _data_files(self) -> dict:
+        return data_file_sizes(self.data_dir)
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        self._file_ends = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) != 4:
+                        continue
+                    tweet_id, filename, offset, length = parts[0], parts[1], int(parts[2]), int(parts[3])
+                    self._entries[tweet_id] = (filename, offset, length)
+                    end = offset + length if offset >= 0 else length
+                    if end > self._file_ends.get(filename, 0):
+                        self._file_ends[filename] = end
+        self._sync()
+
+    def _sync(self) -> int:
+        # 与数据目录核对，补齐或重建过期的部分，返回新增的索引条数
+        files = self._data_files()
+        stale = [name for name in self._file_ends if name not in files]
+        added = []
+        for filename, size in files.items():
+            indexed_end = self._file_ends.get(filename)
+            if filename.endswith((LEGACY_SUFFIX, COLD_SUFFIX)):
+                if indexed_end != size:
+                    stale.append(filename)
+                    added.extend(self._scan_whole(filename, size))
+            elif indexed_end is None or indexed_end < size:
+                added.extend(self._scan_segment(filename, indexed_end or 0))
+            elif indexed_end > size:
+                stale.append(filename)
+                added.extend(self._scan_segment(filename, 0))
+
+        if stale:
+            stale_set = set(stale)
+            self._entries = {k: v for k, v in self._entries.items() if v[0] not in stale_set}
+            for filename in stale_set:
+                self._file_ends.pop(filename, None)
+        for tweet_id, location in added:
+            # 同一ID同时存在于旧版文件和段文件时优先使用段文件（可按偏移读取）
+            existing = self._entries.get(tweet_id)
+            if existing is not None and existing[1] >= 0 and location[1] < 0:
+                continue
+            self._entries[tweet_id] = location
+        for filename, size in files.items():
+            if filename.endswith((LEGACY_SUFFIX, COLD_SUFFIX)):
+                self._file_ends[filename] = size
+
+        if stale:
+            self._rewrite()
+        elif added:
+            self._append_lines(added)
+        return len(added)
+
+    def _scan_segment(self, filename: str, start: int) -> list:
+        found = []
+        path = os.path.join(self.data_dir, filename)
+        offset = start
+        with open(path, 'rb') as f:
+            f.seek(start)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                tweet_id = None
+                matches = ID_PATTERN.findall(raw)
+                if len(matches) == 1:
+                    tweet_id = matches[0].decode('utf-8')
+                elif raw.strip():
+                    try:
+                        tweet_id = json.loads(raw).get('id')
+                    except ValueError:
+                        tweet_id = None
+                if tweet_id:
+                    found.append((str(tweet_id), (filename, offset, len(raw))))
+                offset += len(raw)
+        self._file_ends[filename] = offset
+        return found
+
+    def _scan_whole(self, filename: str, size: int) -> list:
+        tweets = SegmentStore.read_file(os.path.join(self.data_dir, filename))
+        return [(str(t['id']), (filename, -1, size)) for t in tweets if t.get('id')]
+
+    def _format(self, tweet_id: str, location: tuple) -> str:
+        return f"{tweet_id}\t{location[0]}\t{location[1]}\t{location[2]}\n"
+
+    def _append_lines(self, items: list):
+        if self._handle is None:
+            self._handle = open(self.index_path, 'a', encoding='utf-8')
+        self._handle.write(''.join(self._format(k, v) for k, v in items))
+        self._handle.flush()
+
+    def _rewrite(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(self._format(k, v) for k, v in self._entries.items()))
+        os.replace(tmp_path, self.index_path)
+
+    def add(self, tweet_id: str, location: tuple):
+        """
+        记录新写入推文的位置
+
+        :param tweet_id: 推文ID
+        :param location: (段文件名, 字节偏移, 字节长度)
+        """
+        with self._lock:
+            self._load()
+            self._entries[tweet_id] = location
+            end = location[1] + location[2]
+            if end > self._file_ends.get(location[0], 0):
+                self._file_ends[location[0]] = end
+            self._append_lines([(tweet_id, location)])
+
+    def lookup(self, tweet_id: str, refresh: bool = True):
+        """
+        查找推文位置
+
+        :param tweet_id: 推文ID
+        :param refresh: 未命中时是否与数据目录核对一次（可能是其他进程刚写入的推文）
+        :return: (文件名, 偏移, 长度)，不存在时返回None
+        """
+        with self._lock:
+            self._load()
+            location = self._entries.get(tweet_id)
+            if location is None and refresh and self._sync():
+                location = self._entries.get(tweet_id)
+            return location
+
+    def contains(self, tweet_id: str, refresh: bool = True) -> bool:
+        """判断推文ID是否已在索引中"""
+        return self.lookup(tweet_id, refresh) is not None
+
+    def read(self, tweet_id: str):
+        """
+        按索引定位并只解码一条推文
+
+        :param tweet_id: 推文ID
+        :return: 推文数据，不存在时返回None
+        """
+        for attempt in range(2):
+            location = self.lookup(tweet_id)
+            if location is None:
+                return None
+            filename, offset, length = location
+            path = os.path.join(self.data_dir, filename)
+            try:
+                if offset < 0:
+                    for tweet in SegmentStore.read_file(path):
+                        if tweet.get('id') == tweet_id:
+                            return tweet
+                else:
+                    with open(path, 'rb') as f:
+                        f.seek(offset)
+                        tweet = json.loads(f.read(length))
+                    if tweet.get('id') == tweet_id:
+                        return tweet
+            except (OSError, ValueError):
+                pass
+            # 索引已过期（文件被迁移或修复），重建后再试一次
+            self.rebuild()
+        return None
+
+    def refresh(self) -> int:
+        """
+        与数据目录核对一次（数据文件被压缩、迁移后调用）
+
+        :return: 新增的索引条数
+        """
+        with self._lock:
+            self._load()
+            return self._sync()
+
+    def rebuild(self) -> int:
+        """
+        丢弃现有索引，从数据目录完整重建
+
+        :return: 索引条数
+        """
+        with self._lock:
+            self._entries = {}
+            self._file_ends = {}
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+            self._sync()
+            return len(self._entries)
+
+    def ids(self) -> list:
+        """返回索引中的全部推文ID"""
+        with self._lock:
+            self._load()
+            return list(self._entries)
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+    def close(self):
+        """关闭索引文件"""
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+
+class TweetStore:
+    """推文存储接口"""
+
+    def add(self, tweet_data: dict) -> bool:
+        """
+        保存一条推文
+
+        :param tweet_data: 推文数据
+        :return: 是否写入（重复推文返回False）
+        """
+        raise NotImplementedError
+
+    def add_many(self, tweets: list) -> int:
+        """
+        批量保存推文
+
+        :param tweets: 推文数据列表
+        :return: 实际写入的条数
+        """
+        return sum(1 for tweet_data in tweets if self.add(tweet_data))
+
+    def get(self, tweet_id: str):
+        """
+        按ID查找推文
+
+        :param tweet_id: 推文ID
+        :return: 推文数据，不存在时返回None
+        """
+        raise NotImplementedError
+
+    def query(self, author: str = None, start_date: str = None, end_date: str = None,
+              limit: int = None, offset: int = 0) -> list:
+        """
+        按作者/日期筛选推文，按发帖时间倒序（最新的在前）
+
+        :param author: 作者（不区分大小写），为空表示不限
+        :param start_date: 开始日期 (YYYY-MM-DD，北京时间)
+        :param end_date: 结束日期 (YYYY-MM-DD，北京时间，包含当天)
+        :param limit: 最多返回条数，为空表示不限
+        :param offset: 跳过的条数
+        :return: 推文数据列表
+        """
+        raise NotImplementedError
+
+    def iter_newest(self, author: str = None, start_date: str = None, end_date: str = None):
+        """
+        按作者/日期筛选推文，按发帖时间倒序逐条返回；只读取取到的部分，适合"最新N条"查询。
+        日期格式错误时在调用时（而不是迭代时）抛出ValueError。
+
+        :param author: 作者（不区分大小写），为空表示不限
+        :param start_date: 开始日期 (YYYY-MM-DD，北京时间)
+        :param end_date: 结束日期 (YYYY-MM-DD，北京时间，包含当天)
+        :return: 推文数据迭代器
+        """
+        return iter(self.query(author, start_date, end_date))
+
+    def authors(self) -> list:
+        """返回所有出现过的作者"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """返回推文总数"""
+        raise NotImplementedError
+
+    def load_day(self, date_str: str) -> list:
+        """
+        读取某天的全部推文（按发帖日期，北京时间；文件存储中升级前写入的文件按处理日期）
+
+        :param date_str: 日期字符串 (YYYY-MM-DD)
+        :return: 推文数据列表
+        """
+        raise NotImplementedError
+
+    def all(self) -> list:
+        """返回全部推文（不保证顺序）"""
+        raise NotImplementedError
+
+    def contains(self, tweet_id: str) -> bool:
+        """判断推文是否已存储"""
+        return self.get(tweet_id) is not None
+
+    def iter_ids(self):
+        """遍历所有已存储的推文ID"""
+        for tweet in self.all():
+            if tweet.get('id'):
+                yield tweet['id']
+
+    def generation(self) -> str:
+        """
+        存储的版本标识：任何进程写入、压缩或迁移推文后都会改变，用于判断派生的索引是否需要重建
+
+        :return: 版本标识字符串
+        """
+        return str(self.count())
+
+    def flush(self):
+        """将未落盘的写入同步到磁盘"""
+
+    def close(self):
+        """释放存储占用的资源"""
+
+    def stats(self) -> dict:
+        """返回存储的运行统计"""
+        return {}
+
+
+class TweetCache:
+    """
+    按天文件的进程内共享读缓存
+
+    每个日期记录其数据文件的 (mtime, size)，读取时只重新解析发生变化的文件；
+    段文件只会追加，因此变长时只解析新增部分。所有缓存天的推文按发帖时间倒序
+    合并成一个列表并增量维护。缓存占用超过上限时优先淘汰最早的日期。
+    未缓存的分区先查分区清单（热数据查 partitions.json，冷数据查冷数据清单），
+    只有可能满足查询的作者/时间条件时才打开（冷数据即解压）。
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, data_dir: str, max_bytes: int = 256 * 1024 * 1024) -> 'TweetCache':
+        """
+        获取某个数据目录的共享缓存实例（同一进程内的所有存储实例共用）
+
+        :param data_dir: 数据存储目录
+        :param max_bytes: 缓存占用上限（按数据文件大小估算）
+        """
+        key = os.path.abspath(data_dir)
+        with cls._shared_lock:
+            cache = cls._shared.get(key)
+            if cache is None:
+                cache = cls(data_dir, max_bytes)
+                cls._shared[key] = cache
+            else:
+                cache.max_bytes = max_bytes
+            return cache
+
+    def __init__(self, data_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        self.paths = SegmentStore(data_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.cold_loads = 0
+        self.pruned = 0
+        self.manifest = PartitionManifest(data_dir)
+        self._lock = threading.RLock()
+        self._days = {}     # date_str -> 缓存项
+        self._merged = []   # [(发帖时间戳, date_str, 推文)]，按发帖时间倒序
+        self._bytes = 0
+
+    @staticmethod
+    def _stat(path: str):
+        try:
+            st = os.stat(path)
+            return st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
+
+    def _parse_day(self, date_str: str, cold_sig, legacy_sig, segment_sig) -> dict:
+        tweets = []
+        cold_bytes = 0
+        if cold_sig:
+            tweets = SegmentStore.read_cold(self.paths.cold.path(date_str))
+            cold_bytes = self.paths.cold.manifest().get(date_str, {}).get('raw_bytes', cold_sig[1])
+            self.cold_loads += 1
+        ids = {t.get('id') for t in tweets if t.get('id')}
+        if legacy_sig:
+            for tweet in SegmentStore.read_legacy(self.paths.legacy_path(date_str)):
+                tweet_id = tweet.get('id')
+                if tweet_id and tweet_id in ids:
+                    continue
+                ids.add(tweet_id)
+                tweets.append(tweet)
+        offset = 0
+        if segment_sig:
+            segment_tweets, offset = SegmentStore.read_segment_from(self.paths.segment_path(date_str), 0)
+            for tweet in segment_tweets:
+                tweet_id = tweet.get('id')
+                if tweet_id and tweet_id in ids:
+                    continue
+                ids.add(tweet_id)
+                tweets.append(tweet)
+        return {
+            'cold_sig': cold_sig,
+            'legacy_sig': legacy_sig,
+            'segment_sig': segment_sig,
+            'offset': offset,
+            'tweets': tweets,
+            'ids': ids,
+            'authors': {t.get('author') for t in tweets if t.get('author')},
+            'cold_bytes': cold_bytes,
+            'bytes': cold_bytes + (legacy_sig[1] if legacy_sig else 0) + (segment_sig[1] if segment_sig else 0),
+        }
+
+    @staticmethod
+    def _sorted_entries(date_str: str, tweets: list) -> list:
+        entries = [(tweet_epoch(t), date_str, t) for t in tweets]
+        entries.sort(key=lambda e: e[0], reverse=True)
+        return entries
+
+    def _merge(self, entries: list):
+        if entries:
+            self._merged = list(heapq.merge(self._merged, entries, key=lambda e: e[0], reverse=True))
+
+    def _drop(self, date_str: str):
+        entry = self._days.pop(date_str, None)
+        if entry is not None:
+            self._bytes -= entry['bytes']
+            self._merged = [e for e in self._merged if e[1] != date_str]
+
+    def _evict(self):
+        # 优先淘汰最早的日期；当前被读取的日期即使被淘汰，本次调用仍可使用其数据
+        while self._bytes > self.max_bytes and self._days:
+            self._drop(min(self._days))
+            self.evictions += 1
+
+    def _sigs(self, date_str: str) -> tuple:
+        return (self._stat(self.paths.cold.path(date_str)),
+                self._stat(self.paths.legacy_path(date_str)),
+                self._stat(self.paths.segment_path(date_str)))
+
+    @staticmethod
+    def _manifest_sigs(sigs: tuple) -> list:
+        return [list(sig) if sig else None for sig in sigs]
+
+    def _load(self, date_str: str, sigs: tuple = None) -> dict:
+        cold_sig, legacy_sig, segment_sig = sigs or self._sigs(date_str)
+        entry = self._days.get(date_str)
+
+        if (entry is not None and entry['cold_sig'] == cold_sig and entry['legacy_sig'] == legacy_sig
+                and entry['segment_sig'] == segment_sig):
+            self.hits += 1
+            return entry
+        self.misses += 1
+
+        if (entry is not None and entry['cold_sig'] == cold_sig and entry['legacy_sig'] == legacy_sig
+                and entry['segment_sig'] and segment_sig and segment_sig[1] > entry['segment_sig'][1]):
+            # 段文件只追加：只解析新增部分
+            new_tweets, entry['offset'] = SegmentStore.read_segment_from(
+                self.paths.segment_path(date_str), entry['offset'])
+            added = []
+            for tweet in new_tweets:
+                tweet_id = tweet.get('id')
+                if tweet_id and tweet_id in entry['ids']:
+                    continue
+                entry['ids'].add(tweet_id)
+                added.append(tweet)
+            entry['tweets'].extend(added)
+            entry['authors'].update(t.get('author') for t in added if t.get('author'))
+            entry['segment_sig'] = segment_sig
+            new_bytes = entry['cold_bytes'] + (legacy_sig[1] if legacy_sig else 0) + segment_sig[1]
+            self._bytes += new_bytes - entry['bytes']
+            entry['bytes'] = new_bytes
+            self._merge(self._sorted_entries(date_str, added))
+            self.manifest.update(date_str, self._manifest_sigs((cold_sig, legacy_sig, segment_sig)), entry['tweets'])
+            self._evict()
+            return entry
+
+        # 文件被替换或缩短（迁移、尾部修复、压缩到冷数据层等），整天重新解析
+        self._drop(date_str)
+        entry = self._parse_day(date_str, cold_sig, legacy_sig, segment_sig)
+        if cold_sig or legacy_sig or segment_sig:
+            self._days[date_str] = entry
+            self._bytes += entry['bytes']
+            self._merge(self._sorted_entries(date_str, entry['tweets']))
+            if legacy_sig or segment_sig:
+                self.manifest.update(date_str, self._manifest_sigs((cold_sig, legacy_sig, segment_sig)), entry['tweets'])
+            self._evict()
+        return entry
+
+    def load_day(self, date_str: str) -> list:
+        """
+        读取某天的全部推文（经缓存）
+
+        :param date_str: 日期字符串 (YYYY-MM-DD)
+        :return: 推文数据列表
+        """
+        with self._lock:
+            tweets = list(self._load(date_str)['tweets'])
+            self.manifest.save()
+            return tweets
+
+    def _partition_info(self, date_str: str, sigs: tuple):
+        # 热数据分区查分区清单（签名需一致），只有冷数据的分区查冷数据清单
+        cold_sig, legacy_sig, segment_sig = sigs
+        if legacy_sig or segment_sig:
+            return self.manifest.get(date_str, self._manifest_sigs(sigs))
+        if cold_sig:
+            return self.paths.cold.info(date_str)
+        return None
+
+    def _refresh_all(self, start_epoch: int = None, end_epoch: int = None, author: str = None,
+                     stats_only: bool = False) -> tuple:
+        days = self.paths.list_days()
+        current = set(days)
+        for date_str in [d for d in self._days if d not in current]:
+            self._drop(date_str)
+            self.manifest.discard(date_str)
+        self._evict()
+
+        # 从最新的日期开始加载，放不进缓存的旧日期只在本次调用中临时使用；
+        # 未缓存的分区在清单表明不可能匹配时不打开，只需统计信息时直接使用清单
+        transient = []
+        skipped = []
+        for date_str in reversed(days):
+            sigs = self._sigs(date_str)
+            if date_str not in self._days:
+                info = self._partition_info(date_str, sigs)
+                if info is not None and (stats_only or not partition_may_match(info, start_epoch, end_epoch, author)):
+                    skipped.append((date_str, info))
+                    if not stats_only:
+                        self.pruned += 1
+                    continue
+            entry = self._load(date_str, sigs)
+            if date_str not in self._days:
+                transient.append((date_str, entry))
+        self.manifest.save()
+        return transient, skipped
+
+    def sorted_entries(self, start_epoch: int = None, end_epoch: int = None, author: str = None) -> list:
+        """
+        返回推文，按发帖时间倒序。指定条件时，清单表明不可能匹配的分区不会被打开
+        （返回结果仍可能包含不满足条件的推文，由调用方筛选）
+
+        :param start_epoch: 开始时间戳，为空表示不限
+        :param end_epoch: 结束时间戳（不含），为空表示不限
+        :param author: 作者（不区分大小写），为空表示不限
+        :return: [(发帖时间戳, date_str, 推文)] 列表
+        """
+        with self._lock:
+            transient, _ = self._refresh_all(start_epoch, end_epoch, author)
+            if not transient:
+                return self._merged
+            runs = [self._sorted_entries(d, entry['tweets']) for d, entry in transient]
+            return list(heapq.merge(self._merged, *runs, key=lambda e: e[0], reverse=True))
+
+    def iter_entries(self, start_epoch: int = None, end_epoch: int = None, author: str = None):
+        """
+        惰性归并各分区，按发帖时间倒序逐条返回 (发帖时间戳, date_str, 推文)
+
+        已缓存的分区作为一个已排序的段；未缓存的分区以清单中的最大发帖时间作为上界，
+        归并进行到该上界时才打开。指定开始时间时，归并越过开始时间后立即停止，
+        因此"最新N条"只会读取最新的几个分区。返回结果仍需调用方按条件筛选。
+
+        :param start_epoch: 开始时间戳，为空表示不限
+        :param end_epoch: 结束时间戳（不含），为空表示不限
+        :param author: 作者（不区分大小写），为空表示不限
+        :return: 生成器
+        """
+        heap = []   # (-上界, 序号, 段的当前条目, 段的剩余部分, 未打开的分区日期)
+        seq = itertools.count()
+
+        def push_run(entries, push=heap.append):
+            run = iter(entries)
+            head = next(run, None)
+            if head is not None:
+                push((-head[0], next(seq), head, run, None))
+
+        with self._lock:
+            days = self.paths.list_days()
+            current = set(days)
+            for date_str in [d for d in self._days if d not in current]:
+                self._drop(date_str)
+                self.manifest.discard(date_str)
+
+            # 核对已缓存的分区；没有有效清单项的分区无法估计上界，立即打开
+            opened = set()
+            day_sigs = {}
+            for date_str in days:
+                sigs = day_sigs[date_str] = self._sigs(date_str)
+                if date_str in self._days:
+                    self._load(date_str, sigs)
+                elif self._partition_info(date_str, sigs) is None:
+                    entry = self._load(date_str, sigs)
+                    opened.add(date_str)
+                    if date_str not in self._days:
+                        push_run(self._sorted_entries(date_str, entry['tweets']))
+            push_run(self._merged)
+
+            # 其余未缓存的分区（包括刚才加载时被淘汰的）按清单上界延迟打开
+            for date_str in days:
+                if date_str in self._days or date_str in opened:
+                    continue
+                info = self._partition_info(date_str, day_sigs[date_str])
+                if info is None:
+                    continue
+                if not partition_may_match(info, start_epoch, end_epoch, author):
+                    self.pruned += 1
+                    continue
+                heap.append((-(info.get('max_epoch') or 0), next(seq), None, None, date_str))
+            self.manifest.save()
+        heapq.heapify(heap)
+
+        def push(item):
+            heapq.heappush(heap, item)
+
+        def generate():
+            while heap:
+                neg_bound, _, head, run, date_str = heapq.heappop(heap)
+                if start_epoch is not None and -neg_bound < start_epoch:
+                    return
+                if date_str is not None:
+                    with self._lock:
+                        entry = self._load(date_str)
+                        self.manifest.save()
+                    push_run(self._sorted_entries(date_str, entry['tweets']), push)
+                    continue
+                yield head
+                push_run(run, push)
+
+        return generate()
+
+    def authors(self) -> set:
+        """返回所有出现过的作者（未缓存的分区取自清单）"""
+        with self._lock:
+            transient, skipped = self._refresh_all(stats_only=True)
+            authors = set()
+            for entry in list(self._days.values()) + [entry for _, entry in transient]:
+                authors.update(entry['authors'])
+            for _, info in skipped:
+                authors.update(info.get('authors', []))
+            return authors
+
+    def count(self) -> int:
+        """返回推文总数（未缓存的分区取自清单）"""
+        with self._lock:
+            transient, skipped = self._refresh_all(stats_only=True)
+            return (len(self._merged) + sum(len(entry['tweets']) for _, entry in transient)
+                    + sum(info.get('count', 0) for _, info in skipped))
+
+    def stats(self) -> dict:
+        """返回缓存命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'cold_loads': self.cold_loads,
+                'pruned_partitions': self.pruned,
+                'cached_days': len(self._days),
+                'cached_tweets': len(self._merged),
+                'cached_bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+class FileTweetStore(TweetStore):
+    """基于按发帖日期分区的段文件的推文存储，读取经进程内缓存，按分区清单裁剪后在内存中筛选"""
+
+    def __init__(self, data_dir: str = "data", fsync_every: int = 20, fsync_interval: float = 5.0,
+                 cache_max_bytes: int = 256 * 1024 * 1024, cold_after_days: int = 0):
+        """
+        :param data_dir: 数据存储目录
+        :param fsync_every: 累计多少条未同步记录后执行一次fsync
+        :param fsync_interval: 距上次fsync超过多少秒后执行一次fsync
+        :param cache_max_bytes: 读缓存占用上限（字节）
+        :param cold_after_days: 数据文件超过多少天后压缩到冷数据层（每天写入第一条推文时检查），0表示不自动压缩
+        """
+        self.data_dir = data_dir
+        self.segments = SegmentStore(data_dir, fsync_every=fsync_every, fsync_interval=fsync_interval)
+        self.cache = TweetCache.shared(data_dir, cache_max_bytes)
+        self.id_index = TweetIdIndex(data_dir)
+        self.cold_after_days = cold_after_days
+        self._last_tier_date = None
+
+    def add(self, tweet_data: dict) -> bool:
+        tweet_id = tweet_data.get('id')
+        # 写入路径只查内存中的索引，不为每条新推文扫描数据目录
+        if tweet_id and self.id_index.contains(tweet_id, refresh=False):
+            return False
+        today = datetime.now().strftime("%Y-%m-%d")
+        if self.cold_after_days > 0 and self._last_tier_date != today:
+            self._last_tier_date = today
+            try:
+                self.tier()
+            except OSError as e:
+                print(f"⚠️ 压缩冷数据失败: {str(e)}")
+        normalize_tweet(tweet_data)
+        # 按发帖日期分区，发帖时间未知时退回处理日期
+        date_str = partition_date(tweet_data) or tweet_data.get('processed_date') or today
+        location = self.segments.append(tweet_data, date_str)
+        if location is None:
+            return False
+        if tweet_id:
+            self.id_index.add(tweet_id, location)
+        return True
+
+    def get(self, tweet_id: str):
+        return self.id_index.read(tweet_id)
+
+    def contains(self, tweet_id: str) -> bool:
+        return self.id_index.contains(tweet_id)
+
+    def iter_ids(self):
+        return iter(self.id_index.ids())
+
+    def generation(self) -> str:
+        # 数据文件只追加写，压缩和迁移会增删文件，文件名和大小的摘要即可反映所有写入
+        files = sorted(data_file_sizes(self.data_dir).items())
+        return hashlib.sha1(json.dumps(files).encode('utf-8')).hexdigest()
+
+    def query(self, author: str = None, start_date: str = None, end_date: str = None,
+              limit: int = None, offset: int = 0) -> list:
+        end = offset + limit if limit is not None else None
+        return list(itertools.islice(self.iter_newest(author, start_date, end_date), offset, end))
+
+    def iter_newest(self, author: str = None, start_date: str = None, end_date: str = None):
+        start_epoch, end_epoch = date_range_to_epochs(start_date, end_date)
+        author_lc = author.lower() if author else None
+        has_range = start_epoch is not None or end_epoch is not None
+        entries = self.cache.iter_entries(start_epoch, end_epoch, author)
+
+        def generate():
+            # 归并结果已按发帖时间倒序排列，逐条筛选即可
+            for epoch, _, tweet in entries:
+                if author_lc and tweet.get('author', '').lower() != author_lc:
+                    continue
+                if has_range:
+                    if not epoch:
+                        continue
+                    if start_epoch is not None and epoch < start_epoch:
+                        continue
+                    if end_epoch is not None and epoch >= end_epoch:
+                        continue
+                yield tweet
+
+        return generate()
+
+    def authors(self) -> list:
+        return sorted(self.cache.authors())
+
+    def count(self) -> int:
+        return self.cache.count()
+
+    def load_day(self, date_str: str) -> list:
+        return self.cache.load_day(date_str)
+
+    def all(self) -> list:
+        return [tweet for _, _, tweet in self.cache.sorted_entries()]
+
+    def tier(self, cold_after_days: int = None) -> list:
+        """
+        把超过指定天数的数据文件压缩到冷数据层
+
+        :param cold_after_days: 天数，为空时使用初始化时的配置
+        :return: 被压缩的日期列表
+        """
+        days = self.cold_after_days if cold_after_days is None else cold_after_days
+        before_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        tiered = self.segments.tier_cold(before_date)
+        if tiered:
+            # 数据文件已移动，更新推文ID索引中的位置
+            self.id_index.refresh()
+        return tiered
+
+    def flush(self):
+        self.segments.flush()
+
+    def close(self):
+        self.segments.close()
+        self.id_index.close()
+
+    def stats(self) -> dict:
+        manifest = self.segments.cold.manifest()
+        return {
+            'backend': 'file',
+            'cache': self.cache.stats(),
+            'cold': {
+                'days': len(manifest),
+                'tweets': sum(info.get('count', 0) for info in manifest.values()),
+                'bytes': sum(info.get('bytes', 0) for info in manifest.values()),
+                'raw_bytes': sum(info.get('raw_bytes', 0) for info in manifest.values()),
+            },
+        }
+
+
+class SQLiteTweetStore(TweetStore):
+    """基于SQLite（WAL模式）的推文存储，筛选和排序都在SQL中完成"""
+
+    def __init__(self, db_path: str = os.path.join("data", SQLITE_DB_NAME)):
+        """
+        :param db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.init_database()
+
+    def _connect(self):
+        # 每个线程复用一个连接；WAL模式下读写互不阻塞
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def init_database(self):
+        """初始化数据库表和索引"""
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS tweets (
+                id TEXT PRIMARY KEY,
+                author TEXT NOT NULL DEFAULT '' COLLATE NOCASE,
+                created_at_epoch INTEGER,
+                processed_date TEXT,
+                data TEXT NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tweets_author_created ON tweets (author, created_at_epoch)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tweets_created ON tweets (created_at_epoch)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tweets_processed_date ON tweets (processed_date)')
+        conn.commit()
+
+    @staticmethod
+    def _row_values(tweet_data: dict) -> tuple:
+        normalize_tweet(tweet_data)
+        return (
+            tweet_data.get('id'),
+            tweet_data.get('author') or '',
+            tweet_data['created_at_epoch'],
+            tweet_data.get('processed_date') or datetime.now().strftime("%Y-%m-%d"),
+            json.dumps(tweet_data, ensure_ascii=False),
+        )
+
+    def add(self, tweet_data: dict) -> bool:
+        if not tweet_data.get('id'):
+            return False
+        conn = self._connect()
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO tweets (id, author, created_at_epoch, processed_date, data) VALUES (?, ?, ?, ?, ?)',
+            self._row_values(tweet_data))
+        conn.commit()
+        return cursor.rowcount > 0
+
+    def add_many(self, tweets: list) -> int:
+        """
+        批量写入推文（单个事务）
+
+        :param tweets: 推文数据列表
+        :return: 实际写入的条数
+        """
+        conn = self._connect()
+        before = conn.total_changes
+        conn.executemany(
+            'INSERT OR IGNORE INTO tweets (id, author, created_at_epoch, processed_date, data) VALUES (?, ?, ?, ?, ?)',
+            [self._row_values(t) for t in tweets if t.get('id')])
+        conn.commit()
+        return conn.total_changes - before
+
+    def get(self, tweet_id: str):
+        row = self._connect().execute('SELECT data FROM tweets WHERE id = ?', (tweet_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def contains(self, tweet_id: str) -> bool:
+        row = self._connect().execute('SELECT 1 FROM tweets WHERE id = ?', (tweet_id,)).fetchone()
+        return row is not None
+
+    def iter_ids(self):
+        for row in self._connect().execute('SELECT id FROM tweets'):
+            yield row[0]
+
+    @staticmethod
+    def _where(author: str = None, start_date: str = None, end_date: str = None) -> tuple:
+        start_epoch, end_epoch = date_range_to_epochs(start_date, end_date)
+
+        conditions = []
+        params = []
+        if author:
+            conditions.append('author = ?')
+            params.append(author)
+        if start_epoch is not None:
+            conditions.append('created_at_epoch >= ?')
+            params.append(start_epoch)
+        if end_epoch is not None:
+            conditions.append('created_at_epoch < ?')
+            params.append(end_epoch)
+        return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+    def query(self, author: str = None, start_date: str = None, end_date: str = None,
+              limit: int = None, offset: int = 0) -> list:
+        where, params = self._where(author, start_date, end_date)
+        sql = 'SELECT data FROM tweets' + where + ' ORDER BY created_at_epoch DESC LIMIT ? OFFSET ?'
+        params.extend([limit if limit is not None else -1, offset])
+        return [json.loads(row[0]) for row in self._connect().execute(sql, params)]
+
+    def iter_newest(self, author: str = None, start_date: str = None, end_date: str = None):
+        where, params = self._where(author, start_date, end_date)
+        # 按 created_at_epoch 索引顺序逐行读取，调用方取够即停
+        cursor = self._connect().execute('SELECT data FROM tweets' + where + ' ORDER BY created_at_epoch DESC', params)
+        return (json.loads(row[0]) for row in cursor)
+
+    def authors(self) -> list:
+        return [row[0] for row in self._connect().execute(
+            "SELECT DISTINCT author FROM tweets WHERE author != '' ORDER BY author")]
+
+    def count(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM tweets').fetchone()[0]
+
+    def generation(self) -> str:
+        # 新写入的行 rowid 递增，删除会改变行数
+        count, max_rowid = self._connect().execute('SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM tweets').fetchone()
+        return f"{count}:{max_rowid}"
+
+    def load_day(self, date_str: str) -> list:
+        start_epoch, end_epoch = date_range_to_epochs(date_str, date_str)
+        return [json.loads(row[0]) for row in self._connect().execute(
+            'SELECT data FROM tweets WHERE created_at_epoch >= ? AND created_at_epoch < ?', (start_epoch, end_epoch))]
+
+    def all(self) -> list:
+        return [json.loads(row[0]) for row in self._connect().execute('SELECT data FROM tweets')]
+
+    def stats(self) -> dict:
+        return {'backend': 'sqlite', 'db_path': self.db_path}
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def create_tweet_store(backend: str = "file", data_dir: str = "data", **kwargs) -> TweetStore:
+    """
+    根据配置创建推文存储
+
+    :param backend: 存储后端，file 或 sqlite
+    :param data_dir: 数据存储目录
+    :param kwargs: 文件后端参数（fsync_every / fsync_interval / cache_max_bytes / cold_after_days）
+    :return: TweetStore实例
+    """
+    if backend == "sqlite":
+        return SQLiteTweetStore(os.path.join(data_dir, SQLITE_DB_NAME))
+    if backend != "file":
+        print(f"⚠️ 未知的存储后端 {backend}，使用文件存储")
+    return FileTweetStore(data_dir, **kwargs)
+
+
+def migrate_legacy_files(data_dir: str = "data") -> dict:
+    """
+    一次性迁移：将旧版 tweets_*.json 转换为 tweets_*.jsonl 段文件
+
+    迁移成功的旧文件重命名为 .json.migrated 作为备份；损坏的旧文件保持原样并在结果中列出。
+    迁移会替换段文件，请在停止监控后执行。
+
+    :param data_dir: 数据存储目录
+    :return: 迁移统计
+    """
+    store = SegmentStore(data_dir)
+    result = {"migrated_files": 0, "migrated_tweets": 0, "skipped_duplicates": 0, "failed_files": []}
+
+    for filename in sorted(os.listdir(data_dir)) if os.path.exists(data_dir) else []:
+        if not (filename.startswith(SEGMENT_PREFIX) and filename.endswith(LEGACY_SUFFIX)):
+            continue
+        date_str = filename[len(SEGMENT_PREFIX):-len(LEGACY_SUFFIX)]
+        legacy_path = os.path.join(data_dir, filename)
+
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+            if not isinstance(legacy, list):
+                raise ValueError("数据格式错误，应该是列表")
+        except (ValueError, OSError) as e:
+            print(f"❌ 无法迁移 {filename}: {e}")
+            result["failed_files"].append(filename)
+            continue
+
+        # 与已存在的段文件合并，按ID去重
+        segment_path = store.segment_path(date_str)
+        store.recover_tail(segment_path)
+        existing = SegmentStore.read_segment(segment_path)
+        seen = set()
+        merged = []
+        for tweet in legacy + existing:
+            tweet_id = tweet.get('id')
+            if tweet_id and tweet_id in seen:
+                result["skipped_duplicates"] += 1
+                continue
+            seen.add(tweet_id)
+            merged.append(tweet)
+
+        # 先写临时文件再原子替换，避免迁移中途崩溃导致数据丢失
+        tmp_path = segment_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            for tweet in merged:
+                f.write(encode_record(tweet))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, segment_path)
+        os.replace(legacy_path, legacy_path + ".migrated")
+
+        result["migrated_files"] += 1
+        result["migrated_tweets"] += len(legacy)
+        print(f"✅ 已迁移 {filename} -> {os.path.basename(segment_path)} ({len(merged)} 条)")
+
+    if result["migrated_files"]:
+        # 段文件已被整体替换，原有的偏移全部失效
+        TweetIdIndex(data_dir).rebuild()
+    return result
+
+
+def import_json_archive(data_dir: str = "data", batch_size: int = 500) -> dict:
+    """
+    将按天文件中的推文（.json / .jsonl）导入SQLite存储，可重复执行
+
+    :param data_dir: 数据存储目录
+    :param batch_size: 每个事务写入的条数
+    :return: 导入统计
+    """
+    segments = SegmentStore(data_dir)
+    store = SQLiteTweetStore(os.path.join(data_dir, SQLITE_DB_NAME))
+    result = {"days": 0, "read": 0, "imported": 0}
+
+    batch = []
+    for date_str in segments.list_days():
+        tweets = segments.load_day(date_str)
+        for tweet in tweets:
+            tweet.setdefault('processed_date', date_str)
+            batch.append(tweet)
+            if len(batch) >= batch_size:
+                result["imported"] += store.add_many(batch)
+                batch = []
+        result["days"] += 1
+        result["read"] += len(tweets)
+    if batch:
+        result["imported"] += store.add_many(batch)
+
+    store.close()
+    return result
+
+
+def backfill_derived_fields(data_dir: str = "data") -> dict:
+    """
+    为历史推文补齐 created_at_epoch / formatted_created_at / beijing_time 字段，可重复执行。
+    会改写数据文件，请在停止监控后执行。
+
+    :param data_dir: 数据存储目录
+    :return: 补齐统计
+    """
+    result = {"files": 0, "tweets": 0, "sqlite_rows": 0}
+    segments = SegmentStore(data_dir)
+
+    for date_str in segments.list_days():
+        # 新版段文件
+        segment_path = segments.segment_path(date_str)
+        if os.path.exists(segment_path):
+            SegmentStore.recover_tail(segment_path)
+            tweets = SegmentStore.read_segment(segment_path)
+            changed = sum(1 for t in tweets if 'created_at_epoch' not in t or 'formatted_created_at' not in t)
+            if changed:
+                tmp_path = segment_path + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    for tweet in tweets:
+                        f.write(encode_record(normalize_tweet(tweet)))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, segment_path)
+                result["files"] += 1
+                result["tweets"] += changed
+
+        # 旧版JSON文件保持原格式
+        legacy_path = segments.legacy_path(date_str)
+        if os.path.exists(legacy_path):
+            tweets = SegmentStore.read_legacy(legacy_path)
+            changed = sum(1 for t in tweets if 'created_at_epoch' not in t or 'formatted_created_at' not in t)
+            if changed:
+                tmp_path = legacy_path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump([normalize_tweet(t) for t in tweets], f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, legacy_path)
+                result["files"] += 1
+                result["tweets"] += changed
+
+    if result["files"]:
+        TweetIdIndex(data_dir).rebuild()
+
+    db_path = os.path.join(data_dir, SQLITE_DB_NAME)
+    if os.path.exists(db_path):
+        store = SQLiteTweetStore(db_path)
+        conn = store._connect()
+        updates = []
+        for row_id, data in conn.execute('SELECT id, data FROM tweets'):
+            tweet = json.loads(data)
+            if 'created_at_epoch' in tweet and 'formatted_created_at' in tweet:
+                continue
+            normalize_tweet(tweet)
+            updates.append((tweet['created_at_epoch'], json.dumps(tweet, ensure_ascii=False), row_id))
+        conn.executemany('UPDATE tweets SET created_at_epoch = ?, data = ? WHERE id = ?', updates)
+        conn.commit()
+        store.close()
+        result["sqlite_rows"] = len(updates)
+
+    return result
+
+
+def tier_cold_days(data_dir: str = "data", cold_after_days: int = 30) -> list:
+    """
+    把超过指定天数的按天文件压缩到冷数据层，可重复执行。
+    监控运行中请通过 COLD_AFTER_DAYS 配置由写入进程自动执行，手动执行请先停止监控。
+
+    :param data_dir: 数据存储目录
+    :param cold_after_days: 天数
+    :return: 被压缩的日期列表
+    """
+    before_date = (datetime.now() - timedelta(days=cold_after_days)).strftime("%Y-%m-%d")
+    tiered = SegmentStore(data_dir).tier_cold(before_date)
+    if tiered:
+        TweetIdIndex(data_dir).refresh()
+    return tiered
+
+
+def main():
+    """命令行入口"""
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    data_dir = sys.argv[2] if len(sys.argv) > 2 else "data"
+
+    if command == "migrate":
+        result = migrate_legacy_files(data_dir)
+        print(f"\n迁移文件: {result['migrated_files']} 个，推文: {result['migrated_tweets']} 条，"
+              f"去重: {result['skipped_duplicates']} 条")
+        if result["failed_files"]:
+            print(f"⚠️ 以下文件迁移失败，已保留原样: {', '.join(result['failed_files'])}")
+    elif command == "import-sqlite":
+        result = import_json_archive(data_dir)
+        print(f"✅ 导入完成: {result['days']} 天，读取 {result['read']} 条，新写入 {result['imported']} 条")
+        print(f"📝 在配置中设置 \"STORAGE_BACKEND\": \"sqlite\" 后重启即可启用")
+    elif command == "rebuild-index":
+        started = time.time()
+        count = TweetIdIndex(data_dir).rebuild()
+        print(f"✅ 推文ID索引已重建: {count} 条，耗时 {time.time() - started:.2f} 秒")
+    elif command == "backfill":
+        result = backfill_derived_fields(data_dir)
+        print(f"✅ 补齐完成: 改写文件 {result['files']} 个，推文 {result['tweets']} 条，SQLite记录 {result['sqlite_rows']} 条")
+    elif command == "tier":
+        cold_after_days = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+        tiered = tier_cold_days(data_dir, cold_after_days)
+        print(f"✅ 冷数据压缩完成: {len(tiered)} 天")
+    else:
+        print("用法:")
+        print("  python tweet_store.py migrate [数据目录]        # 将旧版 tweets_*.json 迁移为 .jsonl 段文件")
+        print("  python tweet_store.py import-sqlite [数据目录]  # 将按天文件导入 SQLite 存储")
+        print("  python tweet_store.py rebuild-index [数据目录]  # 从数据目录重建推文ID索引")
+        print("  python tweet_store.py backfill [数据目录]       # 为历史推文补齐发帖时间戳和显示时间")
+        print("  python tweet_store.py tier [数据目录] [天数]    # 将超过指定天数（默认30）的按天文件压缩到冷数据层")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,227 @@
-import requests
 import time
 import json
 import os
+import queue
+import random
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+import openai
 from openai import OpenAI
+from tweet_store import TweetStore, create_tweet_store, tweet_epoch
+from seen_index import SeenIdIndex
+from search_index import SearchIndex, SEARCH_DB_NAME
+from rate_limiter import RateLimiter, ConcurrencyLimiter, parse_retry_seconds
+from circuit_breaker import CircuitBreaker
+from http_client import HttpClient, get_http_client
+from watermarks import WatermarkStore, WATERMARKS_FILE_NAME, tweet_id_value
+from fetch_windows import FetchWindowQueue, FETCH_WINDOWS_FILE_NAME
+from poll_scheduler import PollScheduler
+from backfill_spool import BackfillSpool, BACKFILL_SPOOL_DIR_NAME, DEFERRED_PREFIX
+from llm_cache import LLMResultCache, LLM_CACHE_DB_NAME, llm_cache_key
+from near_dup import NearDuplicateIndex, NEAR_DUP_DB_NAME
+
+# 单页请求遇到429时最多重试的次数（每次重试前由限流器等待）
+MAX_THROTTLE_RETRIES = 5
+
+ADVANCED_SEARCH_URL = "https://api.twitterapi.io/twitter/tweet/advanced_search"
+
+# 补抓得到的推文上记录其失败窗口 (since, until)，处理失败时重新放回该窗口
+RETRY_WINDOW_KEY = "_retry_window"
+
+LLM_MODEL = "qwen-plus"
+
+# 提示词版本：修改提示词后递增，AI结果缓存中旧提示词的结果随之失效
+AI_PROMPT_VERSION = "1"
+
+# AI处理模式：combined 一次调用返回JSON，separate 为翻译、解读、标题三次调用
+AI_MODES = ("combined", "separate")
+
+# AI处理结果的字段（按逐项调用的顺序）及校验规则
+AI_RESULT_FIELDS = ("translation", "analysis", "title")
+AI_RESULT_SCHEMA = {
+    'translation': {'label': '翻译推文', 'max_length': 4000,
+                    'instruction': '将推文翻译成中文，保持原意和语气'},
+    'analysis': {'label': '解读推文', 'max_length': 2000,
+                 'instruction': '对推文进行深度解读分析，160字左右，从推文的主要信息和观点、可能的背景和原因、'
+                                '对相关领域的影响、其他值得关注的要点等角度展开，要有深度和见解'},
+    'title': {'label': '生成标题', 'max_length': 50,
+              'instruction': '简洁有力的中文标题，控制在15-25个字以内，准确概括推文的核心内容，具有吸引力和新闻性'},
+}
+
+# 逐项调用的提示词
+SEPARATE_PROMPTS = {
+    'translation': """请将以下英文推文翻译成中文，保持原意和语气：
+
+推文内容：{text}
+
+请只返回翻译结果，不要包含其他说明。""",
+    'analysis': """请对以下推文进行深度解读分析，包括其含义、背景、可能的影响等,全文内容在160字左右：
+
+推文内容：{text}
+
+请从以下角度进行分析：
+1. 推文的主要信息和观点
+2. 可能的背景和原因
+3. 对相关领域的影响
+4. 其他值得关注的要点
+
+请用中文回答，内容要有深度和见解。""",
+    'title': """请为以下推文生成一个简洁有力的中文标题，要求：
+1. 控制在15-25个字以内
+2. 能够准确概括推文的核心内容
+3. 具有吸引力和新闻性
+
+推文内容：{text}
+
+请只返回标题，不要包含其他内容。""",
+}
+
+# get_ai_response 在调用失败时返回的提示信息
+AI_ERROR_MARKERS = ("AI处理失败", "API密钥错误", "API配额已用完", "AI返回空响应", "内容安全检查失败")
+
+# 处理失败的结果中包含的标记（这类结果不写入缓存）
+AI_FAILURE_MARKERS = AI_ERROR_MARKERS + ("处理异常", "翻译异常", "解读异常")
+
+# AI调用重试的指数退避：第n次重试前等待 base*2^n 秒（不超过上限），再乘以 0.5~1 的随机抖动
+AI_BACKOFF_BASE = 1.0
+AI_BACKOFF_MAX = 30.0
+# 服务端给出的 Retry-After 超过此秒数时不再等待重试，而是按 Retry-After 熔断、推文推迟处理
+AI_RETRY_AFTER_MAX = 120.0
+
+# 大模型调用错误的分类及说明
+AI_ERROR_KINDS = {
+    'rate_limit': '🚫 频率限制',
+    'quota': '💳 配额已用完',
+    'timeout': '⏰ 请求超时',
+    'connection': '🔌 连接失败',
+    'server': '🔥 服务端错误',
+    'conflict': '🔁 请求超时或冲突',
+    'auth': '🔑 API密钥无效',
+    'content': '🚫 内容安全检查失败',
+    'bad_request': '❌ 请求无效',
+    'unknown': '❓ 未知错误',
+}
+# 说明服务本身出了问题的错误，计入熔断器
+AI_OUTAGE_ERRORS = ('rate_limit', 'timeout', 'connection', 'server', 'unknown')
+# 重试也不会成功的错误，立即停止
+AI_FATAL_ERRORS = ('quota', 'auth', 'content', 'bad_request')
+
+
+class AIUnavailableError(Exception):
+    """大模型服务熔断中，推文应推迟处理"""
+
+
+def classify_ai_error(error: Exception) -> tuple:
+    """
+    按 OpenAI SDK 的异常类型对大模型调用错误分类
+
+    :param error: create 调用抛出的异常
+    :return: (错误类别, 服务端要求的重试等待秒数或None)
+    """
+    retry_after = None
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers is not None:
+        retry_ms = headers.get('retry-after-ms')
+        try:
+            retry_after = float(retry_ms) / 1000 if retry_ms is not None else None
+        except ValueError:
+            retry_after = None
+        if retry_after is None:
+            retry_after = parse_retry_seconds(headers.get('retry-after'))
+
+    message = str(error).lower()
+    code = str(getattr(error, 'code', '') or '').lower()
+    # APITimeoutError 是 APIConnectionError 的子类，要先判断
+    if isinstance(error, openai.APITimeoutError):
+        kind = 'timeout'
+    elif isinstance(error, openai.APIConnectionError):
+        kind = 'connection'
+    elif isinstance(error, openai.RateLimitError):
+        kind = 'quota' if 'insufficient_quota' in code or 'quota' in message else 'rate_limit'
+    elif isinstance(error, (openai.AuthenticationError, openai.PermissionDeniedError)):
+        kind = 'auth'
+    elif isinstance(error, openai.BadRequestError):
+        content = 'data_inspection_failed' in code or 'data_inspection_failed' in message \
+            or 'inappropriate content' in message
+        kind = 'content' if content else 'bad_request'
+    elif isinstance(error, openai.APIStatusError):
+        if error.status_code >= 500:
+            kind = 'server'
+        elif error.status_code in (408, 409):
+            # 与 OpenAI SDK 一致，请求超时和冲突可以重试
+            kind = 'conflict'
+        else:
+            kind = 'bad_request'
+    else:
+        kind = 'unknown'
+    return kind, retry_after
+
+
+def ai_backoff_delay(attempt: int, retry_after: float = None) -> float:
+    """
+    第 attempt 次失败后的重试等待时间：带抖动的指数退避，不短于服务端的 Retry-After
+
+    :param attempt: 已失败的次数（从0开始）
+    :param retry_after: 服务端要求的等待秒数
+    :return: 等待秒数
+    """
+    delay = min(AI_BACKOFF_MAX, AI_BACKOFF_BASE * 2 ** attempt)
+    delay = random.uniform(delay / 2, delay)
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def build_combined_prompt(text: str, fields) -> str:
+    """
+    构造一次返回多个字段的JSON结构化提示词
+
+    :param text: 推文内容
+    :param fields: 要生成的字段
+    :return: 提示词
+    """
+    instructions = "\n".join(f'- "{field}": {AI_RESULT_SCHEMA[field]["instruction"]}' for field in fields)
+    example = json.dumps({field: "..." for field in fields}, ensure_ascii=False)
+    return f"""请处理以下英文推文，只返回一个JSON对象，包含以下字段（值均为中文字符串）：
+{instructions}
+
+推文内容：{text}
+
+请只返回形如 {example} 的JSON，不要包含代码块标记或其他说明。"""
+
+
+def parse_ai_result(response: str, fields) -> tuple:
+    """
+    解析并校验结构化输出；JSON不完整（如被 max_tokens 截断）时逐个提取已完整输出的字段
+
+    :param response: AI响应
+    :param fields: 需要的字段
+    :return: (通过校验的字段字典, 缺少或不合格的字段列表)
+    """
+    text = (response or "").strip()
+    data = None
+    start, end = text.find("{"), text.rfind("}")
+    if start != -1 and end > start:
+        try:
+            data = json.loads(text[start:end + 1], strict=False)
+        except ValueError:
+            data = None
+    if not isinstance(data, dict):
+        data = {}
+        for match in re.finditer(r'"(\w+)"\s*:\s*"((?:[^"\\]|\\.)*)"', text):
+            try:
+                data.setdefault(match.group(1), json.loads(f'"{match.group(2)}"', strict=False))
+            except ValueError:
+                continue
+    result = {}
+    for field in fields:
+        value = data.get(field)
+        if isinstance(value, str) and value.strip() and len(value.strip()) <= AI_RESULT_SCHEMA[field]['max_length']:
+            result[field] = value.strip()
+    return result, [field for field in fields if field not in result]
 
 
 class TwitterAIMonitor:
@@ -11,7 +229,15 @@ class TwitterAIMonitor:
     
     def __init__(self, twitter_api_key: str, llm_url: str, llm_api_key: str, data_dir: str = "data", 
                  dingtalk_webhook: str = "", dingtalk_secret: str = "", enable_dingtalk: bool = False,
-                 ai_max_retries: int = 3, ai_timeout: int = 30, ai_max_tokens: int = 1000):
+                 ai_max_retries: int = 3, ai_timeout: int = 30, ai_max_tokens: int = 1000,
+                 fsync_every: int = 20, fsync_interval: float = 5.0, store: TweetStore = None,
+                 search_index: SearchIndex = None, fetch_workers: int = 8, twitter_rate_limit: float = 5.0,
+                 http_client: HttpClient = None, batch_queries: bool = True, batch_query_max_length: int = 500,
+                 adaptive_polling: bool = True, poll_budget_per_hour: float = 0, poll_min_interval: int = 60,
+                 poll_max_interval: int = 3600, stream_queue_size: int = 50, ai_mode: str = "combined",
+                 ai_workers: int = 4, llm_cache: LLMResultCache = None, llm_cache_max_mb: float = 64,
+                 near_dup_max_distance: int = 3, near_dup_window_days: float = 7,
+                 ai_breaker_threshold: int = 5, ai_breaker_recovery: float = 30):
         """
         初始化监控器
         
@@ -25,11 +251,34 @@ class TwitterAIMonitor:
         :param ai_max_retries: AI调用最大重试次数
         :param ai_timeout: AI调用超时时间（秒）
         :param ai_max_tokens: AI调用最大token数量
+        :param fsync_every: 累计多少条新推文后fsync一次数据文件
+        :param fsync_interval: 距上次fsync超过多少秒后fsync一次数据文件
+        :param store: 推文存储，默认使用 data_dir 下的按天文件存储
+        :param search_index: 全文索引，默认使用 data_dir 下的 search.db
+        :param fetch_workers: 并发抓取账号的线程数
+        :param twitter_rate_limit: TwitterAPI.io 每秒最多请求数（遇到429时自动降速）
+        :param http_client: 发送TwitterAPI.io和钉钉请求的HTTP客户端，默认使用进程内共享的长连接客户端
+        :param batch_queries: 是否把多个账号合并为一个 (from:a OR from:b ...) 查询
+        :param batch_query_max_length: 合并查询的最大字符数，超出时拆成多个查询
+        :param adaptive_polling: 是否按各账号的发帖频率自适应分配检查间隔
+        :param poll_budget_per_hour: 每小时最多检查多少个账号次，为0时与按检查间隔统一轮询的总量相同
+        :param poll_min_interval: 单个账号的最短检查间隔（秒）
+        :param poll_max_interval: 单个账号的最长检查间隔（秒）
+        :param stream_queue_size: 抓取与AI处理之间的队列长度，队列满时抓取线程等待
+        :param ai_mode: AI处理模式，combined 一次调用返回翻译、解读和标题，separate 逐项调用三次
+        :param ai_workers: 并发AI处理的线程数（同时进行的大模型请求数按AIMD在此范围内自动调整）
+        :param llm_cache: AI处理结果缓存，默认使用 data_dir 下的 llm_cache.db
+        :param llm_cache_max_mb: 默认AI处理结果缓存的大小上限（MB），为0时不缓存
+        :param near_dup_max_distance: 判定为近似重复推文的最大SimHash汉明距离，为负数时不检测
+        :param near_dup_window_days: 只和最近多少天内保存的推文比较近似重复
+        :param ai_breaker_threshold: 大模型服务连续失败多少次后熔断
+        :param ai_breaker_recovery: 熔断后多少秒放行一次试探请求（试探失败时翻倍）
         """
         self.twitter_api_key = twitter_api_key
         self.llm_client = OpenAI(
             api_key=llm_api_key,
             base_url=llm_url,
+            max_retries=0,  # 重试由 get_ai_response 按错误类型控制，避免与SDK内置重试叠加
         )
         self.data_dir = data_dir
         self.dingtalk_webhook = dingtalk_webhook
@@ -38,26 +287,93 @@ class TwitterAIMonitor:
         self.ai_max_retries = ai_max_retries
         self.ai_timeout = ai_timeout
         self.ai_max_tokens = ai_max_tokens
+        if ai_mode not in AI_MODES:
+            raise ValueError(f"未知的AI处理模式: {ai_mode}")
+        self.ai_mode = ai_mode
+        # AI工作线程池：新推文提交到线程池并发处理
+        self.ai_workers = max(1, ai_workers)
+        self.ai_pool = ThreadPoolExecutor(max_workers=self.ai_workers, thread_name_prefix="ai")
+        self.ai_limiter = ConcurrencyLimiter(self.ai_workers)
+        self._status_lock = threading.Lock()
+        # 所有AI工作线程共用的熔断器：服务故障期间立即失败，推文推迟处理
+        self.ai_breaker = CircuitBreaker(ai_breaker_threshold, ai_breaker_recovery)
+        self.deferred_count = 0
+        # AI处理结果按内容缓存，相同文字的推文不重复调用大模型
+        if llm_cache is None:
+            llm_cache = LLMResultCache(os.path.join(data_dir, LLM_CACHE_DB_NAME), int(llm_cache_max_mb * 1024 * 1024))
+        self.llm_cache = llm_cache
+        # 近似重复检测：复用最近相似推文的AI结果
+        self.near_dup = None
+        if near_dup_max_distance >= 0:
+            self.near_dup = NearDuplicateIndex(os.path.join(data_dir, NEAR_DUP_DB_NAME), near_dup_max_distance,
+                                               near_dup_window_days)
         # 确保数据目录存在
         os.makedirs(data_dir, exist_ok=True)
+        # 推文存储（默认为追加写的按天段文件）
+        if store is None:
+            store = create_tweet_store("file", data_dir, fsync_every=fsync_every, fsync_interval=fsync_interval)
+        self.store = store
+        # 全局已见推文索引：AI处理前过滤掉已存储的推文
+        self.seen_index = SeenIdIndex(store, data_dir, llm_calls_per_tweet=1 if ai_mode == "combined" else len(AI_RESULT_FIELDS))
+        # 全文索引：保存推文时增量更新
+        if search_index is None:
+            search_index = SearchIndex(os.path.join(data_dir, SEARCH_DB_NAME))
+        self.search_index = search_index
+        # 并发抓取：所有抓取线程共用一个自适应限流器
+        self.fetch_workers = max(1, fetch_workers)
+        self.rate_limiter = RateLimiter(twitter_rate_limit)
+        self.http_client = http_client or get_http_client()
+        self.batch_queries = batch_queries
+        self.batch_query_max_length = batch_query_max_length
+        self.adaptive_polling = adaptive_polling
+        self.poll_budget_per_hour = poll_budget_per_hour
+        self.poll_min_interval = poll_min_interval
+        self.poll_max_interval = poll_max_interval
+        self.stream_queue_size = max(1, stream_queue_size)
+        # 推送接入：推送的推文放入队列，由后台线程处理
+        self._ingest_queue = queue.Queue()
+        self._ingest_lock = threading.Lock()
+        self._ingest_thread = None
+        self._status_dict = None
+        self.ingest_counters = {
+            'received': 0,
+            'accepted': 0,
+            'duplicates': 0,
+            'rejected': 0,
+            'processed': 0,
+            'deferred': 0,
+            'failed': 0,
+        }
+        # 按账号的抓取水位线，重启后从上次扫描到的位置继续
+        self.watermarks = WatermarkStore(os.path.join(data_dir, WATERMARKS_FILE_NAME))
+        # 抓取失败的时间窗口进入重试队列，保证覆盖不留缺口
+        self.window_queue = FetchWindowQueue(os.path.join(data_dir, FETCH_WINDOWS_FILE_NAME))
+        # 历史回填推迟AI处理的推文，由监控进程在后台处理
+        self.backfill_spool = BackfillSpool(os.path.join(data_dir, BACKFILL_SPOOL_DIR_NAME))
     
     def get_ai_response(self, prompt: str, max_retries: int = None) -> str:
         """
-        调用AI模型获取响应，支持重试机制
+        调用AI模型获取响应，按错误类型决定是否重试，重试前按带抖动的指数退避等待
         
         :param prompt: 输入提示词
         :param max_retries: 最大重试次数，默认使用配置值
         :return: AI响应内容
+        :raises AIUnavailableError: 大模型服务熔断中
         """
         if max_retries is None:
             max_retries = self.ai_max_retries
             
+        error_msg = "已达到最大重试次数"
         for attempt in range(max_retries):
+            if not self.ai_breaker.allow():
+                raise AIUnavailableError(f"大模型服务熔断中，{self.ai_breaker.retry_after():.1f} 秒后重试")
+            print(f"🤖 AI调用尝试 {attempt + 1}/{max_retries}")
+            
+            # 所有AI工作线程共用并发限制器：429或超时时减半并发，成功时逐步回升
+            self.ai_limiter.acquire()
             try:
-                print(f"🤖 AI调用尝试 {attempt + 1}/{max_retries}")
-                
                 completion = self.llm_client.chat.completions.create(
-                    model="qwen-plus",
+                    model=LLM_MODEL,
                     messages=[
                         {"role": "system", "content": "You are a helpful assistant."},
                         {"role": "user", "content": prompt},
@@ -65,55 +381,50 @@ class TwitterAIMonitor:
                     timeout=self.ai_timeout,  # 使用配置的超时时间
                     max_tokens=self.ai_max_tokens  # 使用配置的token数量
                 )
-                
-                response = completion.choices[0].message.content
-                if response and response.strip():
-                    print(f"✅ AI调用成功 (尝试 {attempt + 1})")
-                    return response
-                else:
-                    print(f"⚠️ AI返回空响应 (尝试 {attempt + 1})")
-                    if attempt < max_retries - 1:
-                        time.sleep(2)  # 等待2秒后重试
-                        continue
-                    else:
-                        return "AI返回空响应，请重试"
-                        
             except Exception as e:
+                kind, retry_after = classify_ai_error(e)
+                self.ai_limiter.release(throttled=kind in ('rate_limit', 'timeout'), succeeded=False)
                 error_msg = str(e)
-                print(f"❌ AI调用出错 (尝试 {attempt + 1}): {error_msg}")
+                print(f"❌ AI调用出错 (尝试 {attempt + 1}, {AI_ERROR_KINDS[kind]}): {error_msg}")
+                if kind in AI_OUTAGE_ERRORS:
+                    self.ai_breaker.record_failure(f"{kind}: {error_msg[:200]}")
+                else:
+                    # 服务能正常响应，只是这个请求有问题
+                    self.ai_breaker.record_success()
                 
-                # 根据错误类型决定是否重试
-                if "rate limit" in error_msg.lower() or "429" in error_msg:
-                    print("🚫 遇到频率限制，等待后重试...")
-                    time.sleep(10)  # 频率限制等待10秒
-                elif "timeout" in error_msg.lower() or "timed out" in error_msg:
-                    print("⏰ 请求超时，等待后重试...")
-                    time.sleep(5)  # 超时等待5秒
-                elif "invalid api key" in error_msg.lower() or "401" in error_msg:
-                    print("🔑 API密钥无效，停止重试")
+                if kind == 'auth':
                     return f"API密钥错误: {error_msg}"
-                elif "quota exceeded" in error_msg.lower():
-                    print("💳 API配额已用完，停止重试")
+                if kind == 'quota':
                     return f"API配额已用完: {error_msg}"
-                elif "data_inspection_failed" in error_msg.lower() or "inappropriate content" in error_msg.lower():
-                    print("🚫 内容安全检查失败，尝试内容清理后重试...")
-                    # 对于内容安全检查失败，等待更长时间后重试
-                    time.sleep(8)  # 内容安全检查失败等待8秒
-                    if attempt < max_retries - 1:
-                        continue
-                    else:
-                        return f"内容安全检查失败: 推文内容可能包含不当内容，已尝试清理但仍有问题"
-                else:
-                    print("❓ 未知错误，等待后重试...")
-                    time.sleep(3)  # 其他错误等待3秒
-                
-                # 如果不是最后一次尝试，继续重试
-                if attempt < max_retries - 1:
-                    continue
-                else:
+                if kind == 'content':
+                    return f"内容安全检查失败: 推文内容可能包含不当内容"
+                if kind == 'bad_request':
                     return f"AI处理失败: {error_msg}"
+                if retry_after is not None and retry_after > AI_RETRY_AFTER_MAX:
+                    # 不在工作线程里长时间等待：按 Retry-After 熔断，推文推迟处理
+                    self.ai_breaker.trip(retry_after, f"{kind}: Retry-After {retry_after:.0f}s")
+                    raise AIUnavailableError(f"大模型服务要求 {retry_after:.0f} 秒后重试")
+                if self.ai_breaker.is_open():
+                    raise AIUnavailableError(f"大模型服务熔断中: {error_msg}")
+                if attempt < max_retries - 1:
+                    delay = ai_backoff_delay(attempt, retry_after)
+                    print(f"⏳ {delay:.1f} 秒后重试...")
+                    time.sleep(delay)
+                continue
+            self.ai_limiter.release()
+            self.ai_breaker.record_success()
+            
+            response = completion.choices[0].message.content
+            if response and response.strip():
+                print(f"✅ AI调用成功 (尝试 {attempt + 1})")
+                return response
+            print(f"⚠️ AI返回空响应 (尝试 {attempt + 1})")
+            if attempt < max_retries - 1:
+                time.sleep(ai_backoff_delay(attempt))
+                continue
+            return "AI返回空响应，请重试"
         
-        return "AI处理失败: 已达到最大重试次数"
+        return f"AI处理失败: {error_msg}"
     
     def process_tweet_with_ai(self, tweet_text: str) -> dict:
         """
@@ -142,48 +453,27 @@ class TwitterAIMonitor:
         
         print(f"📝 开始AI处理推文，原始长度: {len(tweet_text)}, 处理后长度: {len(cleaned_text)}")
         
+        # 相同内容（转推、跨账号转发）复用缓存的结果，同一内容的并发请求只调用一次大模型；处理失败的结果不缓存
+        key = llm_cache_key(LLM_MODEL, f"{AI_PROMPT_VERSION}/{self.ai_mode}", cleaned_text)
+        return self.llm_cache.get_or_compute(
+            key,
+            lambda: self._run_ai(cleaned_text),
+            cacheable=lambda result: not any(marker in value for value in result.values() for marker in AI_FAILURE_MARKERS)
+        )
+    
+    def _run_ai(self, cleaned_text: str) -> dict:
+        """
+        按AI处理模式调用大模型
+        
+        :param cleaned_text: 预处理后的推文内容
+        :return: 包含AI处理结果的字典
+        """
         try:
-            # 翻译推文
-            print("🔄 正在翻译推文...")
-            translate_prompt = f"""请将以下英文推文翻译成中文，保持原意和语气：
-
-推文内容：{cleaned_text}
-
-请只返回翻译结果，不要包含其他说明。"""
-            
-            translation = self.get_ai_response(translate_prompt)
-            print(f"✅ 翻译完成: {translation[:50]}...")
-            
-            # 解读推文
-            print("🔄 正在解读推文...")
-            analysis_prompt = f"""请对以下推文进行深度解读分析，包括其含义、背景、可能的影响等,全文内容在160字左右：
-
-推文内容：{cleaned_text}
-
-请从以下角度进行分析：
-1. 推文的主要信息和观点
-2. 可能的背景和原因
-3. 对相关领域的影响
-4. 其他值得关注的要点
-
-请用中文回答，内容要有深度和见解。"""
-            
-            analysis = self.get_ai_response(analysis_prompt)
-            print(f"✅ 解读完成: {analysis[:50]}...")
-            
-            # 生成标题
-            print("🔄 正在生成标题...")
-            title_prompt = f"""请为以下推文生成一个简洁有力的中文标题，要求：
-1. 控制在15-25个字以内
-2. 能够准确概括推文的核心内容
-3. 具有吸引力和新闻性
-
-推文内容：{cleaned_text}
-
-请只返回标题，不要包含其他内容。"""
-            
-            title = self.get_ai_response(title_prompt)
-            print(f"✅ 标题生成完成: {title}")
+            if self.ai_mode == "combined":
+                result = self._process_combined(cleaned_text)
+            else:
+                result = self._process_separate(cleaned_text, AI_RESULT_FIELDS)
+            translation, analysis, title = result['translation'], result['analysis'], result['title']
             
             # 验证AI处理结果
             if "AI处理失败" in translation or "AI处理失败" in analysis or "AI处理失败" in title:
@@ -200,6 +490,8 @@ class TwitterAIMonitor:
                 'analysis': analysis.strip()
             }
             
+        except AIUnavailableError:
+            raise
         except Exception as e:
             print(f"❌ AI处理过程出现异常: {str(e)}")
             return {
@@ -208,6 +500,46 @@ class TwitterAIMonitor:
                 'analysis': f"解读异常: {str(e)[:50]}"
             }
     
+    def _process_separate(self, cleaned_text: str, fields) -> dict:
+        """
+        逐项调用AI（每个字段一次调用），作为结构化输出不可用时的回退
+        
+        :param cleaned_text: 预处理后的推文内容
+        :param fields: 要生成的字段
+        :return: {字段: AI响应}
+        """
+        result = {}
+        for field in fields:
+            label = AI_RESULT_SCHEMA[field]['label']
+            print(f"🔄 正在{label}...")
+            result[field] = self.get_ai_response(SEPARATE_PROMPTS[field].format(text=cleaned_text))
+            print(f"✅ {label}完成: {result[field][:50]}...")
+        return result
+    
+    def _process_combined(self, cleaned_text: str) -> dict:
+        """
+        一次调用同时生成翻译、解读和标题（JSON结构化输出），缺少的字段只重新请求这些字段，仍缺少时逐项调用
+        
+        :param cleaned_text: 预处理后的推文内容
+        :return: {字段: AI响应}
+        """
+        print("🔄 正在翻译、解读并生成标题（单次调用）...")
+        response = self.get_ai_response(build_combined_prompt(cleaned_text, AI_RESULT_FIELDS))
+        result, missing = parse_ai_result(response, AI_RESULT_FIELDS)
+        if not result and any(marker in response for marker in AI_ERROR_MARKERS):
+            # 接口本身出错（密钥、配额、重试耗尽等），逐项调用同样会失败
+            return {field: response for field in AI_RESULT_FIELDS}
+        if result and missing:
+            print(f"🩹 结构化输出缺少字段 {', '.join(missing)}，只重新请求这些字段")
+            repaired, missing = parse_ai_result(self.get_ai_response(build_combined_prompt(cleaned_text, missing)), missing)
+            result.update(repaired)
+        if missing:
+            print(f"↩️ 结构化输出不可用，{', '.join(missing)} 改为逐项调用")
+            result.update(self._process_separate(cleaned_text, missing))
+        else:
+            print(f"✅ 结构化处理完成: {result['title']}")
+        return result
+    
     def preprocess_tweet_content(self, tweet_text: str) -> str:
         """
         预处理推文内容，过滤可能导致内容安全检查失败的内容
@@ -294,91 +626,671 @@ class TwitterAIMonitor:
         
         return tweet_text
     
-    def get_tweets_from_account(self, account: str, since_time: datetime, until_time: datetime, exclude_replies: bool = False) -> list:
-        """
-        获取指定账号在指定时间范围内的推文
-        
-        :param account: Twitter账号
-        :param since_time: 开始时间
-        :param until_time: 结束时间
-        :param exclude_replies: 是否排除回复推文
-        :return: 推文列表
-        """
+    @staticmethod
+    def _time_filters(since_time: datetime, until_time: datetime, exclude_replies: bool) -> str:
         since_str = since_time.strftime("%Y-%m-%dT%H:%M:%SZ")
         until_str = until_time.strftime("%Y-%m-%dT%H:%M:%SZ")
         
         # 根据配置决定是否排除回复
         if exclude_replies:
-            query = f"from:{account} -is:reply since:{since_str} until:{until_str} include:nativeretweets"
-        else:
-            query = f"from:{account} since:{since_str} until:{until_str} include:nativeretweets"
-            
-        url = "https://api.twitterapi.io/twitter/tweet/advanced_search"
+            return f"-is:reply since:{since_str} until:{until_str} include:nativeretweets"
+        return f"since:{since_str} until:{until_str} include:nativeretweets"
+    
+    def _advanced_search(self, query: str, label: str, stop_at_id: int = None, on_page=None) -> tuple:
+        """
+        执行一次高级搜索并翻页（结果按时间倒序）
+        
+        :param query: 搜索语句
+        :param label: 日志中显示的名称
+        :param stop_at_id: 已抓取过的最新推文ID，翻到不大于它的推文时停止，为空时翻完所有分页
+        :param on_page: 每取到一页时以该页推文调用
+        :return: (推文列表, 错误信息)，成功时错误信息为None
+        """
         params = {"query": query, "queryType": "Latest"}
         headers = {"X-API-Key": self.twitter_api_key}
         
         all_tweets = []
         next_cursor = None
+        throttled = 0
         
         while True:
             if next_cursor:
                 params["cursor"] = next_cursor
             
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            # 由共享限流器控制请求速率
+            self.rate_limiter.acquire()
+            response = self.http_client.get(ADVANCED_SEARCH_URL, headers=headers, params=params, timeout=30)
+            self.rate_limiter.on_response(response.status_code, response.headers)
             
-            if response.status_code == 200:
-                data = response.json()
-                tweets = data.get("tweets", [])
-                
-                if tweets:
-                    for t in tweets:
-                        t['author'] = account  # 添加作者信息
-                    all_tweets.extend(tweets)
-                
-                if data.get("has_next_page", False) and data.get("next_cursor", "") != "":
-                    next_cursor = data.get("next_cursor")
+            if response.status_code == 429 and throttled < MAX_THROTTLE_RETRIES:
+                throttled += 1
+                print(f"🚦 {label} 触发频率限制，降速后重试 ({throttled}/{MAX_THROTTLE_RETRIES})")
+                continue
+            
+            if response.status_code != 200:
+                return all_tweets, f"{response.status_code} - {response.text}"
+            
+            data = response.json()
+            tweets = data.get("tweets", [])
+            if stop_at_id is not None:
+                # 到达已抓取过的推文，后面的分页都更旧，不再继续翻页
+                new_tweets = [t for t in tweets if (tweet_id_value(t.get('id')) or stop_at_id + 1) > stop_at_id]
+                if len(new_tweets) < len(tweets):
+                    all_tweets.extend(new_tweets)
+                    if on_page and new_tweets:
+                        on_page(new_tweets)
+                    return all_tweets, None
+            all_tweets.extend(tweets)
+            if on_page and tweets:
+                on_page(tweets)
+            
+            if data.get("has_next_page", False) and data.get("next_cursor", "") != "":
+                next_cursor = data.get("next_cursor")
+            else:
+                return all_tweets, None
+    
+    def _fetch_account(self, account: str, since_time: datetime, until_time: datetime, exclude_replies: bool = False,
+                       use_watermark: bool = True, on_page=None) -> tuple:
+        """
+        抓取单个账号，翻页到该账号的水位线为止
+        
+        :param use_watermark: 为False时翻完整个时间窗口（补抓历史窗口时使用）
+        :param on_page: 每取到一页时以 (账号, 该页推文) 调用
+        :return: (推文列表, 错误信息)
+        """
+        query = f"from:{account} {self._time_filters(since_time, until_time, exclude_replies)}"
+        stop_at_id = self.watermarks.since_id(account) if use_watermark else None
+        
+        def page(tweets):
+            for t in tweets:
+                t['author'] = account  # 添加作者信息
+            if on_page:
+                on_page(account, tweets)
+        
+        return self._advanced_search(query, f"@{account}", stop_at_id, page)
+    
+    def get_tweets_from_account(self, account: str, since_time: datetime, until_time: datetime, exclude_replies: bool = False) -> list:
+        """
+        获取指定账号在指定时间范围内的推文
+        
+        :param account: Twitter账号
+        :param since_time: 开始时间
+        :param until_time: 结束时间
+        :param exclude_replies: 是否排除回复推文
+        :return: 推文列表
+        """
+        tweets, error = self._fetch_account(account, since_time, until_time, exclude_replies)
+        if error:
+            print(f"获取推文出错: {error}")
+        return tweets
+    
+    def build_batch_queries(self, accounts: list, since_time, until_time: datetime, exclude_replies: bool = False) -> list:
+        """
+        把多个账号合并为 (from:a OR from:b ...) 查询，按最大长度拆分
+        
+        :param accounts: 账号列表
+        :param since_time: 开始时间；也可以是 {账号: 开始时间}，此时每个查询使用其中账号最早的开始时间
+        :param until_time: 结束时间
+        :param exclude_replies: 是否排除回复推文
+        :return: [(账号列表, 查询语句, 开始时间)]
+        """
+        since_of = since_time.get if isinstance(since_time, dict) else (lambda account: since_time)
+        batches = []
+        chunk = []
+        
+        def build(chunk):
+            chunk_since = min(since_of(a) for a in chunk)
+            filters = self._time_filters(chunk_since, until_time, exclude_replies)
+            return f"({' OR '.join(f'from:{a}' for a in chunk)}) {filters}", chunk_since
+        
+        for account in accounts:
+            if chunk and len(build(chunk + [account])[0]) > self.batch_query_max_length:
+                batches.append((chunk, *build(chunk)))
+                chunk = []
+            chunk.append(account)
+        if chunk:
+            batches.append((chunk, *build(chunk)))
+        return batches
+    
+    def _fetch_batch(self, accounts: list, query: str, since_times: dict, until_time: datetime, exclude_replies: bool,
+                     on_page=None) -> dict:
+        """
+        执行一个合并查询，按推文返回的作者信息归属到各账号；查询失败时逐个账号单独查询
+        
+        :param since_times: {账号: 开始时间}，逐个账号查询时使用
+        :param on_page: 每取到一页时按账号以 (账号, 该页中该账号的推文) 调用
+        :return: {账号: (推文列表, 错误信息)}
+        """
+        # 所有账号都有水位线时，翻到比其中最旧的水位线还旧的推文即可停止
+        since_ids = {account: self.watermarks.since_id(account) for account in accounts}
+        stop_at_id = None if None in since_ids.values() else min(since_ids.values())
+        by_name = {account.lower(): account for account in accounts}
+        collected = {account: [] for account in accounts}
+        
+        def page(tweets):
+            # 按推文自带的作者用户名归属（不区分大小写，统一为配置中的账号写法）
+            attributed = {}
+            for t in tweets:
+                author = t.get('author')
+                user_name = author.get('userName', '') if isinstance(author, dict) else str(author or '')
+                account = by_name.get(user_name.lower())
+                if account is None:
+                    print(f"⚠️ 合并查询返回了未监控账号的推文: @{user_name}，已忽略")
                     continue
-                else:
-                    break
+                since_id = since_ids[account]
+                if since_id is not None and (tweet_id_value(t.get('id')) or since_id + 1) <= since_id:
+                    continue
+                t['author'] = account
+                attributed.setdefault(account, []).append(t)
+            for account, account_tweets in attributed.items():
+                collected[account].extend(account_tweets)
+                if on_page:
+                    on_page(account, account_tweets)
+        
+        try:
+            _, error = self._advanced_search(query, f"{len(accounts)} 个账号的合并查询", stop_at_id, page)
+        except Exception as e:
+            error = str(e)
+        
+        if not error:
+            return {account: (tweets, None) for account, tweets in collected.items()}
+        
+        # 已经交给 on_page 的推文在重新查询时会被已见推文索引过滤
+        print(f"⚠️ 合并查询失败 ({error})，改为逐个账号查询: {', '.join(accounts)}")
+        results = {}
+        for account in accounts:
+            try:
+                results[account] = self._fetch_account(account, since_times[account], until_time, exclude_replies,
+                                                       on_page=on_page)
+            except Exception as e:
+                results[account] = (collected[account], str(e))
+        return results
+    
+    def fetch_accounts(self, accounts: list, since_time: datetime, until_time: datetime, exclude_replies: bool = False,
+                       on_page=None):
+        """
+        并发抓取多个账号的推文（线程池 + 共享限流器），开启合并查询时多个账号共用一个查询
+        
+        有水位线的账号从上次成功扫描到的时间点开始抓取，翻页到已抓取过的推文ID为止；
+        抓取结果处理完后需调用 commit_watermarks 推进水位线。
+        
+        :param accounts: 账号列表
+        :param since_time: 没有水位线的账号使用的开始时间
+        :param until_time: 结束时间
+        :param exclude_replies: 是否排除回复推文
+        :param on_page: 每取到一页时在抓取线程中以 (账号, 该页推文) 调用，用于边抓取边处理
+        :return: 生成器，按完成顺序逐个返回 (账号, 推文列表, 异常)，抓取成功时异常为None
+        """
+        if not accounts:
+            return
+        since_times = {account: self.watermarks.since_time(account, since_time) for account in accounts}
+        
+        tasks = []
+        if self.batch_queries and len(accounts) > 1:
+            # 按开始时间排序后合并，同一查询内的账号开始时间相近；
+            # 查询取其中最早的开始时间，重叠部分由各账号的水位线过滤
+            ordered = sorted(accounts, key=lambda account: since_times[account])
+            for chunk, query, chunk_since in self.build_batch_queries(ordered, since_times, until_time, exclude_replies):
+                tasks.append((self._fetch_batch, (chunk, query, since_times, until_time, exclude_replies, on_page), chunk))
+        else:
+            for account in accounts:
+                tasks.append((self._fetch_account, (account, since_times[account], until_time, exclude_replies, True, on_page), [account]))
+        
+        with ThreadPoolExecutor(max_workers=min(self.fetch_workers, len(tasks)), thread_name_prefix="fetch") as pool:
+            futures = {pool.submit(func, *args): (func, chunk) for func, args, chunk in tasks}
+            for future in as_completed(futures):
+                func, chunk = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    for account in chunk:
+                        yield account, [], e
+                    continue
+                if func == self._fetch_account:
+                    result = {chunk[0]: result}
+                for account, (tweets, error) in result.items():
+                    yield account, tweets, (RuntimeError(f"获取推文出错: {error}") if error else None)
+    
+    def stream_new_tweets(self, accounts: list, since_time: datetime, until_time: datetime, exclude_replies: bool = False):
+        """
+        边抓取边交付新推文：抓取线程每取到一页，就把其中的新推文放入有界队列，调用方逐条取出立即处理。
+        队列满时抓取线程阻塞等待（背压），AI处理跟不上时不会无限堆积。账号抓取完成后再补抓到期的失败窗口。
+        
+        :param accounts: 账号列表
+        :param since_time: 没有水位线的账号使用的开始时间
+        :param until_time: 结束时间
+        :param exclude_replies: 是否排除回复推文
+        :return: 生成器，依次返回事件：
+                 ('tweet', 推文) —— 一条需要AI处理的新推文；
+                 ('done', 账号, 推文列表, 异常) —— 一个账号抓取结束；
+                 ('error', 异常) —— 抓取过程出错，未返回 done 的账号本轮未完成
+        """
+        events = queue.Queue(maxsize=self.stream_queue_size)
+        stop = threading.Event()
+        
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    events.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def on_page(account, tweets):
+            for tweet in self.seen_index.filter_new(tweets):
+                if not put(('tweet', tweet)):
+                    raise RuntimeError("抓取已取消")
+        
+        def produce():
+            try:
+                for account, tweets, error in self.fetch_accounts(accounts, since_time, until_time, exclude_replies, on_page):
+                    put(('done', account, tweets, error))
+                # 补抓之前失败的时间窗口
+                for account, tweets in self.retry_failed_windows(exclude_replies):
+                    new_tweets = self.seen_index.filter_new(tweets)
+                    print(f"✅ 补抓 @{account} 的 {len(tweets)} 条推文，其中新推文 {len(new_tweets)} 条")
+                    for tweet in new_tweets:
+                        put(('tweet', tweet))
+            except Exception as e:
+                put(('error', e))
+            finally:
+                put(None)
+        
+        producer = threading.Thread(target=produce, name="fetch-stream", daemon=True)
+        producer.start()
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            # 调用方提前退出时让抓取线程尽快结束
+            stop.set()
+            producer.join(timeout=5)
+    
+    def record_failed_window(self, account: str, default_since: datetime, until_time: datetime, error, partial: int = 0):
+        """
+        把本轮抓取失败（或只抓到部分分页）的账号窗口加入重试队列
+        
+        :param account: 账号
+        :param default_since: 没有水位线时的开始时间
+        :param until_time: 本轮扫描的结束时间
+        :param error: 错误
+        :param partial: 失败前已抓到的推文数
+        """
+        since_time = self.watermarks.since_time(account, default_since)
+        self.window_queue.add(account, since_time, until_time, str(error), partial)
+        print(f"🕳️ @{account} 的时间窗口 {since_time.isoformat()} ~ {until_time.isoformat()} 已加入重试队列")
+    
+    def record_failed_tweets(self, failed: list, default_since: datetime, until_time: datetime):
+        """
+        本轮处理或保存出错的推文：所在账号的时间窗口加入重试队列（需在推进水位线之前调用），
+        水位线推进后这些推文仍会在补抓时重新处理
+        
+        :param failed: 处理出错的原始推文
+        :param default_since: 没有水位线时的开始时间
+        :param until_time: 本轮扫描的结束时间
+        """
+        counts = {}
+        for tweet in failed:
+            window = tweet.get(RETRY_WINDOW_KEY)
+            key = (tweet['author'], tuple(window) if window else None)
+            counts[key] = counts.get(key, 0) + 1
+        for (account, window), count in counts.items():
+            error = f"{count} 条推文处理失败"
+            if window is None:
+                self.record_failed_window(account, default_since, until_time, error)
+                continue
+            # 补抓窗口中的推文：放回原窗口（该窗口不在当前水位线之后，按水位线记录会漏掉）
+            since, until = window
+            self.window_queue.add(account, datetime.fromisoformat(since), datetime.fromisoformat(until), error)
+            print(f"🕳️ @{account} 的时间窗口 {since} ~ {until} 重新加入重试队列")
+    
+    def retry_failed_windows(self, exclude_replies: bool = False) -> list:
+        """
+        重试到期的失败窗口（翻完整个窗口，不按水位线截止），失败的按指数退避延后
+        
+        :param exclude_replies: 是否排除回复推文
+        :return: [(账号, 推文列表)]，只包含补抓成功的窗口；推文上带有所属窗口（RETRY_WINDOW_KEY），
+                 处理失败时由 record_failed_tweets 把原窗口放回队列
+        """
+        windows = self.window_queue.due()
+        if not windows:
+            return []
+        print(f"🔁 补抓 {len(windows)} 个失败的时间窗口")
+        
+        def fetch(window):
+            return self._fetch_account(window['account'], datetime.fromisoformat(window['since']),
+                                       datetime.fromisoformat(window['until']), exclude_replies, use_watermark=False)
+        
+        recovered = []
+        with ThreadPoolExecutor(max_workers=min(self.fetch_workers, len(windows)), thread_name_prefix="backfill") as pool:
+            futures = {pool.submit(fetch, window): window for window in windows}
+            for future in as_completed(futures):
+                window = futures[future]
+                try:
+                    tweets, error = future.result()
+                except Exception as e:
+                    tweets, error = [], str(e)
+                if error:
+                    print(f"❌ 补抓 @{window['account']} 失败: {error}")
+                    self.window_queue.fail(window, error)
+                    continue
+                self.window_queue.complete(window)
+                for tweet in tweets:
+                    tweet[RETRY_WINDOW_KEY] = (window['since'], window['until'])
+                recovered.append((window['account'], tweets))
+        return recovered
+    
+    def commit_watermarks(self, fetched: list, until_time: datetime):
+        """
+        推进本轮已扫描账号的水位线并落盘（推文处理保存后调用）
+        
+        :param fetched: [(账号, 推文列表)]，抓取失败的账号需先调用 record_failed_window 记录窗口
+        :param until_time: 本轮扫描的结束时间
+        """
+        for account, tweets in fetched:
+            self.watermarks.advance(account, tweets, until_time)
+        try:
+            self.watermarks.save()
+        except OSError as e:
+            print(f"⚠️ 保存抓取水位线失败: {str(e)}")
+    
+    def process_and_save_tweet(self, tweet: dict, notify: bool = True, deferred: list = None) -> dict:
+        """
+        对一条新推文进行AI处理，然后保存并推送
+        
+        :param tweet: 抓取或推送得到的原始推文（author 已是账号名）
+        :param notify: 是否推送钉钉（历史回填时为False）
+        :param deferred: 推迟处理的推文追加到此列表，由调用方处理完一批后调用 defer_tweets 一次写入；
+                         为空时立即写入待处理队列
+        :return: 保存的推文数据，大模型服务熔断、推文推迟处理时返回None
+        """
+        try:
+            tweet_data = self.build_tweet_data(tweet)
+        except AIUnavailableError as e:
+            print(f"⏸️ {str(e)}，推文 {tweet.get('id') or tweet.get('id_str')} 推迟处理")
+            if deferred is None:
+                self.defer_tweets([tweet])
             else:
-                print(f"获取推文出错: {response.status_code} - {response.text}")
-                break
+                with self._status_lock:
+                    deferred.append(tweet)
+            return None
+        self.save_tweet_data(tweet_data, notify)
+        return tweet_data
+    
+    def defer_tweets(self, tweets: list):
+        """
+        大模型服务熔断期间，把未处理的推文写入待处理队列，服务恢复后由 drain_backfill_spool 处理并推送。
+        每次调用写入一个文件，调用方应把一轮中推迟的推文收集起来一次写入
         
-        return all_tweets
+        :param tweets: 原始推文列表（author 已是账号名）
+        """
+        if not tweets:
+            return
+        self.backfill_spool.append(f"{DEFERRED_PREFIX}{time.time_ns()}_{threading.get_ident()}", tweets)
+        # 推文已交给待处理队列，不再算作处理中，否则处理队列时会被当作重复跳过
+        self.seen_index.release(t.get('id') or t.get('id_str') for t in tweets)
+        with self._status_lock:
+            self.deferred_count += len(tweets)
+    
+    def ai_breaker_stats(self) -> dict:
+        """返回大模型熔断器状态和推迟处理的推文数"""
+        with self._status_lock:
+            deferred = self.deferred_count
+        return {**self.ai_breaker.stats(), 'deferred_tweets': deferred}
     
-    def save_tweet_data(self, tweet_data: dict):
+    def build_tweet_data(self, tweet: dict) -> dict:
         """
-        保存推文数据到JSON文件，按天存储
+        对一条原始推文进行AI处理，生成要保存的推文数据
         
-        :param tweet_data: 推文数据
+        :param tweet: 原始推文（author 已是账号名）
+        :return: 推文数据
+        """
+        # 基本信息
+        tweet_id = tweet.get('id') or tweet.get('id_str')
+        tweet_url = f"https://twitter.com/{tweet['author']}/status/{tweet_id}"
+        original_text = tweet.get('text', '')
+        
+        # 近似重复的推文（只有链接、表情等不同）直接复用原推文的AI结果
+        duplicate = self.find_near_duplicate(tweet_id, original_text)
+        if duplicate is not None:
+            canonical, distance = duplicate
+            print(f"♻️ 与推文 {canonical['id']} 近似重复（距离 {distance}），复用其AI结果")
+            ai_result = {
+                'title': canonical['ai_title'],
+                'translation': canonical['ai_translation'],
+                'analysis': canonical['ai_analysis']
+            }
+        else:
+            # AI处理
+            try:
+                ai_result = self.process_tweet_with_ai(original_text)
+                
+                # 检查AI处理结果质量
+                if any("处理异常" in str(v) or "翻译异常" in str(v) or "解读异常" in str(v) for v in ai_result.values()):
+                    print(f"⚠️ AI处理结果质量不佳，推文ID: {tweet_id}")
+                    # 可以选择跳过保存或标记为低质量
+                
+            except AIUnavailableError:
+                raise
+            except Exception as e:
+                print(f"❌ AI处理推文失败: {str(e)}")
+                ai_result = {
+                    'title': f"处理失败: {str(e)[:50]}",
+                    'translation': f"原文: {original_text[:100]}{'...' if len(original_text) > 100 else ''}",
+                    'analysis': f"AI处理失败: {str(e)}"
+                }
+        
+        # 保存数据到JSON
+        tweet_data = {
+            'id': tweet_id,
+            'author': tweet['author'],
+            'created_at': tweet.get('createdAt'),
+            'original_text': original_text,
+            'tweet_url': tweet_url,
+            'ai_title': ai_result['title'],
+            'ai_translation': ai_result['translation'],
+            'ai_analysis': ai_result['analysis'],
+            'timestamp': datetime.utcnow().isoformat(),
+            'processed_date': datetime.now().strftime("%Y-%m-%d")
+        }
+        if duplicate is not None:
+            tweet_data['near_duplicate_of'] = canonical['id']
+            tweet_data['near_duplicate_url'] = canonical.get('tweet_url')
+            tweet_data['near_duplicate_distance'] = distance
+        return tweet_data
+    
+    def find_near_duplicate(self, tweet_id, text: str):
+        """
+        在最近推文的SimHash索引中查找近似重复、且AI处理成功的已保存推文
+        
+        :param tweet_id: 推文ID
+        :param text: 推文原文
+        :return: (原推文数据, 汉明距离)，没有找到或未启用时返回None
+        """
+        if self.near_dup is None:
+            return None
+        try:
+            match = self.near_dup.find(text, exclude_id=str(tweet_id))
+            if match is None:
+                return None
+            canonical = self.store.get(match[0])
+        except Exception as e:
+            print(f"⚠️ 近似重复检测失败: {str(e)}")
+            return None
+        if not canonical or not all(canonical.get(field) for field in ('ai_title', 'ai_translation', 'ai_analysis')):
+            return None
+        if any(marker in str(canonical.get(field)) for field in ('ai_title', 'ai_translation', 'ai_analysis')
+               for marker in AI_FAILURE_MARKERS):
+            return None
+        return canonical, match[1]
+    
+    def _index_near_duplicate(self, tweet_data: dict):
+        # 只索引独立处理的推文，近似重复的推文都指向最初的原推文
+        if self.near_dup is None or tweet_data.get('near_duplicate_of'):
+            return
+        try:
+            self.near_dup.add(tweet_data.get('id'), tweet_data.get('original_text', ''))
+        except Exception as e:
+            print(f"⚠️ 更新近似重复索引失败: {str(e)}")
+    
+    def ingest_tweets(self, tweets: list) -> dict:
+        """
+        接收推送的推文（TwitterAPI.io webhook 格式），校验、去重后放入后台队列进行AI处理、保存和推送
+        
+        :param tweets: 推文列表，author 可以是用户对象（含 userName）或账号名
+        :return: {'accepted': 入队数, 'duplicates': 已存储或处理中的条数, 'rejected': 格式不正确的条数}
+        """
+        valid = []
+        rejected = 0
+        for tweet in tweets:
+            if not isinstance(tweet, dict):
+                rejected += 1
+                continue
+            author = tweet.get('author')
+            user_name = author.get('userName') if isinstance(author, dict) else author
+            if not (tweet.get('id') or tweet.get('id_str')) or not user_name or not isinstance(tweet.get('text', ''), str):
+                rejected += 1
+                continue
+            valid.append({**tweet, 'author': str(user_name)})
+        
+        # 与轮询共用已见推文索引，推送和轮询拿到同一条推文只处理一次
+        new_tweets = self.seen_index.filter_new(valid)
+        with self._ingest_lock:
+            if self._ingest_thread is None or not self._ingest_thread.is_alive():
+                self._ingest_thread = threading.Thread(target=self._ingest_worker, name="ingest", daemon=True)
+                self._ingest_thread.start()
+            self.ingest_counters['received'] += len(tweets)
+            self.ingest_counters['accepted'] += len(new_tweets)
+            self.ingest_counters['duplicates'] += len(valid) - len(new_tweets)
+            self.ingest_counters['rejected'] += rejected
+        for tweet in new_tweets:
+            self._ingest_queue.put(tweet)
+        return {'accepted': len(new_tweets), 'duplicates': len(valid) - len(new_tweets), 'rejected': rejected}
+    
+    def _ingest_worker(self):
+        """后台把推送的推文成批交给AI工作线程池并发处理"""
+        def handle(tweet, idx):
+            tweet_id = tweet.get('id') or tweet.get('id_str')
+            try:
+                print(f"📥 处理推送的推文: {tweet_id} - @{tweet['author']}")
+                if self.process_and_save_tweet(tweet, deferred=deferred) is None:
+                    with self._ingest_lock:
+                        self.ingest_counters['deferred'] += 1
+                    return False
+                with self._ingest_lock:
+                    self.ingest_counters['processed'] += 1
+                self._count_processed(self._status_dict)
+                return True
+            except Exception as e:
+                print(f"❌ 处理推送的推文失败: {str(e)}")
+                with self._ingest_lock:
+                    self.ingest_counters['failed'] += 1
+                return False
+            finally:
+                # 未保存成功的推文可由轮询补上
+                self.seen_index.release([tweet_id])
+                self._ingest_queue.task_done()
+        
+        while True:
+            # 等到第一条后取走队列中已有的推文，一批并发处理
+            batch = [self._ingest_queue.get()]
+            while len(batch) < self.ai_workers * 2:
+                try:
+                    batch.append(self._ingest_queue.get_nowait())
+                except queue.Empty:
+                    break
+            deferred = []
+            try:
+                self.submit_tweets(batch, handle)
+            finally:
+                self.defer_tweets(deferred)
+    
+    def _count_processed(self, status_dict: dict, count: int = 1):
+        """多个AI工作线程并发处理时，在锁内累加状态中的已处理推文数"""
+        if status_dict is None:
+            return
+        with self._status_lock:
+            status_dict["processed_tweets"] = status_dict.get("processed_tweets", 0) + count
+    
+    def submit_tweets(self, tweets, handle, on_done=None, max_pending: int = None, failed: list = None) -> list:
+        """
+        把推文提交给AI工作线程池处理；待处理数达到上限时等待，保持对抓取端的反压
+        
+        :param tweets: 推文迭代器（可以是边抓取边产出的生成器）
+        :param handle: 在工作线程中以 (推文, 序号) 调用的处理函数，返回False表示推文未处理（如推迟处理）
+        :param on_done: 每条处理完成后在工作线程中以 (推文, 是否成功) 调用
+        :param max_pending: 已提交未完成的推文数上限，默认为工作线程数的2倍
+        :param failed: 处理出错（handle 抛出异常）的推文追加到此列表
+        :return: 处理成功的推文列表（按提交顺序），返回时全部处理完成
         """
-        today = datetime.now().strftime("%Y-%m-%d")
-        file_path = os.path.join(self.data_dir, f"tweets_{today}.json")
+        slots = threading.Semaphore(max_pending or self.ai_workers * 2)
+        results_lock = threading.Lock()
+        submitted = []
+        succeeded = set()
+        futures = []
         
-        # 读取现有数据
-        existing_data = []
-        if os.path.exists(file_path):
+        def run(tweet, idx):
+            ok = False
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    existing_data = json.load(f)
-            except json.JSONDecodeError:
-                existing_data = []
+                ok = handle(tweet, idx) is not False
+                if ok:
+                    with results_lock:
+                        succeeded.add(idx)
+            except Exception as e:
+                print(f"❌ AI处理推文失败: {str(e)}")
+                if failed is not None:
+                    with results_lock:
+                        failed.append(tweet)
+            finally:
+                slots.release()
+                if on_done:
+                    on_done(tweet, ok)
+        
+        try:
+            for tweet in tweets:
+                slots.acquire()
+                submitted.append(tweet)
+                futures.append(self.ai_pool.submit(run, tweet, len(submitted)))
+        finally:
+            # 中途退出时也等已提交的推文处理完，之后才推进水位线
+            for future in futures:
+                future.result()
+        return [tweet for idx, tweet in enumerate(submitted, 1) if idx in succeeded]
+    
+    def ingest_stats(self) -> dict:
+        """返回推送接入统计"""
+        with self._ingest_lock:
+            return {**self.ingest_counters, 'queued': self._ingest_queue.qsize()}
+    
+    def save_tweet_data(self, tweet_data: dict, notify: bool = True):
+        """
+        保存推文数据到推文存储
         
-        # 检查是否重复 - 根据推文ID去重
+        :param tweet_data: 推文数据
+        :param notify: 是否推送钉钉
+        """
+        tweet_data.setdefault('processed_date', datetime.now().strftime("%Y-%m-%d"))
         tweet_id = tweet_data.get('id')
-        existing_ids = {item.get('id') for item in existing_data if item.get('id')}
         
-        if tweet_id not in existing_ids:
-            # 添加新数据（仅当ID不重复时）
-            existing_data.append(tweet_data)
+        # 写入存储（根据推文ID去重）
+        saved = self.store.add(tweet_data)
+        self.seen_index.mark_stored(tweet_id)
+        if saved:
             print(f"保存新推文: {tweet_id} - {tweet_data.get('author', 'Unknown')}")
             
-            # 写入文件
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(existing_data, f, ensure_ascii=False, indent=2)
+            # 更新全文索引（失败不影响保存，可用 search_index.py rebuild 重建）
+            try:
+                self.search_index.add(tweet_data)
+            except Exception as e:
+                print(f"更新全文索引失败: {str(e)}")
+            self._index_near_duplicate(tweet_data)
             
             # 发送钉钉推送
-            if self.enable_dingtalk and self.dingtalk_webhook and self.dingtalk_secret:
+            if notify and self.enable_dingtalk and self.dingtalk_webhook and self.dingtalk_secret:
                 try:
                     self.send_dingtalk_notification(tweet_data)
                 except Exception as e:
@@ -386,6 +1298,72 @@ class TwitterAIMonitor:
         else:
             print(f"跳过重复推文: {tweet_id} - {tweet_data.get('author', 'Unknown')}")
     
+    def save_tweets(self, tweets: list) -> int:
+        """
+        批量保存推文数据（历史回填使用，不推送钉钉）
+        
+        :param tweets: 推文数据列表
+        :return: 实际写入的条数
+        """
+        processed_date = datetime.now().strftime("%Y-%m-%d")
+        for tweet_data in tweets:
+            tweet_data.setdefault('processed_date', processed_date)
+        saved = self.store.add_many(tweets)
+        self.seen_index.mark_stored_many(tweet_data.get('id') for tweet_data in tweets)
+        for tweet_data in tweets:
+            self._index_near_duplicate(tweet_data)
+        try:
+            self.search_index.add_many(tweets)
+        except Exception as e:
+            print(f"更新全文索引失败: {str(e)}")
+        self.store.flush()
+        return saved
+    
+    def drain_backfill_spool(self, should_continue=None) -> int:
+        """
+        处理待处理队列：大模型熔断期间推迟的推文（处理后推送钉钉）优先，
+        然后是 backfill.py --defer-ai 留下的历史推文（不推送钉钉）。每个文件的推文交给AI工作线程池并发处理
+        
+        :param should_continue: 每处理一条前调用，返回False时停止（当前文件保留到下次继续）
+        :return: 本次保存的推文数
+        """
+        saved = 0
+        pending = sorted(self.backfill_spool.pending(),
+                         key=lambda path: not os.path.basename(path).startswith(DEFERRED_PREFIX))
+        for path in pending:
+            notify = os.path.basename(path).startswith(DEFERRED_PREFIX)
+            tweets = self.seen_index.filter_new(self.backfill_spool.load(path))
+            stopped = threading.Event()
+            
+            def handle(tweet, idx):
+                if stopped.is_set() or (should_continue is not None and not should_continue()):
+                    stopped.set()
+                    return False
+                # 熔断期间不处理，文件保留到服务恢复后继续
+                try:
+                    tweet_data = self.build_tweet_data(tweet)
+                except AIUnavailableError as e:
+                    if not stopped.is_set():
+                        stopped.set()
+                        print(f"⏸️ {str(e)}，暂停处理待处理队列")
+                    return False
+                self.save_tweet_data(tweet_data, notify)
+                return True
+            
+            failed = []
+            try:
+                done = self.submit_tweets(tweets, handle, failed=failed)
+            finally:
+                self.seen_index.release(t.get('id') or t.get('id_str') for t in tweets)
+            saved += len(done)
+            self._count_processed(self._status_dict, len(done))
+            if stopped.is_set() or failed:
+                # 文件保留，已保存的推文下次由已见推文索引跳过
+                return saved
+            self.backfill_spool.remove(path)
+            print(f"📚 待处理推文处理完成: {os.path.basename(path)}（{len(tweets)} 条）")
+        return saved
+    
     def send_dingtalk_notification(self, tweet_data: dict):
         """
         发送钉钉机器人通知
@@ -397,7 +1375,6 @@ class TwitterAIMonitor:
             import hashlib
             import base64
             import urllib.parse
-            import requests
             
             # 构建消息内容
             author = tweet_data.get('author', 'Unknown')
@@ -427,9 +1404,9 @@ class TwitterAIMonitor:
                 ai_title = 'AI标题生成失败，显示原文'
             
             # 格式化推文发帖时间为北京时间
-            formatted_tweet_posting_time = "未知时间"
+            formatted_tweet_posting_time = tweet_data.get('formatted_created_at') or "未知时间"
             try:
-                if original_created_at_str:
+                if original_created_at_str and not tweet_data.get('formatted_created_at'):
                     from email.utils import parsedate_to_datetime
                     utc_time = parsedate_to_datetime(original_created_at_str)
                     beijing_time = utc_time + timedelta(hours=8)
@@ -480,7 +1457,7 @@ class TwitterAIMonitor:
             }
             
             # 发送请求
-            response = requests.post(url, json=data, timeout=10)
+            response = self.http_client.post(url, json=data, timeout=10)
             
             if response.status_code == 200:
                 result = response.json()
@@ -496,23 +1473,26 @@ class TwitterAIMonitor:
     
     def load_tweets_by_date(self, date_str: str = None) -> list:
         """
-        根据日期加载推文数据
+        根据日期加载推文数据（兼容旧版 .json 和新版 .jsonl 格式）
         
-        :param date_str: 日期字符串 (YYYY-MM-DD)，默认为今天
+        :param date_str: 发帖日期字符串 (YYYY-MM-DD，北京时间)，默认为今天
         :return: 推文数据列表
         """
         if date_str is None:
             date_str = datetime.now().strftime("%Y-%m-%d")
         
-        file_path = os.path.join(self.data_dir, f"tweets_{date_str}.json")
+        return self.store.load_day(date_str)
+    
+    def iter_tweets(self, author: str = None, start_date: str = None, end_date: str = None):
+        """
+        按发帖时间倒序逐条返回推文，取够即停，只读取需要的数据分区
         
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return []
-        return []
+        :param author: 作者，为空表示不限
+        :param start_date: 开始日期 (YYYY-MM-DD，北京时间)
+        :param end_date: 结束日期 (YYYY-MM-DD，北京时间，包含当天)
+        :return: 推文数据迭代器
+        """
+        return self.store.iter_newest(author, start_date, end_date)
     
     def get_all_tweets(self) -> list:
         """
@@ -520,22 +1500,10 @@ class TwitterAIMonitor:
         
         :return: 所有推文数据列表
         """
-        all_tweets = []
+        all_tweets = self.store.all()
         
-        # 遍历数据目录中的所有JSON文件
-        if os.path.exists(self.data_dir):
-            for filename in os.listdir(self.data_dir):
-                if filename.startswith("tweets_") and filename.endswith(".json"):
-                    file_path = os.path.join(self.data_dir, filename)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            tweets = json.load(f)
-                            all_tweets.extend(tweets)
-                    except json.JSONDecodeError:
-                        continue
-        
-        # 按时间排序（最新的在前）
-        all_tweets.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        # 按发帖时间排序（最新的在前），与存储的排序一致
+        all_tweets.sort(key=tweet_epoch, reverse=True)
         return all_tweets
     
     def monitor_and_process(self, target_accounts: list, check_interval: int = 300, hours: int = 1, exclude_replies: bool = False):
@@ -547,94 +1515,75 @@ class TwitterAIMonitor:
         :param hours: 初始回溯时间（小时）
         :param exclude_replies: 是否排除回复推文
         """
-        last_checked_time = datetime.utcnow() - timedelta(hours=hours)
+        # 没有水位线的账号（首次监控）从初始回溯时间开始抓取
+        initial_since = datetime.utcnow() - timedelta(hours=hours)
         
         def check_and_process_tweets():
-            nonlocal last_checked_time
             until_time = datetime.utcnow()
-            since_time = last_checked_time
             
-            all_tweets = []
+            fetched = []
             
-            for account in target_accounts:
-                tweets = self.get_tweets_from_account(account, since_time, until_time, exclude_replies)
-                all_tweets.extend(tweets)
-                
-                # 添加5秒延迟，避免API限制
-                if account != target_accounts[-1]:  # 如果不是最后一个账号，添加延迟
-                    print("等待5秒，避免API请求限制...")
-                    time.sleep(5)
+            def new_tweets():
+                # 并发抓取（请求速率由限流器控制），每取到一页新推文就立即交给AI工作线程
+                for event in self.stream_new_tweets(target_accounts, initial_since, until_time, exclude_replies):
+                    if event[0] == 'done':
+                        _, account, tweets, error = event
+                        if error is not None:
+                            print(f"❌ 获取 @{account} 推文失败: {str(error)}")
+                            self.record_failed_window(account, initial_since, until_time, error, len(tweets))
+                        fetched.append((account, tweets))
+                        continue
+                    if event[0] == 'error':
+                        print(f"❌ 推文扫描过程出错: {str(event[1])}")
+                        continue
+                    yield event[1]
             
-            if all_tweets:
-                print(f"发现 {len(all_tweets)} 条新推文，开始AI处理...\n")
+            def handle(tweet, idx):
+                print(f"{'='*60}")
+                print(f"处理推文 {idx}")
+                print(f"{'='*60}")
                 
-                for idx, tweet in enumerate(all_tweets, start=1):
-                    print(f"{'='*60}")
-                    print(f"处理推文 {idx}/{len(all_tweets)}")
-                    print(f"{'='*60}")
-                    
-                    # 基本信息
-                    tweet_id = tweet.get('id') or tweet.get('id_str')
-                    tweet_url = f"https://twitter.com/{tweet['author']}/status/{tweet_id}"
-                    original_text = tweet.get('text', '')
-                    
-                    print(f"作者：{tweet['author']}")
-                    print(f"发布时间：{tweet.get('createdAt')}")
-                    print(f"原文：{original_text}")
-                    print(f"链接：{tweet_url}")
-                    print()
-                    
-                    # AI处理
-                    try:
-                        print(f"🧠 开始AI处理推文 {idx}/{len(all_tweets)}")
-                        ai_result = self.process_tweet_with_ai(original_text)
-                        
-                        # 检查AI处理结果质量
-                        if any("处理异常" in str(v) or "翻译异常" in str(v) or "解读异常" in str(v) for v in ai_result.values()):
-                            print(f"⚠️ AI处理结果质量不佳，推文ID: {tweet_id}")
-                            # 可以选择跳过保存或标记为低质量
-                        
-                    except Exception as e:
-                        print(f"❌ AI处理推文失败: {str(e)}")
-                        
-                        # 检查是否是内容安全检查失败
-                        if "data_inspection_failed" in str(e).lower() or "inappropriate content" in str(e).lower():
-                            print("🚫 内容安全检查失败，使用备用处理策略...")
-                            # 使用备用策略：简单的关键词提取和基本翻译
-                            ai_result = self.fallback_processing(original_text)
-                        else:
-                            ai_result = {
-                                'title': f"处理失败: {str(e)[:50]}",
-                                'translation': f"原文: {original_text[:100]}{'...' if len(original_text) > 100 else ''}",
-                                'analysis': f"AI处理失败: {str(e)}"
-                            }
-                    
-                    print(f"AI标题：{ai_result['title']}")
-                    print(f"AI翻译：{ai_result['translation']}")
-                    print(f"AI解读：{ai_result['analysis']}")
-                    print(f"{'='*60}\n")
-                    
-                    # 保存数据到JSON
-                    tweet_data = {
-                        'id': tweet_id,
-                        'author': tweet['author'],
-                        'created_at': tweet.get('createdAt'),
-                        'original_text': original_text,
-                        'tweet_url': tweet_url,
-                        'ai_title': ai_result['title'],
-                        'ai_translation': ai_result['translation'],
-                        'ai_analysis': ai_result['analysis'],
-                        'timestamp': datetime.utcnow().isoformat(),
-                        'processed_date': datetime.now().strftime("%Y-%m-%d")
-                    }
-                    self.save_tweet_data(tweet_data)
-                    
-                    # 添加延迟避免API频率限制
-                    time.sleep(2)
-            else:
+                # 基本信息
+                tweet_id = tweet.get('id') or tweet.get('id_str')
+                tweet_url = f"https://twitter.com/{tweet['author']}/status/{tweet_id}"
+                original_text = tweet.get('text', '')
+                
+                print(f"作者：{tweet['author']}")
+                print(f"发布时间：{tweet.get('createdAt')}")
+                print(f"原文：{original_text}")
+                print(f"链接：{tweet_url}")
+                print()
+                
+                # AI处理并保存（与状态监控、推送接入共用同一流程）
+                print(f"🧠 开始AI处理推文 {idx}")
+                tweet_data = self.process_and_save_tweet(tweet, deferred=deferred)
+                if tweet_data is None:
+                    return False
+                
+                print(f"AI标题：{tweet_data['ai_title']}")
+                print(f"AI翻译：{tweet_data['ai_translation']}")
+                print(f"AI解读：{tweet_data['ai_analysis']}")
+                if tweet_data.get('near_duplicate_of'):
+                    print(f"近似重复：{tweet_data.get('near_duplicate_url') or tweet_data['near_duplicate_of']}"
+                          f"（距离 {tweet_data.get('near_duplicate_distance')}）")
+                print(f"{'='*60}\n")
+                return True
+            
+            failed = []
+            deferred = []
+            try:
+                all_tweets = self.submit_tweets(new_tweets(), handle, failed=failed)
+            finally:
+                # 熔断期间推迟的推文整轮写入一个待处理文件
+                self.defer_tweets(deferred)
+            
+            if not all_tweets and not failed:
                 print(f"{datetime.utcnow()} - 没有发现新推文。")
             
-            last_checked_time = until_time
+            # 处理出错的推文所在窗口进入重试队列，再推进水位线；中途退出时下次启动会重新抓取
+            self.record_failed_tweets(failed, initial_since, until_time)
+            self.commit_watermarks(fetched, until_time)
+            self.seen_index.release(t.get('id') or t.get('id_str') for t in failed)
         
         print(f"开始监控账号: {', '.join(target_accounts)}")
         print(f"检查间隔: {check_interval} 秒")
@@ -643,10 +1592,18 @@ class TwitterAIMonitor:
         try:
             while True:
                 check_and_process_tweets()
+                # 处理熔断期间推迟的推文和历史回填推迟的推文
+                try:
+                    self.drain_backfill_spool()
+                except Exception as e:
+                    print(f"❌ 处理待处理队列失败: {str(e)}")
                 print(f"等待 {check_interval} 秒后进行下次检查...")
                 time.sleep(check_interval)
         except KeyboardInterrupt:
             print("监控已停止。")
+        finally:
+            self.store.flush()
+            self.seen_index.flush()
     
     def monitor_and_process_with_status(self, target_accounts: list, check_interval: int = 300, hours: int = 1, status_dict: dict = None, exclude_replies: bool = False):
         """
@@ -658,7 +1615,16 @@ class TwitterAIMonitor:
         :param status_dict: 状态字典，用于更新前端显示
         :param exclude_replies: 是否排除回复推文
         """
-        last_checked_time = datetime.utcnow() - timedelta(hours=hours)
+        # 没有水位线的账号（首次监控）从初始回溯时间开始抓取
+        initial_since = datetime.utcnow() - timedelta(hours=hours)
+        # 推送的推文处理完后也计入处理数
+        self._status_dict = status_dict
+        # 开启自适应轮询时按各账号的发帖频率分配检查间隔，否则所有账号每隔 check_interval 统一检查
+        scheduler = None
+        if self.adaptive_polling:
+            scheduler = PollScheduler(target_accounts, self.store, budget_per_hour=self.poll_budget_per_hour,
+                                      check_interval=check_interval, min_interval=self.poll_min_interval,
+                                      max_interval=self.poll_max_interval)
         
         def update_status(status, account="", result=""):
             if status_dict:
@@ -668,114 +1634,146 @@ class TwitterAIMonitor:
                 if result:
                     status_dict["last_result"] = result
                 # 计算下次检查时间
-                next_time = datetime.now() + timedelta(seconds=check_interval)
+                next_due = scheduler.next_due() if scheduler is not None else None
+                if next_due is not None:
+                    next_time = datetime.fromtimestamp(next_due)
+                else:
+                    next_time = datetime.now() + timedelta(seconds=check_interval)
                 status_dict["next_check_time"] = next_time.isoformat()
         
-        def check_and_process_tweets():
-            nonlocal last_checked_time
+        def check_and_process_tweets(accounts):
+            """检查一批账号，返回 {账号: 新推文数}"""
             until_time = datetime.utcnow()
-            since_time = last_checked_time
             
-            all_tweets = []
+            fetched = []
+            seen_tweets = []
+            done = 0
             
-            try:
-                # 更新状态：开始抓取
-                update_status("🔍 扫描中", f"{', '.join(target_accounts)}")
-                
-                for account in target_accounts:
-                    try:
-                        update_status(f"📡 正在抓取 @{account} 的推文...")
-                        tweets = self.get_tweets_from_account(account, since_time, until_time, exclude_replies)
-                        all_tweets.extend(tweets)
-                        print(f"✅ 成功获取 @{account} 的 {len(tweets)} 条推文")
-                        
-                        # 添加5秒延迟，避免API限制
-                        if account != target_accounts[-1]:  # 如果不是最后一个账号，添加延迟
-                            print("等待5秒，避免API请求限制...")
-                            time.sleep(5)
-                            
-                    except Exception as e:
-                        print(f"❌ 获取 @{account} 推文失败: {str(e)}")
-                        update_status(f"⚠️ @{account} 数据获取异常", result=f"错误: {str(e)}")
+            # 更新状态：开始抓取
+            update_status("🔍 扫描中", f"{', '.join(accounts)}")
+            
+            def new_tweets():
+                # 并发抓取（请求速率由限流器控制），每取到一页新推文就立即交给AI工作线程
+                nonlocal done
+                for event in self.stream_new_tweets(accounts, initial_since, until_time, exclude_replies):
+                    if event[0] == 'done':
+                        _, account, tweets, error = event
+                        done += 1
+                        if status_dict:
+                            status_dict["rate_limiter"] = self.rate_limiter.stats()
+                            status_dict["http"] = self.http_client.stats()
+                            status_dict["dedup"] = self.seen_index.stats()
+                        if error is not None:
+                            print(f"❌ 获取 @{account} 推文失败: {str(error)}")
+                            update_status(f"⚠️ @{account} 数据获取异常", result=f"错误: {str(error)}")
+                            self.record_failed_window(account, initial_since, until_time, error, len(tweets))
+                        else:
+                            print(f"✅ 成功获取 @{account} 的 {len(tweets)} 条推文 ({done}/{len(accounts)})")
+                        fetched.append((account, tweets))
                         continue
-            except Exception as e:
-                print(f"❌ 推文扫描过程出错: {str(e)}")
-                update_status(f"⚠️ 扫描过程异常", result=f"错误: {str(e)}")
-                return
+                    if event[0] == 'error':
+                        print(f"❌ 推文扫描过程出错: {str(event[1])}")
+                        update_status(f"⚠️ 扫描过程异常", result=f"错误: {str(event[1])}")
+                        continue
+                    yield event[1]
             
-            if all_tweets:
-                update_status(f"🤖 发现 {len(all_tweets)} 条新推文，AI分析中...", result=f"找到 {len(all_tweets)} 条新推文")
-                
-                for idx, tweet in enumerate(all_tweets, start=1):
-                    # 基本信息
-                    tweet_id = tweet.get('id') or tweet.get('id_str')
-                    tweet_url = f"https://twitter.com/{tweet['author']}/status/{tweet_id}"
-                    original_text = tweet.get('text', '')
-                    
-                    # 更新状态：AI处理中
-                    update_status(f"🧠 AI处理中... ({idx}/{len(all_tweets)})", f"@{tweet['author']}")
-                    
-                    # AI处理
-                    try:
-                        print(f"🧠 开始AI处理推文 {idx}/{len(all_tweets)}")
-                        ai_result = self.process_tweet_with_ai(original_text)
-                        
-                        # 检查AI处理结果质量
-                        if any("处理异常" in str(v) or "翻译异常" in str(v) or "解读异常" in str(v) for v in ai_result.values()):
-                            print(f"⚠️ AI处理结果质量不佳，推文ID: {tweet_id}")
-                            # 可以选择跳过保存或标记为低质量
-                        
-                    except Exception as e:
-                        print(f"❌ AI处理推文失败: {str(e)}")
-                        ai_result = {
-                            'title': f"处理失败: {str(e)[:50]}",
-                            'translation': f"原文: {original_text[:100]}{'...' if len(original_text) > 100 else ''}",
-                            'analysis': f"AI处理失败: {str(e)}"
-                        }
-                    
-                    # 保存数据到JSON
-                    tweet_data = {
-                        'id': tweet_id,
-                        'author': tweet['author'],
-                        'created_at': tweet.get('createdAt'),
-                        'original_text': original_text,
-                        'tweet_url': tweet_url,
-                        'ai_title': ai_result['title'],
-                        'ai_translation': ai_result['translation'],
-                        'ai_analysis': ai_result['analysis'],
-                        'timestamp': datetime.utcnow().isoformat(),
-                        'processed_date': datetime.now().strftime("%Y-%m-%d")
-                    }
-                    self.save_tweet_data(tweet_data)
-                    
-                    # 更新处理计数
-                    if status_dict:
-                        status_dict["processed_tweets"] = status_dict.get("processed_tweets", 0) + 1
-                    
-                    # 添加延迟避免API频率限制
-                    time.sleep(2)
-                
-                update_status("✅ 处理完成", result=f"成功处理 {len(all_tweets)} 条推文")
+            def handle(tweet, idx):
+                # 更新状态：AI处理中
+                update_status(f"🧠 AI处理中... (第{idx}条，已抓取 {done}/{len(accounts)} 个账号)", f"@{tweet['author']}")
+                print(f"🧠 开始AI处理推文 {idx}")
+                return self.process_and_save_tweet(tweet, deferred=deferred) is not None
+            
+            def on_done(tweet, ok):
+                seen_tweets.append(tweet)
+                # 更新处理计数
+                if ok:
+                    self._count_processed(status_dict)
+                if status_dict:
+                    status_dict["ai"] = self.ai_limiter.stats()
+                    status_dict["llm_cache"] = self.llm_cache.stats()
+                    status_dict["near_dup"] = self.near_dup.stats() if self.near_dup is not None else None
+                    status_dict["ai_breaker"] = self.ai_breaker_stats()
+            
+            failed = []
+            deferred = []
+            try:
+                processed = self.submit_tweets(new_tweets(), handle, on_done, failed=failed)
+            finally:
+                # 熔断期间推迟的推文整轮写入一个待处理文件
+                self.defer_tweets(deferred)
+            
+            # 处理出错的推文所在窗口进入重试队列，再推进水位线（只推进本轮抓取结束的账号）；中途退出时下次启动会重新抓取
+            self.record_failed_tweets(failed, initial_since, until_time)
+            self.commit_watermarks(fetched, until_time)
+            self.seen_index.release(t.get('id') or t.get('id_str') for t in failed)
+            
+            if status_dict:
+                status_dict["coverage_gaps"] = self.window_queue.stats()
+            if failed:
+                update_status("⚠️ 部分推文处理失败", result=f"成功处理 {len(processed)} 条推文，{len(failed)} 条失败（已加入重试队列）")
+            elif processed:
+                update_status("✅ 处理完成", result=f"成功处理 {len(processed)} 条推文")
             else:
                 update_status("⭐ 智能待机中", result="未发现新推文，继续监控中...")
             
-            last_checked_time = until_time
+            # 按本轮发现的全部新推文（含失败和推迟处理的）估计账号活跃度
+            new_counts = {}
+            for t in seen_tweets:
+                new_counts[t['author']] = new_counts.get(t['author'], 0) + 1
+            return new_counts
         
+        def drain_backfill():
+            # 后台处理历史回填推迟的推文，每分钟检查一次队列
+            while status_dict.get("running", False):
+                try:
+                    self.drain_backfill_spool(lambda: status_dict.get("running", False))
+                except Exception as e:
+                    print(f"❌ 处理回填推文失败: {str(e)}")
+                status_dict["backfill"] = self.backfill_spool.stats()
+                time.sleep(60)
+
         update_status("🚀 Neural Network 已启动", f"监控 {len(target_accounts)} 个账号")
+        if status_dict:
+            status_dict["coverage_gaps"] = self.window_queue.stats()
+            status_dict["backfill"] = self.backfill_spool.stats()
+            threading.Thread(target=drain_backfill, name="backfill", daemon=True).start()
         print(f"🚀 监控启动成功，目标账号: {target_accounts}")
         
         try:
             while status_dict and status_dict.get("running", False):
-                print(f"🔄 开始新一轮检查循环...")
-                check_and_process_tweets()
+                if scheduler is None:
+                    print(f"🔄 开始新一轮检查循环...")
+                    check_and_process_tweets(target_accounts)
+                    
+                    # 倒计时等待
+                    for remaining in range(check_interval, 0, -10):
+                        if not status_dict.get("running", False):
+                            print("🛑 收到停止信号，退出监控")
+                            break
+                        update_status(f"⏱️ 下次扫描倒计时 {remaining}s", result=status_dict.get("last_result", ""))
+                        time.sleep(10)
+                    continue
                 
-                # 倒计时等待
-                for remaining in range(check_interval, 0, -10):
-                    if not status_dict.get("running", False):
-                        print("🛑 收到停止信号，退出监控")
+                # 检查所有已到期的账号，按本轮结果重新安排下次检查
+                due_accounts = scheduler.pop_due()
+                if due_accounts:
+                    print(f"🔄 检查到期账号: {', '.join(due_accounts)}")
+                    new_counts = check_and_process_tweets(due_accounts)
+                    scheduler.reschedule(due_accounts, new_counts)
+                    status_dict["scheduler"] = scheduler.stats()
+                
+                # 等待下一个账号到期；没有待检查的账号时按基础检查间隔等待
+                next_due = scheduler.next_due()
+                if next_due is None:
+                    next_due = time.time() + check_interval
+                while status_dict.get("running", False):
+                    remaining = next_due - time.time()
+                    if remaining <= 0:
                         break
-                    update_status(f"⏱️ 下次扫描倒计时 {remaining}s", result=status_dict.get("last_result", ""))
-                    time.sleep(10)
+                    update_status(f"⏱️ 下次扫描倒计时 {int(remaining)}s", result=status_dict.get("last_result", ""))
+                    time.sleep(min(10, remaining))
+                else:
+                    print("🛑 收到停止信号，退出监控")
                     
         except KeyboardInterrupt:
             print("🛑 监控被中断")
@@ -785,6 +1783,10 @@ class TwitterAIMonitor:
             update_status("❌ 监控异常停止", result=f"错误: {str(e)}")
             if status_dict:
                 status_dict["running"] = False
+        finally:
+            # 停止监控前把尚未fsync的写入落盘
+            self.store.flush()
+            self.seen_index.flush()
 
     def fallback_processing(self, tweet_text: str) -> dict:
         """
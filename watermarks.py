@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按账号的抓取水位线
+
+记录每个账号已抓取到的最新推文ID、对应的发帖时间，以及已成功扫描到的时间点，保存在 data/watermarks.json。
+重启后从水位线继续抓取，不再重新扫描 INITIAL_HOURS 的历史；翻页遇到不大于水位线的推文ID时停止。
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+
+WATERMARKS_FILE_NAME = "watermarks.json"
+
+
+def tweet_id_value(tweet_id):
+    """
+    推文ID转为整数用于比较大小
+
+    :param tweet_id: 推文ID（数字或数字字符串）
+    :return: 整数，无法转换时返回None
+    """
+    try:
+        return int(tweet_id)
+    except (TypeError, ValueError):
+        return None
+
+
+class WatermarkStore:
+    """账号水位线（线程安全，原子写入）"""
+
+    def __init__(self, path: str):
+        """
+        :param path: 水位线文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._marks = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._marks = json.load(f)
+                print(f"📍 已加载 {len(self._marks)} 个账号的抓取水位线")
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 读取抓取水位线失败，将从初始回溯时间开始抓取: {str(e)}")
+
+    @staticmethod
+    def _key(account: str) -> str:
+        return account.lower()
+
+    def get(self, account: str) -> dict:
+        """
+        获取账号的水位线
+
+        :param account: 账号
+        :return: {since_id, newest_created_at, checked_until}，没有记录时返回空字典
+        """
+        with self._lock:
+            return dict(self._marks.get(self._key(account), {}))
+
+    def since_id(self, account: str):
+        """
+        :param account: 账号
+        :return: 已抓取到的最新推文ID（整数），没有记录时返回None
+        """
+        return tweet_id_value(self.get(account).get('since_id'))
+
+    def since_time(self, account: str, default: datetime) -> datetime:
+        """
+        账号下次抓取的开始时间（上次成功扫描到的时间点）
+
+        :param account: 账号
+        :param default: 没有记录时使用的开始时间
+        :return: 开始时间（UTC）
+        """
+        checked_until = self.get(account).get('checked_until')
+        if checked_until:
+            try:
+                return datetime.fromisoformat(checked_until)
+            except ValueError:
+                pass
+        return default
+
+    def advance(self, account: str, tweets: list, until_time: datetime):
+        """
+        账号扫描成功后推进水位线（需调用 save 落盘）
+
+        :param account: 账号
+        :param tweets: 本次抓取到的推文
+        :param until_time: 本次扫描的结束时间
+        """
+        with self._lock:
+            mark = self._marks.setdefault(self._key(account), {})
+            newest = tweet_id_value(mark.get('since_id'))
+            for tweet in tweets:
+                value = tweet_id_value(tweet.get('id'))
+                if value is not None and (newest is None or value > newest):
+                    newest = value
+                    mark['since_id'] = str(value)
+                    mark['newest_created_at'] = tweet.get('createdAt')
+            previous = mark.get('checked_until')
+            if not previous or previous < until_time.isoformat():
+                mark['checked_until'] = until_time.isoformat()
+
+    def save(self):
+        """原子写入水位线文件"""
+        with self._lock:
+            data = json.dumps(self._marks, ensure_ascii=False, indent=2)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def stats(self) -> dict:
+        """返回各账号的水位线"""
+        with self._lock:
+            return {account: dict(mark) for account, mark in self._marks.items()}